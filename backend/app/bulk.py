@@ -0,0 +1,323 @@
+import csv
+import io
+import json
+from collections import Counter
+from datetime import datetime
+from typing import AsyncIterable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from pydantic import ValidationError
+from sqlalchemy import delete, insert, update
+from sqlmodel import Session, select
+
+from db import engine
+from models import Product, Category, ProductCategoryLink, ProductRating
+from schemas import ProductCreate, ProductUpsert, ImportReport, ImportRowError
+from search import search_index
+from facets import index_facets
+from versions import IMPORT_TAG, bump
+from category_stats import adjust_counts
+from dashboard_stats import adjust_counters
+from related import RELATED_FIELDS, REBUILD_THRESHOLD, refresh_related, rebuild_related
+
+FORMATS = ("ndjson", "csv")
+CHUNK_SIZE = 500
+# Columns an update row may set to null
+NULLABLE_FIELDS = {"brand", "original_price"}
+# Cache tags an import invalidates: any product and listing, and category counts
+IMPORT_TAGS = ("products", "categories:counts", IMPORT_TAG)
+
+# Columns of an export, in order; an export can be imported again as is
+EXPORT_FIELDS = [
+    "sku", "name", "description", "price", "stock", "brand", "original_price", "in_stock",
+    "category_ids", "images", "tags", "features", "specifications", "shipping",
+]
+LIST_FIELDS = {"category_ids", "images", "tags", "features"}
+JSON_FIELDS = {"specifications", "shipping"}
+
+# (line number, parsed record or None, parse error or None)
+Record = Tuple[int, Optional[Dict], Optional[str]]
+
+
+def _csv_value(field: str, value: str):
+    if field in LIST_FIELDS and not value.startswith("["):
+        # Plain lists may be written as a|b|c
+        return [item.strip() for item in value.split("|") if item.strip()]
+    if field in LIST_FIELDS or field in JSON_FIELDS:
+        return json.loads(value)
+    return value
+
+
+class RecordParser:
+    """Turns NDJSON or CSV text, fed line by line, into product records"""
+
+    def __init__(self, format: str):
+        self.format = format
+        self.header: Optional[List[str]] = None
+        self.line = 0
+        self._pending: List[str] = []
+        self._pending_line = 0
+
+    def feed(self, line: str) -> Optional[Record]:
+        self.line += 1
+        line = line.rstrip("\r\n")
+        if self.format == "ndjson":
+            return self._ndjson(line)
+        # A quoted CSV value may span lines: wait for the closing quote
+        if not self._pending:
+            self._pending_line = self.line
+        self._pending.append(line)
+        text = "\n".join(self._pending)
+        if text.count('"') % 2:
+            return None
+        self._pending = []
+        return self._csv(text, self._pending_line)
+
+    def finish(self) -> Optional[Record]:
+        if self._pending:
+            line, self._pending = self._pending_line, []
+            return line, None, "Unterminated quoted CSV value"
+        return None
+
+    def _ndjson(self, line: str) -> Optional[Record]:
+        if not line.strip():
+            return None
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            return self.line, None, f"Invalid JSON: {exc}"
+        if not isinstance(record, dict):
+            return self.line, None, "Expected a JSON object"
+        return self.line, record, None
+
+    def _csv(self, text: str, line: int) -> Optional[Record]:
+        if not text.strip():
+            return None
+        values = next(csv.reader([text]))
+        if self.header is None:
+            self.header = [value.strip() for value in values]
+            return None
+        if len(values) > len(self.header):
+            return line, None, f"Expected {len(self.header)} columns, got {len(values)}"
+        record = {}
+        try:
+            for field, value in zip(self.header, values):
+                # Empty cells fall back to the field default
+                if value != "":
+                    record[field] = _csv_value(field, value)
+        except ValueError as exc:
+            return line, record, f"Invalid JSON in column {field}: {exc}"
+        return line, record, None
+
+
+def read_chunks(lines: Iterable[str], format: str, size: int = CHUNK_SIZE) -> Iterator[List[Record]]:
+    parser = RecordParser(format)
+    chunk: List[Record] = []
+    for line in lines:
+        record = parser.feed(line)
+        if record:
+            chunk.append(record)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    record = parser.finish()
+    if record:
+        chunk.append(record)
+    if chunk:
+        yield chunk
+
+
+async def read_chunks_async(stream: AsyncIterable[bytes], format: str, size: int = CHUNK_SIZE):
+    """read_chunks() over a request body, without reading it all first"""
+    parser = RecordParser(format)
+    chunk: List[Record] = []
+    buffer = b""
+    async for data in stream:
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            record = parser.feed(line.decode("utf-8-sig" if parser.line == 0 else "utf-8", errors="replace"))
+            if record:
+                chunk.append(record)
+                if len(chunk) >= size:
+                    yield chunk
+                    chunk = []
+    for record in (parser.feed(buffer.decode("utf-8", errors="replace")) if buffer else None, parser.finish()):
+        if record:
+            chunk.append(record)
+    if chunk:
+        yield chunk
+
+
+class ProductImporter:
+    """Upserts products by SKU, one chunk (and one transaction) at a time.
+
+    Each chunk costs one query for its SKUs, one for its category ids and one
+    executemany per insert/update, whatever its size. Rows failing validation
+    are reported and skipped; the rest of the chunk is still imported.
+    """
+
+    def __init__(self):
+        self.report = ImportReport()
+        # Products whose related-product lists are due once the import is done
+        self.related_ids: List[int] = []
+
+    def import_chunk(self, records: List[Record]):
+        with Session(engine) as session:
+            self._import_chunk(session, records)
+            session.commit()
+
+    def finish(self):
+        """Refresh the related-product lists: per product for small imports, in one rebuild for big ones"""
+        if not self.related_ids:
+            return
+        with Session(engine) as session:
+            if len(self.related_ids) > REBUILD_THRESHOLD:
+                rebuild_related(session)
+            else:
+                refresh_related(session, self.related_ids)
+            bump(session, "products", tags=["products:related"])
+            session.commit()
+        self.related_ids = []
+
+    def _fail(self, row: int, record: Optional[Dict], *errors: str):
+        sku = record.get("sku") if record else None
+        self.report.failed += 1
+        self.report.errors.append(ImportRowError(row=row, sku=sku if isinstance(sku, str) else None, errors=list(errors)))
+
+    def _import_chunk(self, session: Session, records: List[Record]):
+        skus = [record["sku"] for _, record, error in records if not error and isinstance(record.get("sku"), str)]
+        existing = dict(session.exec(select(Product.sku, Product.id).where(Product.sku.in_(skus))).all()) if skus else {}
+
+        products: Dict[str, Tuple[int, Dict, Union[ProductCreate, ProductUpsert]]] = {}
+        for row, record, error in records:
+            if error:
+                self._fail(row, record, error)
+                continue
+            # New SKUs need a whole product; rows for existing ones may give only some columns
+            schema = ProductUpsert if record.get("sku") in existing else ProductCreate
+            try:
+                product = schema.model_validate(record)
+            except ValidationError as exc:
+                self._fail(row, record, *(
+                    f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()
+                ))
+                continue
+            nulls = sorted(field for field in product.model_fields_set - NULLABLE_FIELDS if getattr(product, field) is None)
+            if nulls:
+                self._fail(row, record, *(f"{field}: May not be null" for field in nulls))
+                continue
+            if product.sku in products:
+                # The last row for a SKU wins
+                previous_row, previous_record, _ = products[product.sku]
+                self._fail(previous_row, previous_record, f"Duplicate SKU, superseded by row {row}")
+            products[product.sku] = (row, record, product)
+
+        category_ids = {category_id for _, _, product in products.values() for category_id in product.category_ids or ()}
+        if category_ids:
+            known = set(session.exec(select(Category.id).where(Category.id.in_(category_ids))).all())
+            for sku, (row, record, product) in list(products.items()):
+                unknown = sorted(set(product.category_ids or ()) - known)
+                if unknown:
+                    self._fail(row, record, f"Unknown category ids: {', '.join(map(str, unknown))}")
+                    del products[sku]
+        if not products:
+            return
+
+        now = datetime.now().isoformat()
+        inserts, updates = [], []
+        for sku, (_, _, product) in products.items():
+            if sku in existing:
+                # Only the columns present in the row are updated
+                values = product.model_dump(exclude_unset=True, exclude={"category_ids"})
+                if "stock" in values and "in_stock" not in values:
+                    values["in_stock"] = values["stock"] > 0
+                updates.append({**values, "id": existing[sku], "updated_at": now})
+            else:
+                values = product.model_dump(exclude={"category_ids"})
+                if "in_stock" not in product.model_fields_set:
+                    values["in_stock"] = product.stock > 0
+                inserts.append({**values, "created_at": now, "updated_at": now})
+
+        ids = dict(existing)
+        if inserts:
+            created = session.exec(insert(Product).returning(Product.sku, Product.id), params=inserts).all()
+            ids.update(created)
+            session.exec(insert(ProductRating), params=[{"product_id": product_id} for _, product_id in created])
+        if updates:
+            session.exec(update(Product), params=updates)
+
+        # Rows giving category_ids replace the product's categories
+        linked = {ids[sku]: product.category_ids for sku, (_, _, product) in products.items()
+                  if sku not in existing or "category_ids" in product.model_fields_set}
+        replaced = [product_id for product_id in linked if product_id in existing.values()]
+        counts = Counter()
+        if replaced:
+            old_links = select(ProductCategoryLink.category_id).where(ProductCategoryLink.product_id.in_(replaced))
+            counts.subtract(session.exec(old_links).all())
+            session.exec(delete(ProductCategoryLink).where(ProductCategoryLink.product_id.in_(replaced)))
+        links = [{"product_id": product_id, "category_id": category_id}
+                 for product_id, category_ids in linked.items() for category_id in dict.fromkeys(category_ids)]
+        if links:
+            session.exec(insert(ProductCategoryLink), params=links)
+            counts.update(link["category_id"] for link in links)
+        adjust_counts(session, {category_id: delta for category_id, delta in counts.items() if delta})
+
+        # Updated rows may carry only some columns, so index what is stored now
+        created_products = [Product(id=ids[sku], **row) for sku, row in zip(
+            (sku for sku in products if sku not in existing), inserts
+        )]
+        updated_products = session.exec(select(Product).where(Product.id.in_(list(existing.values())))).all() if updates else []
+        search_index.index_products(session, created_products + list(updated_products))
+        index_facets(session, created_products, new=True)
+        index_facets(session, list(updated_products))
+        adjust_counters(session, products=len(inserts))
+        self.related_ids.extend(ids[sku] for sku, (_, _, product) in products.items()
+                                if sku not in existing or RELATED_FIELDS.intersection(product.model_fields_set))
+        bump(session, "products", tags=IMPORT_TAGS)
+
+        self.report.created += len(inserts)
+        self.report.updated += len(updates)
+
+
+def _export_record(product: Product, category_ids: List[int]) -> Dict:
+    record = product.model_dump(include=set(EXPORT_FIELDS))
+    record["category_ids"] = category_ids
+    return {field: record[field] for field in EXPORT_FIELDS}
+
+
+def export_products(format: str, batch_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Serialize the catalog in id order, one batch of rows per yielded chunk"""
+    if format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_FIELDS)
+        yield buffer.getvalue().encode()
+
+    with Session(engine) as session:
+        last_id = 0
+        while True:
+            statement = select(Product).where(Product.id > last_id).order_by(Product.id).limit(batch_size)
+            products = session.exec(statement).all()
+            if not products:
+                break
+            last_id = products[-1].id
+            category_ids: Dict[int, List[int]] = {product.id: [] for product in products}
+            links = select(ProductCategoryLink).where(ProductCategoryLink.product_id.in_(list(category_ids)))
+            for link in session.exec(links).all():
+                category_ids[link.product_id].append(link.category_id)
+
+            records = [_export_record(product, category_ids[product.id]) for product in products]
+            # Keep memory flat: nothing from earlier batches stays in the session
+            session.expunge_all()
+            if format == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                for record in records:
+                    writer.writerow([
+                        json.dumps(value) if field in LIST_FIELDS or field in JSON_FIELDS
+                        else "" if value is None else value
+                        for field, value in record.items()
+                    ])
+                yield buffer.getvalue().encode()
+            else:
+                yield "".join(json.dumps(record) + "\n" for record in records).encode()
@@ -0,0 +1,145 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, NamedTuple, Optional, Set
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+
+
+class CacheEntry(NamedTuple):
+    body: bytes
+    headers: Dict[str, str]
+    tags: frozenset
+    expires_at: float
+
+
+class ResponseCache:
+    """LRU cache of serialized JSON responses with TTL, bounded by entries and bytes.
+
+    Entries carry tags ("product:3", "products:category:2", ...) so writes can
+    evict exactly the responses they affect. With settle_seconds set (read
+    replicas), responses carrying a tag invalidated that recently are not
+    stored: they may have been read from a replica not yet showing the write.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 32 * 1024 * 1024, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+        self._bytes = 0
+        self.settle_seconds = 0.0
+        self._invalidated_at: Dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.unsettled = 0
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                self._discard(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key: str, body: bytes, tags: Iterable[str] = (), headers: Optional[Dict[str, str]] = None):
+        if self.ttl <= 0 or len(body) > self.max_bytes:
+            return
+        entry = CacheEntry(body, dict(headers or {}), frozenset(tags), time.monotonic() + self.ttl)
+        with self._lock:
+            if self.settle_seconds > 0 and self._unsettled(entry.tags):
+                self.unsettled += 1
+                return
+            self._discard(key)
+            self._entries[key] = entry
+            self._bytes += len(body)
+            for tag in entry.tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, *tags: str):
+        """Evict every entry carrying one of the given tags"""
+        with self._lock:
+            if self.settle_seconds > 0:
+                now = time.monotonic()
+                if len(self._invalidated_at) > self.max_entries:
+                    self._invalidated_at = {
+                        tag: at for tag, at in self._invalidated_at.items() if now - at < self.settle_seconds
+                    }
+                self._invalidated_at.update(dict.fromkeys(tags, now))
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._discard(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self._invalidated_at.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "unsettled": self.unsettled,
+            }
+
+    def _unsettled(self, tags: frozenset) -> bool:
+        now = time.monotonic()
+        return any(now - self._invalidated_at.get(tag, float("-inf")) < self.settle_seconds for tag in tags)
+
+    def _discard(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= len(entry.body)
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+def request_key(prefix: str, request: Request) -> str:
+    """Cache key for a request: prefix plus its query parameters in canonical order"""
+    return f"{prefix}?{urlencode(sorted(request.query_params.multi_items()))}"
+
+
+def json_response(body: bytes, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024")),
+    max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "300")),
+)
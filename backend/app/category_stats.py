@@ -0,0 +1,55 @@
+from collections import Counter
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import bindparam, delete, insert, update
+from sqlmodel import Session, select, func
+
+from models import Category, CategoryStats, ProductCategoryLink
+
+
+def count_changes(old_ids: Iterable[int], new_ids: Iterable[int]) -> Dict[int, int]:
+    """Per-category count deltas of a product moving from old_ids to new_ids"""
+    deltas = Counter(set(new_ids))
+    deltas.subtract(Counter(set(old_ids)))
+    return {category_id: delta for category_id, delta in deltas.items() if delta}
+
+
+def adjust_counts(session: Session, deltas: Dict[int, int]):
+    """Apply product count deltas with one executemany; rows missing are rebuilt"""
+    if not deltas:
+        return
+    stats = CategoryStats.__table__
+    result = session.exec(
+        update(stats)
+        .where(stats.c.category_id == bindparam("id"))
+        .values(product_count=stats.c.product_count + bindparam("delta")),
+        params=[{"id": category_id, "delta": delta} for category_id, delta in sorted(deltas.items())],
+    )
+    if result.rowcount != len(deltas) and session.get_bind().dialect.supports_sane_multi_rowcount:
+        rebuild_counts(session, deltas)
+
+
+def rebuild_counts(session: Session, category_ids: Optional[Iterable[int]] = None):
+    """Recount products from the link table, for some categories or all of them"""
+    counts = (
+        select(Category.id, func.count(ProductCategoryLink.product_id))
+        .select_from(Category)
+        .outerjoin(ProductCategoryLink, ProductCategoryLink.category_id == Category.id)
+        .group_by(Category.id)
+    )
+    stale = delete(CategoryStats)
+    if category_ids is not None:
+        category_ids = list(category_ids)
+        counts = counts.where(Category.id.in_(category_ids))
+        stale = stale.where(CategoryStats.category_id.in_(category_ids))
+
+    session.exec(stale)
+    session.exec(insert(CategoryStats).from_select(["category_id", "product_count"], counts))
+
+
+def ensure_counts(session: Session):
+    """Build the counts once for databases created before they existed"""
+    categories = session.exec(select(func.count(Category.id))).one()
+    if categories != session.exec(select(func.count(CategoryStats.category_id))).one():
+        rebuild_counts(session)
+        session.commit()
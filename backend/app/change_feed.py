@@ -0,0 +1,165 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import delete, or_
+from sqlmodel import Session, select, func
+
+from cache import response_cache
+from db import engine, run_sync
+from models import ChangeEvent
+from search import search_index
+from store_settings import settings_snapshot
+from versions import IMPORT_TAG, PROCESS_ID
+
+# How stale this worker's caches may get after another worker's write; 0 turns the feed off
+CHANGE_FEED_POLL_SECONDS = float(os.getenv("CHANGE_FEED_POLL_SECONDS", "1"))
+# Events are kept this long; a worker that hasn't polled for longer drops all its caches
+CHANGE_FEED_RETENTION_SECONDS = float(os.getenv("CHANGE_FEED_RETENTION_SECONDS", "3600"))
+# An id skipped by the feed may still show up this long, committed out of order
+# by a slower transaction (sequences on PostgreSQL; SQLite commits in id order)
+CHANGE_FEED_GAP_SECONDS = float(os.getenv("CHANGE_FEED_GAP_SECONDS", "30"))
+
+PRUNE_SECONDS = 60
+
+
+class ChangeFeed:
+    """Applies the other workers' writes to this process's caches, reading ChangeEvent past the last id seen.
+
+    Each event's tags are invalidated in the response cache, a settings write
+    drops the settings snapshot and product writes reach an in-memory search
+    index; events this process wrote itself are skipped, its handlers applied
+    them already.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.last_id: Optional[int] = None
+        self.polled_at = 0.0
+        self.attempted_at = 0.0
+        self.pruned_at = 0.0
+        # Ids skipped over, with when they were first missed
+        self._gaps: Dict[int, float] = {}
+        self.polls = 0
+        self.applied = 0
+        self.resets = 0
+
+    def poll_due(self) -> bool:
+        return time.monotonic() - self.attempted_at >= CHANGE_FEED_POLL_SECONDS
+
+    def poll(self) -> int:
+        """Apply the events committed since the last poll; blocking, so call it through run_sync in async mode.
+
+        Returns how many were applied. A poll already running elsewhere is not
+        waited for.
+        """
+        if not self._lock.acquire(blocking=False):
+            return 0
+        try:
+            # A failing database is retried at the same pace
+            self.attempted_at = time.monotonic()
+            with Session(engine) as session:
+                applied = self._poll(session)
+                if time.monotonic() - self.pruned_at >= PRUNE_SECONDS:
+                    self.prune(session)
+            return applied
+        finally:
+            self._lock.release()
+
+    def _poll(self, session: Session) -> int:
+        now = time.monotonic()
+        if self.last_id is None or now - self.polled_at > CHANGE_FEED_RETENTION_SECONDS:
+            if self.last_id is not None:
+                # Events may have been pruned unseen
+                print("⚠️ Change feed fell behind its retention, dropping every cached response")
+                self.reset(session)
+            self.last_id = session.exec(select(func.max(ChangeEvent.id))).one() or 0
+            self.polled_at = now
+            return 0
+
+        condition = ChangeEvent.id > self.last_id
+        if self._gaps:
+            condition = or_(condition, ChangeEvent.id.in_(list(self._gaps)))
+        events = session.exec(select(ChangeEvent).where(condition).order_by(ChangeEvent.id)).all()
+
+        tags, resources, applied = set(), set(), 0
+        product_ids, reindex = set(), False
+        for event in events:
+            self._gaps.pop(event.id, None)
+            if event.id > self.last_id:
+                self._gaps.update(dict.fromkeys(range(self.last_id + 1, event.id), now))
+                self.last_id = event.id
+            if event.origin != PROCESS_ID:
+                tags.update(event.tags)
+                resources.update(event.resources)
+                applied += 1
+                if "products" in event.resources:
+                    # Writes tag each product they touch; an import, too many to list, tags itself
+                    product_ids.update(int(tag[len("product:"):]) for tag in event.tags if tag.startswith("product:"))
+                    reindex = reindex or IMPORT_TAG in event.tags
+        self._gaps = {event_id: at for event_id, at in self._gaps.items() if now - at < CHANGE_FEED_GAP_SECONDS}
+
+        if tags:
+            response_cache.invalidate(*tags)
+        if "settings" in resources:
+            settings_snapshot.clear()
+        if not search_index.persistent:
+            if reindex:
+                search_index.rebuild(session)
+            elif product_ids:
+                search_index.refresh(session, list(product_ids))
+        self.polls += 1
+        self.applied += applied
+        self.polled_at = now
+        return applied
+
+    def prune(self, session: Session):
+        """Delete the events older than CHANGE_FEED_RETENTION_SECONDS"""
+        cutoff = datetime.utcnow() - timedelta(seconds=CHANGE_FEED_RETENTION_SECONDS)
+        session.exec(delete(ChangeEvent).where(ChangeEvent.created_at < cutoff))
+        session.commit()
+        self.pruned_at = time.monotonic()
+
+    def reset(self, session: Session):
+        response_cache.clear()
+        settings_snapshot.clear()
+        if not search_index.persistent:
+            search_index.rebuild(session)
+        self.resets += 1
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": CHANGE_FEED_POLL_SECONDS > 0,
+            "process_id": PROCESS_ID,
+            "last_id": self.last_id,
+            "pending_gaps": len(self._gaps),
+            "polls": self.polls,
+            "applied": self.applied,
+            "resets": self.resets,
+            "poll_seconds": CHANGE_FEED_POLL_SECONDS,
+        }
+
+
+change_feed = ChangeFeed()
+
+
+class ChangeFeedMiddleware:
+    """ASGI middleware polling the change feed before a request once CHANGE_FEED_POLL_SECONDS have passed.
+
+    Polling on the request path rather than from a background task also works
+    on serverless instances, which only run while they serve a request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and change_feed.poll_due():
+            try:
+                await run_sync(change_feed.poll)
+            except Exception as exc:
+                # Serve from the caches as they are; the next request tries again
+                print(f"❌ Change feed poll failed: {exc}")
+        await self.app(scope, receive, send)
@@ -0,0 +1,198 @@
+import gzip
+import os
+import zlib
+from functools import lru_cache
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+from starlette.datastructures import MutableHeaders
+
+from cache import ResponseCache
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional: pip install zstandard
+    zstandard = None
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+# Smaller bodies go out as they are: the framing would eat most of the saving
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+
+# Levels for dynamic content; a miss still compresses on the request's critical path
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+
+COMPRESSIBLE_TYPES = {"application/json", "application/x-ndjson", "application/javascript", "application/xml"}
+
+
+class Codec(NamedTuple):
+    compress: Callable[[bytes], bytes]
+    # A (compress chunk, finish) pair for streamed bodies
+    stream: Callable[[], Tuple[Callable[[bytes], bytes], Callable[[], bytes]]]
+
+
+def _gzip_stream():
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    return compressor.compress, compressor.flush
+
+
+def _brotli_stream():
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    return compressor.process, compressor.finish
+
+
+def _zstd_stream():
+    compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    return compressor.compress, compressor.flush
+
+
+# Preferred first when the client weighs several the same
+CODECS: Dict[str, Codec] = {}
+if zstandard is not None:
+    CODECS["zstd"] = Codec(lambda body: zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body), _zstd_stream)
+if brotli is not None:
+    CODECS["br"] = Codec(lambda body: brotli.compress(body, quality=BROTLI_QUALITY), _brotli_stream)
+CODECS["gzip"] = Codec(lambda body: gzip.compress(body, GZIP_LEVEL, mtime=0), _gzip_stream)
+
+
+@lru_cache(maxsize=256)
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """The best supported coding an Accept-Encoding header allows, or None for identity"""
+    weights = {}
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.partition(";")
+        weight = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if coding.strip():
+            weights[coding.strip()] = weight
+    wildcard = weights.get("*", 0.0)
+    best, best_weight = None, 0.0
+    for coding in CODECS:
+        weight = weights.get(coding, wildcard)
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def _compressible(content_type: str) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return media_type.startswith("text/") or media_type in COMPRESSIBLE_TYPES
+
+
+# Compressed bodies of ETagged responses: one compression per version of a
+# representation, then served from memory. Keys carry the ETag, so a new
+# version is a new key and the old one ages out without invalidation.
+compressed_cache = ResponseCache(
+    max_entries=int(os.getenv("COMPRESSION_CACHE_MAX_ENTRIES", "1024")),
+    max_bytes=int(os.getenv("COMPRESSION_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "300")),
+)
+
+
+class CompressionMiddleware:
+    """ASGI middleware negotiating gzip, brotli or zstd for text and JSON responses.
+
+    Complete bodies under COMPRESSION_MIN_SIZE are left alone; streamed bodies
+    are compressed chunk by chunk. Compressed responses get a weak ETag, since
+    the bytes differ from the identity ones; is_not_modified accepts either.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+        coding = negotiate(accept_encoding) if accept_encoding else None
+        start = None
+        stream = None
+
+        async def send_compressed(message):
+            nonlocal start, stream
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", []))
+                headers = MutableHeaders(scope=message)
+                if (message["status"] < 200 or message["status"] in (204, 304) or "content-encoding" in headers
+                        or not _compressible(headers.get("content-type", ""))):
+                    await send(message)
+                    return
+                headers.add_vary_header("Accept-Encoding")
+                if coding is None:
+                    await send(message)
+                else:
+                    start = message
+                return
+
+            if start is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            headers = MutableHeaders(scope=start)
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if stream is None and not more_body:
+                # The whole body in one message
+                if len(body) < self.minimum_size:
+                    await send(start)
+                    await send(message)
+                else:
+                    body = self._compress(scope, coding, headers, body)
+                    headers["Content-Length"] = str(len(body))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body})
+                start = None
+                return
+
+            if stream is None:
+                stream = CODECS[coding].stream()
+                headers["Content-Encoding"] = coding
+                if "content-length" in headers:
+                    del headers["content-length"]
+                self._weaken_etag(headers)
+                await send(start)
+            compress, finish = stream
+            chunk = compress(body) if body else b""
+            if not more_body:
+                chunk += finish()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _compress(self, scope, coding: str, headers: MutableHeaders, body: bytes) -> bytes:
+        """Compress a whole body, reusing the bytes of an earlier response with the same ETag"""
+        etag = headers.get("etag")
+        key = f"{coding} {scope['path']}?{scope['query_string'].decode('latin-1')} {etag}" if etag else None
+        cached = compressed_cache.get(key) if key else None
+        if cached:
+            compressed = cached.body
+        else:
+            compressed = CODECS[coding].compress(body)
+            if key:
+                compressed_cache.set(key, compressed)
+        headers["Content-Encoding"] = coding
+        self._weaken_etag(headers)
+        return compressed
+
+    @staticmethod
+    def _weaken_etag(headers: MutableHeaders):
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
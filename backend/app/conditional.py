@@ -0,0 +1,79 @@
+import hashlib
+import os
+import time
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+
+from cache import json_response
+
+# Cache-Control sent with each router's GET responses
+CACHE_CONTROL = {
+    "products": os.getenv("CACHE_CONTROL_PRODUCTS", "public, max-age=0, s-maxage=60, stale-while-revalidate=300"),
+    "categories": os.getenv("CACHE_CONTROL_CATEGORIES", "public, max-age=0, s-maxage=300, stale-while-revalidate=3600"),
+    "settings": os.getenv("CACHE_CONTROL_SETTINGS", "public, max-age=0, s-maxage=300, stale-while-revalidate=3600"),
+}
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag from the values that identify one version of a representation"""
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:24]
+    return f'"{digest}"'
+
+
+def to_utc(value) -> Optional[datetime]:
+    """Normalize a stored timestamp; naive datetimes are UTC, ISO strings are local time"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).astimezone(timezone.utc)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def validators(resource: str, etag: str, *modified) -> Dict[str, str]:
+    """ETag, Last-Modified and Cache-Control headers for a response"""
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL[resource]}
+    timestamps = [to_utc(value) for value in modified if value is not None]
+    if timestamps:
+        last_modified = max(timestamps).timestamp()
+        # Last-Modified has whole seconds: until the second of the last write is
+        # over, another write could follow within it and still match, so leave
+        # it out and let clients revalidate with the ETag alone
+        if int(last_modified) + 1 <= time.time():
+            headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+    return headers
+
+
+def is_not_modified(request: Request, headers: Dict[str, str]) -> bool:
+    """Evaluate If-None-Match, or failing that If-Modified-Since, against response validators"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        etag = headers["ETag"]
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return any(tag == etag or tag == f"W/{etag}" for tag in candidates)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    last_modified = headers.get("Last-Modified")
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    return Response(status_code=304, headers=headers)
+
+
+def respond(request: Request, body: bytes, headers: Dict[str, str]) -> Response:
+    """Serve a JSON body, or a 304 when the client already holds this version"""
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+    return json_response(body, headers)
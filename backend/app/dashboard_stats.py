@@ -0,0 +1,71 @@
+import os
+from typing import Dict, Optional
+
+from sqlalchemy import bindparam, delete, insert, update
+from sqlmodel import Session, select, func
+
+from models import Order, Product, StoreCounter
+
+# Products with less stock than this count as low stock
+LOW_STOCK_THRESHOLD = int(os.getenv("LOW_STOCK_THRESHOLD", "5"))
+
+# products: catalog size; orders and revenue: confirmed orders and their totals
+COUNTERS = ("products", "orders", "revenue")
+
+
+def adjust_counters(session: Session, **deltas: float):
+    """Apply counter deltas as part of the caller's transaction; rows missing are rebuilt"""
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    counters = StoreCounter.__table__
+    result = session.exec(
+        update(counters)
+        .where(counters.c.name == bindparam("counter"))
+        .values(value=counters.c.value + bindparam("delta")),
+        params=[{"counter": name, "delta": delta} for name, delta in sorted(deltas.items())],
+    )
+    if result.rowcount != len(deltas) and session.get_bind().dialect.supports_sane_multi_rowcount:
+        rebuild_counters(session)
+
+
+def _recount(session: Session) -> Dict[str, float]:
+    confirmed = session.exec(
+        select(func.count(Order.id), func.coalesce(func.sum(Order.total), 0.0)).where(Order.status == "confirmed")
+    ).one()
+    return {
+        "products": session.exec(select(func.count(Product.id))).one(),
+        "orders": confirmed[0],
+        "revenue": round(confirmed[1], 2),
+    }
+
+
+def rebuild_counters(session: Session) -> Dict[str, float]:
+    """Recompute every counter from the products and orders; returns the corrections made"""
+    stored = dict(session.exec(select(StoreCounter.name, StoreCounter.value)).all())
+    values = _recount(session)
+    session.exec(delete(StoreCounter))
+    session.exec(insert(StoreCounter), params=[{"name": name, "value": value} for name, value in values.items()])
+    return {name: value - stored.get(name, 0) for name, value in values.items() if value != stored.get(name)}
+
+
+def ensure_counters(session: Session):
+    """Build the counters for databases created before they existed, or seeded since"""
+    stored = dict(session.exec(select(StoreCounter.name, StoreCounter.value)).all())
+    if set(stored) != set(COUNTERS) or stored["products"] != session.exec(select(func.count(Product.id))).one():
+        rebuild_counters(session)
+        session.commit()
+
+
+def get_stats(session: Session, low_stock_threshold: Optional[int] = None) -> Dict:
+    """DashboardStats body: stored counters plus an index-only low-stock count"""
+    threshold = LOW_STOCK_THRESHOLD if low_stock_threshold is None else low_stock_threshold
+    counters = dict(session.exec(select(StoreCounter.name, StoreCounter.value)).all())
+    low_stock = session.exec(select(func.count()).select_from(Product).where(Product.stock < threshold)).one()
+    return {
+        "total_products": int(counters.get("products", 0)),
+        "total_revenue": round(counters.get("revenue", 0.0), 2),
+        "total_orders": int(counters.get("orders", 0)),
+        "low_stock_products": low_stock,
+        "low_stock_threshold": threshold,
+    }
@@ -1,25 +1,199 @@
 import os
+import asyncio
+import functools
+from fastapi.concurrency import run_in_threadpool
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.routing import APIRoute
+from pydantic import TypeAdapter
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.util import greenlet_spawn
 from sqlmodel import SQLModel, create_engine, Session, select
+from starlette.responses import Response
 from dotenv import load_dotenv
-from models import SettingsDB, Product, Review, Category, ProductCategoryLink
-from datetime import datetime
+from models import SettingsDB
+from versions import ensure_versions
+from pool_metrics import pool_metrics, instrumented
+from request_metrics import METRICS_ENABLED, request_metrics
+from serialization import loads
+from typing import List
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///:memory:")
 
-engine = create_engine(DATABASE_URL)
+# An async driver in the URL (sqlite+aiosqlite://, postgresql+asyncpg://) selects async mode
+ASYNC_MODE = make_url(DATABASE_URL).get_dialect().is_async
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
+def _sqlite_pragmas(in_memory: bool) -> List[str]:
+    pragmas = [
+        f"PRAGMA busy_timeout = {int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))}",
+        f"PRAGMA cache_size = {int(os.getenv('SQLITE_CACHE_SIZE', '-65536'))}",
+    ]
+    if not in_memory:
+        # WAL lets readers run alongside a writer; NORMAL is durable in WAL mode
+        pragmas += [
+            f"PRAGMA journal_mode = {os.getenv('SQLITE_JOURNAL_MODE', 'WAL')}",
+            f"PRAGMA synchronous = {os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')}",
+            f"PRAGMA mmap_size = {int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))}",
+        ]
+    return pragmas
+
+
+def create_db_engine(url: str):
+    """Build the engine for a database URL, with pool settings from the environment.
+
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE and
+    DB_POOL_PRE_PING size the pool; SQLite connections also get the SQLITE_*
+    pragmas. Checkout waits, in-use counts and timeouts go to pool_metrics.
+    """
+    database_url = make_url(url)
+    dialect = database_url.get_dialect()
+    pool_class = dialect.get_pool_class(database_url)
+    # JSON columns (images, tags, specifications, ...) are decoded on every product row
+    options = {"poolclass": instrumented(pool_class), "json_deserializer": loads}
+    if issubclass(pool_class, QueuePool):
+        options.update(
+            pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+            pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+            pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+            pool_pre_ping=_env_flag("DB_POOL_PRE_PING", True),
+        )
+
+    if dialect.is_async:
+        from sqlalchemy.ext.asyncio import create_async_engine
+        new_engine = create_async_engine(url, **options)
+        sync_engine = new_engine.sync_engine
+    else:
+        new_engine = sync_engine = create_engine(url, **options)
+
+    if database_url.get_backend_name() == "sqlite":
+        in_memory = database_url.database in (None, "", ":memory:")
+        pragmas = _sqlite_pragmas(in_memory)
+
+        @event.listens_for(sync_engine, "connect")
+        def apply_pragmas(dbapi_connection, record):
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+
+    pool_metrics.attach(sync_engine)
+    if METRICS_ENABLED:
+        request_metrics.attach(sync_engine)
+    return new_engine
+
+
+if ASYNC_MODE:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    async_engine = create_db_engine(DATABASE_URL)
+    # The sync facade of the async engine; only usable inside run_sync()
+    engine = async_engine.sync_engine
+
+    async def get_session():
+        async with AsyncSession(async_engine, sync_session_class=Session) as session:
+            yield session.sync_session
+else:
+    async_engine = None
+    engine = create_db_engine(DATABASE_URL)
+
+    def get_session():
+        with Session(engine) as session:
+            yield session
+
+
+async def run_sync(fn, *args, **kwargs):
+    """Run blocking database code: on the event loop through the async driver in
+    async mode, in the threadpool otherwise"""
+    if ASYNC_MODE:
+        return await greenlet_spawn(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, *args, **kwargs)
+
+
+async def iterate_sync(iterator):
+    """Drive a blocking iterator (e.g. one reading batches from its own session)
+    through run_sync, one item at a time, for StreamingResponse"""
+    done = object()
+    try:
+        while True:
+            item = await run_sync(next, iterator, done)
+            if item is done:
+                break
+            yield item
+    finally:
+        if hasattr(iterator, "close"):
+            await run_sync(iterator.close)
+
+
+class SessionRoute(APIRoute):
+    """Route class for routers whose handlers use get_session.
+
+    The response model is built while the handler's session is still open, and
+    the session is closed before FastAPI serializes the response. Otherwise
+    finished requests keep their pooled connection while they wait for a
+    threadpool slot to serialize in, and a burst of requests larger than the
+    threadpool deadlocks on the pool.
+
+    In async mode plain `def` handlers also become coroutines that run on the
+    event loop, with their session IO awaited through the async driver, instead
+    of occupying a threadpool slot.
+    """
+
+    def __init__(self, path, endpoint, **kwargs):
+        # include_router() builds the route again from the already wrapped endpoint
+        if not getattr(endpoint, "_session_route", False) and not asyncio.iscoroutinefunction(endpoint):
+            endpoint = _session_endpoint(endpoint, kwargs.get("response_model"))
+        super().__init__(path, endpoint, **kwargs)
+
+
+def _session_endpoint(endpoint, response_model):
+    adapter = None
+    if response_model is not None and not isinstance(response_model, DefaultPlaceholder):
+        adapter = TypeAdapter(response_model)
+
+    def call(*args, **kwargs):
+        try:
+            result = endpoint(*args, **kwargs)
+            if adapter is None or result is None or isinstance(result, Response):
+                return result
+            return adapter.validate_python(result, from_attributes=True)
+        finally:
+            for value in kwargs.values():
+                if isinstance(value, Session):
+                    value.close()
+
+    if not ASYNC_MODE:
+        run = functools.wraps(endpoint)(call)
+    else:
+        @functools.wraps(endpoint)
+        async def run(*args, **kwargs):
+            return await greenlet_spawn(call, *args, **kwargs)
+
+    run._session_route = True
+    return run
 
-def get_session():
-    with Session(engine) as session:
-        yield session
 
 def init_db():
-    """Initialize database tables"""
+    """Create missing tables, indexes, version rows and the default settings"""
     SQLModel.metadata.create_all(engine)
+
+    # create_all skips new indexes on tables that already exist
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
     
     # Initialize default settings
     with Session(engine) as session:
+        ensure_versions(session)
+
         settings = session.exec(select(SettingsDB)).first()
         if not settings:
             default_settings = SettingsDB(
@@ -33,200 +207,3 @@ def init_db():
             )
             session.add(default_settings)
             session.commit()
-        
-        # Initialize default categories
-        existing_categories = session.exec(select(Category)).first()
-        if not existing_categories:
-            initial_categories = [
-                Category(
-                    name="Lighting",
-                    description="Traditional and modern lighting solutions",
-                    slug="lighting"
-                ),
-                Category(
-                    name="Furniture",
-                    description="Antique and contemporary furniture pieces",
-                    slug="furniture"
-                ),
-                Category(
-                    name="Decor",
-                    description="Home decor and decorative items",
-                    slug="decor"
-                )
-            ]
-            for category in initial_categories:
-                session.add(category)
-            session.commit()
-            print(f"✅ Added {len(initial_categories)} initial categories to database")
-        
-        # Add initial products if database is empty
-        existing_products = session.exec(select(Product)).first()
-        if not existing_products:
-            initial_products = [
-                Product(
-                    name="Vintage Brass Lamp",
-                    description="Exquisite vintage brass lamp with intricate engravings and traditional design. Perfect centerpiece for any heritage home, featuring handcrafted details and warm ambient lighting.",
-                    price=8500,
-                    stock=15,
-                    images=[
-                        "https://images.unsplash.com/photo-1513506003901-1e6a229e2d15?w=500",
-                        "https://images.unsplash.com/photo-1507473885765-e6ed057f782c?w=500"
-                    ],
-                    sku="LIT-BRL-001",
-                    brand="Heritage Crafts",
-                    tags=["brass", "lamp", "vintage", "lighting", "bestseller"],
-                    original_price=9500,
-                    in_stock=True,
-                    features=["Handcrafted brass", "Traditional design", "Warm ambient lighting", "Intricate engravings"],
-                    specifications={"material": "brass", "height": "18 inches", "weight": "2.5 kg", "warranty": "1 year"},
-                    shipping={"weight": "3 kg", "dimensions": "20x20x25 cm"},
-                    created_at=datetime.now().isoformat(),
-                    updated_at=datetime.now().isoformat()
-                ),
-                Product(
-                    name="Antique Wooden Cabinet",
-                    description="Stunning antique wooden cabinet with hand-carved details and traditional Bengali motifs. Features multiple compartments and brass hardware. A true statement piece for collectors.",
-                    price=45000,
-                    stock=5,
-                    images=[
-                        "https://images.unsplash.com/photo-1595428774223-ef52624120d2?w=500",
-                        "https://images.unsplash.com/photo-1555041469-a586c61ea9bc?w=500"
-                    ],
-                    sku="FUR-CAB-002",
-                    brand="Antique Collection",
-                    tags=["furniture", "cabinet", "antique", "wood", "new arrival"],
-                    original_price=50000,
-                    in_stock=True,
-                    features=["Hand-carved details", "Multiple compartments", "Brass hardware", "Traditional Bengali motifs"],
-                    specifications={"material": "solid wood", "dimensions": "120x45x180 cm", "weight": "45 kg", "warranty": "2 years"},
-                    shipping={"weight": "50 kg", "dimensions": "130x55x190 cm"},
-                    created_at=datetime.now().isoformat(),
-                    updated_at=datetime.now().isoformat()
-                ),
-                Product(
-                    name="Traditional Brass Pottery",
-                    description="Authentic traditional brass pottery with intricate designs. Handcrafted by skilled artisans using centuries-old techniques. Perfect for displaying flowers or as standalone decor.",
-                    price=3200,
-                    stock=25,
-                    images=[
-                        "https://images.unsplash.com/photo-1610701596007-11502861dcfa?w=500",
-                        "https://images.unsplash.com/photo-1578500494198-246f612d3b3d?w=500"
-                    ],
-                    sku="DEC-POT-003",
-                    brand="Brass Artisans",
-                    tags=["brass", "pottery", "decor", "handcrafted", "traditional"],
-                    original_price=3500,
-                    in_stock=True,
-                    features=["Handcrafted brass", "Intricate designs", "Traditional techniques", "Multi-purpose use"],
-                    specifications={"material": "brass", "height": "12 inches", "diameter": "8 inches", "weight": "1.2 kg"},
-                    shipping={"weight": "1.5 kg", "dimensions": "15x15x20 cm"},
-                    created_at=datetime.now().isoformat(),
-                    updated_at=datetime.now().isoformat()
-                ),
-                Product(
-                    name="Vintage Photo Frame",
-                    description="Elegant vintage photo frame with ornate brass detailing and glass protection. Holds standard photo sizes and adds a touch of nostalgia to any space.",
-                    price=2800,
-                    stock=35,
-                    images=[
-                        "https://images.unsplash.com/photo-1582139329536-e7284fece509?w=500",
-                        "https://images.unsplash.com/photo-1535632066927-ab7c9ab60908?w=500"
-                    ],
-                    sku="DEC-FRM-004",
-                    brand="Heritage Frames",
-                    tags=["frame", "vintage", "photo", "decor", "brass"],
-                    original_price=3200,
-                    in_stock=True,
-                    features=["Ornate brass detailing", "Glass protection", "Standard photo sizes", "Vintage design"],
-                    specifications={"material": "wood and brass", "dimensions": "8x10 inches", "weight": "0.8 kg", "warranty": "6 months"},
-                    shipping={"weight": "1 kg", "dimensions": "12x12x5 cm"},
-                    created_at=datetime.now().isoformat(),
-                    updated_at=datetime.now().isoformat()
-                ),
-                Product(
-                    name="Antique Mirror",
-                    description="Magnificent antique mirror with hand-carved wooden frame featuring traditional Bengali patterns. Large size perfect for entryways or bedrooms. Limited edition piece.",
-                    price=15000,
-                    stock=8,
-                    images=[
-                        "https://images.unsplash.com/photo-1618220179428-22790b461013?w=500",
-                        "https://images.unsplash.com/photo-1513519245088-0e12902e35ca?w=500"
-                    ],
-                    sku="DEC-MIR-005",
-                    brand="Antique Collection",
-                    tags=["mirror", "antique", "decor", "wood", "limited"],
-                    original_price=18000,
-                    in_stock=True,
-                    features=["Hand-carved frame", "Traditional Bengali patterns", "Large size", "Limited edition"],
-                    specifications={"material": "wood and glass", "dimensions": "80x60 cm", "weight": "8 kg", "warranty": "1 year"},
-                    shipping={"weight": "10 kg", "dimensions": "90x70x10 cm"},
-                    created_at=datetime.now().isoformat(),
-                    updated_at=datetime.now().isoformat()
-                ),
-                Product(
-                    name="Classic Wall Clock",
-                    description="Classic wall clock with brass frame and Roman numerals. Features silent quartz movement and vintage design. Perfect blend of functionality and heritage aesthetics.",
-                    price=6500,
-                    stock=20,
-                    images=[
-                        "https://images.unsplash.com/photo-1563861826100-9cb868fdbe1c?w=500",
-                        "https://images.unsplash.com/photo-1509048191080-d2984bad6ae5?w=500"
-                    ],
-                    sku="DEC-CLK-006",
-                    brand="Time Heritage",
-                    tags=["clock", "wall clock", "brass", "classic", "decor"],
-                    original_price=7500,
-                    in_stock=True,
-                    features=["Brass frame", "Roman numerals", "Silent quartz movement", "Vintage design"],
-                    specifications={"material": "brass and wood", "diameter": "30 cm", "weight": "2 kg", "warranty": "1 year"},
-                    shipping={"weight": "2.5 kg", "dimensions": "35x35x8 cm"},
-                    created_at=datetime.now().isoformat(),
-                    updated_at=datetime.now().isoformat()
-                )
-            ]
-            
-            for product in initial_products:
-                session.add(product)
-            session.commit()
-            print(f"✅ Added {len(initial_products)} initial products to database")
-            
-            # Create product-category associations
-            product_category_links = [
-                ProductCategoryLink(product_id=1, category_id=1),  # Vintage Brass Lamp -> Lighting
-                ProductCategoryLink(product_id=2, category_id=2),  # Antique Wooden Cabinet -> Furniture
-                ProductCategoryLink(product_id=3, category_id=3),  # Traditional Brass Pottery -> Decor
-                ProductCategoryLink(product_id=4, category_id=3),  # Vintage Photo Frame -> Decor
-                ProductCategoryLink(product_id=5, category_id=3),  # Antique Mirror -> Decor
-                ProductCategoryLink(product_id=6, category_id=3),  # Classic Wall Clock -> Decor
-            ]
-            
-            for link in product_category_links:
-                session.add(link)
-            session.commit()
-            print(f"✅ Created {len(product_category_links)} product-category associations")
-            
-            # Add sample reviews for the first product (Vintage Brass Lamp)
-            sample_reviews = [
-                Review(
-                    product_id=1,
-                    author="Ahmed Hassan",
-                    rating=5,
-                    comment="Absolutely stunning piece! The craftsmanship is incredible. Perfect addition to my living room.",
-                    verified=True,
-                    created_at=datetime(2025, 12, 28, 10, 30, 0)
-                ),
-                Review(
-                    product_id=1,
-                    author="Nadia Rahman",
-                    rating=5,
-                    comment="Beautiful antique lamp with authentic Bengali design. Fast delivery and well-packaged.",
-                    verified=True,
-                    created_at=datetime(2025, 12, 15, 14, 20, 0)
-                )
-            ]
-            
-            for review in sample_reviews:
-                session.add(review)
-            session.commit()
-            print(f"✅ Added {len(sample_reviews)} sample reviews to database")
-
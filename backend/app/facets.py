@@ -0,0 +1,305 @@
+import json
+import os
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, bindparam, case, delete, insert, tuple_, update
+from sqlmodel import Session, select, func
+
+from models import Product, ProductTag, ProductSpec, FacetCount
+
+# Lower bounds of the price facet buckets; the last bucket is open-ended
+PRICE_BUCKETS = [float(bound) for bound in os.getenv("FACET_PRICE_BUCKETS", "0,1000,5000,10000,50000").split(",")]
+# Values returned per facet, most frequent first
+MAX_FACET_VALUES = int(os.getenv("FACET_MAX_VALUES", "50"))
+
+# Product fields a write must touch to change its facets or its filter matches
+FACET_FIELDS = {"brand", "tags", "specifications", "price", "stock", "in_stock"}
+
+
+class ProductFilters(NamedTuple):
+    brands: List[str] = []
+    tags: List[str] = []
+    specs: List[Tuple[str, str]] = []
+    in_stock: Optional[bool] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+
+    def __bool__(self):
+        return any(value not in (None, []) for value in self)
+
+
+def _split(value: Optional[str]) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()] if value else []
+
+
+def parse_filters(
+    brand: Optional[str] = None,
+    tags: Optional[str] = None,
+    spec: Optional[List[str]] = None,
+    in_stock: Optional[bool] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+) -> ProductFilters:
+    """Filters from query parameters; lists are comma-separated, spec is key:value"""
+    specs = []
+    for item in spec or []:
+        key, separator, value = item.partition(":")
+        if not separator or not key.strip():
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="spec filters must look like key:value")
+        specs.append((key.strip(), value.strip()))
+    return ProductFilters(_split(brand), _split(tags), specs, in_stock, min_price, max_price)
+
+
+def apply_filters(statement, filters: ProductFilters):
+    """Restrict a statement over Product to the products matching the filters.
+
+    Values of one facet are OR'ed, different facets are AND'ed; tags and
+    specifications go through their indexed side tables.
+    """
+    if filters.brands:
+        statement = statement.where(Product.brand.in_(filters.brands))
+    if filters.tags:
+        statement = statement.where(Product.id.in_(
+            select(ProductTag.product_id).where(ProductTag.tag.in_(filters.tags))
+        ))
+    specs: Dict[str, List[str]] = {}
+    for key, value in filters.specs:
+        specs.setdefault(key, []).append(value)
+    for key, values in specs.items():
+        statement = statement.where(Product.id.in_(
+            select(ProductSpec.product_id).where(ProductSpec.key == key, ProductSpec.value.in_(values))
+        ))
+    if filters.in_stock is not None:
+        statement = statement.where(Product.in_stock == filters.in_stock)
+    if filters.min_price is not None:
+        statement = statement.where(Product.price >= filters.min_price)
+    if filters.max_price is not None:
+        statement = statement.where(Product.price <= filters.max_price)
+    return statement
+
+
+def spec_values(specifications: Optional[Dict]) -> List[Tuple[str, str]]:
+    """Facetable (key, value) pairs of a specifications blob: scalars and lists of scalars"""
+    pairs = []
+    for key, value in (specifications or {}).items():
+        for item in value if isinstance(value, list) else [value]:
+            if isinstance(item, str):
+                pairs.append((key, item))
+            elif isinstance(item, (bool, int, float)):
+                pairs.append((key, json.dumps(item)))
+    return list(dict.fromkeys(pairs))
+
+
+def _facet_values(products: Iterable[Product]) -> Counter:
+    values = Counter()
+    for product in products:
+        for tag in dict.fromkeys(product.tags or []):
+            values[("tag", tag)] += 1
+        for key, value in spec_values(product.specifications):
+            values[(f"spec:{key}", value)] += 1
+    return values
+
+
+def _indexed_values(session: Session, product_ids: List[int]) -> Counter:
+    """Tag and spec values of products as the side tables currently hold them"""
+    values = Counter()
+    statement = select(ProductTag.tag, func.count()).where(ProductTag.product_id.in_(product_ids)).group_by(ProductTag.tag)
+    for tag, count in session.exec(statement).all():
+        values[("tag", tag)] += count
+    statement = (
+        select(ProductSpec.key, ProductSpec.value, func.count())
+        .where(ProductSpec.product_id.in_(product_ids))
+        .group_by(ProductSpec.key, ProductSpec.value)
+    )
+    for key, value, count in session.exec(statement).all():
+        values[(f"spec:{key}", value)] += count
+    return values
+
+
+def _adjust_counts(session: Session, deltas: Counter):
+    """Apply count deltas to FacetCount: one executemany of updates, one of inserts"""
+    deltas = {facet: delta for facet, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    existing = set(session.exec(
+        select(FacetCount.facet, FacetCount.value).where(tuple_(FacetCount.facet, FacetCount.value).in_(list(deltas)))
+    ).all())
+    counts = FacetCount.__table__
+    updates = [{"f": facet, "v": value, "delta": delta} for (facet, value), delta in deltas.items() if (facet, value) in existing]
+    inserts = [{"facet": facet, "value": value, "product_count": delta}
+               for (facet, value), delta in deltas.items() if (facet, value) not in existing]
+    if updates:
+        session.exec(
+            update(counts)
+            .where(counts.c.facet == bindparam("f"), counts.c.value == bindparam("v"))
+            .values(product_count=counts.c.product_count + bindparam("delta")),
+            params=updates,
+        )
+    if inserts:
+        session.exec(insert(FacetCount), params=inserts)
+
+
+def index_facets(session: Session, products: List[Product], new: bool = False):
+    """Sync the tag/spec side tables and FacetCount for written (flushed) products"""
+    if not products:
+        return
+    product_ids = [product.id for product in products]
+    deltas = _facet_values(products)
+    if not new:
+        deltas.subtract(_indexed_values(session, product_ids))
+        session.exec(delete(ProductTag).where(ProductTag.product_id.in_(product_ids)))
+        session.exec(delete(ProductSpec).where(ProductSpec.product_id.in_(product_ids)))
+
+    tags = [{"product_id": product.id, "tag": tag} for product in products for tag in dict.fromkeys(product.tags or [])]
+    specs = [{"product_id": product.id, "key": key, "value": value}
+             for product in products for key, value in spec_values(product.specifications)]
+    if tags:
+        session.exec(insert(ProductTag), params=tags)
+    if specs:
+        session.exec(insert(ProductSpec), params=specs)
+    _adjust_counts(session, deltas)
+
+
+def remove_facets(session: Session, product_ids: List[int]):
+    """Drop deleted products from the side tables and FacetCount"""
+    deltas = Counter()
+    deltas.subtract(_indexed_values(session, product_ids))
+    session.exec(delete(ProductTag).where(ProductTag.product_id.in_(product_ids)))
+    session.exec(delete(ProductSpec).where(ProductSpec.product_id.in_(product_ids)))
+    _adjust_counts(session, deltas)
+
+
+def rebuild_facets(session: Session):
+    """Rebuild the side tables and FacetCount from the product JSON columns"""
+    session.exec(delete(ProductTag))
+    session.exec(delete(ProductSpec))
+    session.exec(delete(FacetCount))
+    deltas = Counter()
+    last_id = 0
+    while True:
+        statement = (
+            select(Product.id, Product.tags, Product.specifications)
+            .where(Product.id > last_id).order_by(Product.id).limit(1000)
+        )
+        products = session.exec(statement).all()
+        if not products:
+            break
+        last_id = products[-1].id
+        tags = [{"product_id": product.id, "tag": tag} for product in products for tag in dict.fromkeys(product.tags or [])]
+        specs = [{"product_id": product.id, "key": key, "value": value}
+                 for product in products for key, value in spec_values(product.specifications)]
+        if tags:
+            session.exec(insert(ProductTag), params=tags)
+        if specs:
+            session.exec(insert(ProductSpec), params=specs)
+        deltas.update(_facet_values(products))
+    if deltas:
+        session.exec(insert(FacetCount), params=[
+            {"facet": facet, "value": value, "product_count": count} for (facet, value), count in deltas.items()
+        ])
+
+
+def ensure_facets(session: Session):
+    """Build the side tables once for databases created before they existed"""
+    if session.exec(select(Product.id)).first() and not session.exec(select(FacetCount.facet)).first():
+        rebuild_facets(session)
+        session.commit()
+
+
+def _price_bucket(lower: float, upper: Optional[float]) -> str:
+    return f"{lower:g}-{upper:g}" if upper is not None else f"{lower:g}+"
+
+
+def _top(counts: Dict[str, Counter]) -> Dict[str, List[Dict]]:
+    return {
+        facet: [{"value": value, "count": count} for value, count in values.most_common(MAX_FACET_VALUES) if count > 0]
+        for facet, values in sorted(counts.items())
+    }
+
+
+def _stock_and_prices(session: Session, matched, bounds: List[Tuple[float, Optional[float]]]) -> Tuple[int, int, List[int]]:
+    """Matching, in stock and per price bucket counts in one pass over the matching products"""
+    aggregates = [func.count(), func.coalesce(func.sum(case((Product.in_stock, 1), else_=0)), 0)]
+    for lower, upper in bounds:
+        condition = Product.price >= lower if upper is None else and_(Product.price >= lower, Product.price < upper)
+        aggregates.append(func.coalesce(func.sum(case((condition, 1), else_=0)), 0))
+    statement = select(*aggregates)
+    if matched is not None:
+        statement = statement.where(Product.id.in_(matched))
+    total, in_stock, *buckets = session.exec(statement).one()
+    return total, in_stock, buckets
+
+
+def facet_counts(session: Session, filters: ProductFilters, scope=None) -> Dict:
+    """Count products per facet value, each facet under every filter but its own.
+
+    Leaving a facet's own filter out (disjunctive faceting) keeps its other
+    values on offer: with brand=A the brand facet still lists B and C, counted
+    as selecting them would give. `scope` is a select of product ids narrowing
+    every count (e.g. a category). Unfiltered tag/spec counts are read from
+    FacetCount; filtered ones are grouped from the indexed side tables.
+    """
+    def matching(**cleared):
+        """Select of the ids matching the filters but the cleared ones; None when nothing narrows"""
+        narrowed = filters._replace(**cleared)
+        if not narrowed and scope is None:
+            return None
+        return apply_filters(scope if scope is not None else select(Product.id), narrowed)
+
+    def within(statement, column, matched):
+        return statement if matched is None else statement.where(column.in_(matched))
+
+    counts: Dict[str, Counter] = {}
+    statement = within(
+        select(Product.brand, func.count()).where(Product.brand.is_not(None)), Product.id, matching(brands=[])
+    )
+    counts["brand"] = Counter(dict(session.exec(statement.group_by(Product.brand)).all()))
+
+    matched = matching(tags=[])
+    if matched is None:
+        statement = select(FacetCount.value, FacetCount.product_count).where(FacetCount.facet == "tag")
+    else:
+        statement = select(ProductTag.tag, func.count()).where(ProductTag.product_id.in_(matched)).group_by(ProductTag.tag)
+    counts["tag"] = Counter(dict(session.exec(statement).all()))
+
+    # Keys without a filter share one grouping under every filter; each filtered key gets its own
+    filtered_keys = list(dict.fromkeys(key for key, _ in filters.specs))
+    matched = matching()
+    if matched is None:
+        statement = select(FacetCount.facet, FacetCount.value, FacetCount.product_count).where(FacetCount.facet.startswith("spec:"))
+        for facet, value, count in session.exec(statement).all():
+            counts.setdefault(facet, Counter())[value] = count
+    else:
+        statement = (
+            select(ProductSpec.key, ProductSpec.value, func.count())
+            .where(ProductSpec.product_id.in_(matched), ProductSpec.key.not_in(filtered_keys))
+            .group_by(ProductSpec.key, ProductSpec.value)
+        )
+        for key, value, count in session.exec(statement).all():
+            counts.setdefault(f"spec:{key}", Counter())[value] = count
+    for key in filtered_keys:
+        others = [spec for spec in filters.specs if spec[0] != key]
+        statement = within(
+            select(ProductSpec.value, func.count()).where(ProductSpec.key == key), ProductSpec.product_id, matching(specs=others)
+        )
+        counts[f"spec:{key}"] = Counter(dict(session.exec(statement.group_by(ProductSpec.value)).all()))
+
+    bounds = list(zip(PRICE_BUCKETS, PRICE_BUCKETS[1:] + [None]))
+    total, in_stock, buckets = _stock_and_prices(session, matched, bounds)
+    in_stock_total = total
+    if filters.in_stock is not None:
+        in_stock_total, in_stock, _ = _stock_and_prices(session, matching(in_stock=None), bounds)
+    if filters.min_price is not None or filters.max_price is not None:
+        _, _, buckets = _stock_and_prices(session, matching(min_price=None, max_price=None), bounds)
+    counts["in_stock"] = Counter({"true": in_stock, "false": in_stock_total - in_stock})
+    counts["price"] = Counter({_price_bucket(lower, upper): count for (lower, upper), count in zip(bounds, buckets)})
+
+    facets = _top(counts)
+    # Price buckets keep their natural order
+    facets["price"] = [
+        {"value": _price_bucket(lower, upper), "count": counts["price"][_price_bucket(lower, upper)]}
+        for lower, upper in bounds
+    ]
+    return {"total": total, "facets": facets}
@@ -0,0 +1,117 @@
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, insert, literal, true, update
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, select, func
+
+from models import Category, CategoryClosure
+
+# Guards the rebuild against parent_id cycles in legacy data
+MAX_DEPTH = 64
+CLOSURE_COLUMNS = ["ancestor_id", "descendant_id", "depth"]
+
+
+def add_category(session: Session, category_id: int, parent_id: Optional[int]):
+    """Link a new (flushed) category under its parent: itself plus the parent's ancestors"""
+    session.exec(insert(CategoryClosure).values(ancestor_id=category_id, descendant_id=category_id, depth=0))
+    if parent_id is not None:
+        session.exec(insert(CategoryClosure).from_select(
+            CLOSURE_COLUMNS,
+            select(CategoryClosure.ancestor_id, literal(category_id), CategoryClosure.depth + 1)
+            .where(CategoryClosure.descendant_id == parent_id),
+        ))
+
+
+def is_descendant(session: Session, category_id: int, ancestor_id: int) -> bool:
+    """Whether category_id is ancestor_id itself or lies below it"""
+    statement = select(CategoryClosure.depth).where(
+        CategoryClosure.ancestor_id == ancestor_id, CategoryClosure.descendant_id == category_id
+    )
+    return session.exec(statement).first() is not None
+
+
+def move_category(session: Session, category_id: int, parent_id: Optional[int]):
+    """Re-hang a category and its whole subtree under another parent (None: a root).
+
+    Two statements whatever the subtree size: unlink the subtree from the old
+    ancestors, then link it to the new parent's ancestors.
+    """
+    subtree = select(CategoryClosure.descendant_id).where(CategoryClosure.ancestor_id == category_id)
+    old_ancestors = select(CategoryClosure.ancestor_id).where(
+        CategoryClosure.descendant_id == category_id, CategoryClosure.depth > 0
+    )
+    session.exec(delete(CategoryClosure).where(
+        CategoryClosure.descendant_id.in_(subtree), CategoryClosure.ancestor_id.in_(old_ancestors)
+    ))
+    if parent_id is None:
+        return
+
+    above = aliased(CategoryClosure)
+    below = aliased(CategoryClosure)
+    session.exec(insert(CategoryClosure).from_select(
+        CLOSURE_COLUMNS,
+        select(above.ancestor_id, below.descendant_id, above.depth + below.depth + 1)
+        .select_from(above)
+        .join(below, true())
+        .where(above.descendant_id == parent_id, below.ancestor_id == category_id),
+    ))
+
+
+def remove_category(session: Session, category: Category):
+    """Unlink a category before deleting it; its children move up to its parent"""
+    below = select(CategoryClosure.descendant_id).where(
+        CategoryClosure.ancestor_id == category.id, CategoryClosure.depth > 0
+    )
+    above = select(CategoryClosure.ancestor_id).where(
+        CategoryClosure.descendant_id == category.id, CategoryClosure.depth > 0
+    )
+    session.exec(
+        update(CategoryClosure)
+        .where(CategoryClosure.descendant_id.in_(below), CategoryClosure.ancestor_id.in_(above))
+        .values(depth=CategoryClosure.depth - 1)
+        .execution_options(synchronize_session=False)
+    )
+    session.exec(delete(CategoryClosure).where(
+        (CategoryClosure.ancestor_id == category.id) | (CategoryClosure.descendant_id == category.id)
+    ))
+    session.exec(
+        update(Category)
+        .where(Category.parent_id == category.id)
+        .values(parent_id=category.parent_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def rebuild_closure(session: Session):
+    """Recompute the closure table from Category.parent_id with one recursive query"""
+    tree = select(
+        Category.id.label("ancestor_id"), Category.id.label("descendant_id"), literal(0).label("depth")
+    ).cte("tree", recursive=True)
+    tree = tree.union_all(
+        select(tree.c.ancestor_id, Category.id, tree.c.depth + 1)
+        .join(Category, Category.parent_id == tree.c.descendant_id)
+        .where(tree.c.depth < MAX_DEPTH)
+    )
+    session.exec(delete(CategoryClosure))
+    session.exec(insert(CategoryClosure).from_select(
+        CLOSURE_COLUMNS, select(tree.c.ancestor_id, tree.c.descendant_id, tree.c.depth)
+    ))
+
+
+def ensure_closure(session: Session):
+    """Build the closure table for databases created before it existed"""
+    categories = session.exec(select(func.count(Category.id))).one()
+    linked = session.exec(select(func.count()).select_from(CategoryClosure).where(CategoryClosure.depth == 0)).one()
+    if categories != linked:
+        rebuild_closure(session)
+        session.commit()
+
+
+def build_tree(categories: List[Category]) -> List[Dict]:
+    """Nest a flat list of categories by parent_id, keeping their order"""
+    nodes = {category.id: {**category.model_dump(), "children": []} for category in categories}
+    roots = []
+    for category in categories:
+        parent = nodes.get(category.parent_id)
+        (parent["children"] if parent else roots).append(nodes[category.id])
+    return roots
@@ -0,0 +1,136 @@
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, update
+from sqlmodel import Session, select, func
+
+from cache import response_cache
+from db import engine
+from models import Order, OrderItem, Product
+from versions import bump
+
+RESERVATION_TTL = timedelta(seconds=int(os.getenv("RESERVATION_TTL_SECONDS", "900")))
+RESERVATION_SWEEP_INTERVAL = float(os.getenv("RESERVATION_SWEEP_SECONDS", "60"))
+
+
+class OutOfStock(Exception):
+    def __init__(self, product_id: int, quantity: int):
+        super().__init__(f"Insufficient stock for product {product_id}")
+        self.product_id = product_id
+        self.quantity = quantity
+
+
+def merge_lines(lines: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Sum quantities per product and sort by product id.
+
+    Every checkout takes its row locks in the same order, so concurrent
+    checkouts of overlapping carts queue up instead of deadlocking.
+    """
+    quantities: Counter = Counter()
+    for product_id, quantity in lines:
+        quantities[product_id] += quantity
+    return sorted(quantities.items())
+
+
+def take_stock(session: Session, product_id: int, quantity: int) -> Optional[float]:
+    """Decrement stock if enough is left, in one conditional UPDATE; returns the price.
+
+    No read-modify-write: the check and the decrement are one statement, so
+    concurrent buyers can never both take the last unit.
+    """
+    now = datetime.now().isoformat()
+    statement = (
+        update(Product)
+        .where(Product.id == product_id, Product.stock >= quantity)
+        .values(stock=Product.stock - quantity, in_stock=Product.stock - quantity > 0, updated_at=now)
+        .returning(Product.price)
+        .execution_options(synchronize_session=False)
+    )
+    return session.exec(statement).scalar_one_or_none()
+
+
+def release_stock(session: Session, quantities: Dict[int, int]):
+    """Put reserved quantities back, one executemany for all products"""
+    if not quantities:
+        return
+    product = Product.__table__
+    statement = (
+        update(product)
+        .where(product.c.id == bindparam("product_id"))
+        .values(
+            stock=product.c.stock + bindparam("quantity"),
+            in_stock=product.c.stock + bindparam("quantity") > 0,
+            updated_at=datetime.now().isoformat(),
+        )
+    )
+    session.exec(statement, params=[
+        {"product_id": product_id, "quantity": quantity} for product_id, quantity in sorted(quantities.items())
+    ])
+
+
+def reserve(session: Session, lines: List[Tuple[int, int]], **order_fields) -> Order:
+    """Take the stock of every line and record a reserved order, all or nothing.
+
+    The caller commits; on OutOfStock it must roll back the lines already taken.
+    """
+    items = []
+    for product_id, quantity in merge_lines(lines):
+        price = take_stock(session, product_id, quantity)
+        if price is None:
+            raise OutOfStock(product_id, quantity)
+        items.append(OrderItem(product_id=product_id, quantity=quantity, unit_price=price))
+
+    now = datetime.utcnow()
+    order = Order(
+        status="reserved",
+        created_at=now,
+        expires_at=now + RESERVATION_TTL,
+        total=round(sum(item.unit_price * item.quantity for item in items), 2),
+        items=items,
+        **order_fields,
+    )
+    session.add(order)
+    return order
+
+
+def expire_reservations(session: Session, now: Optional[datetime] = None) -> List[int]:
+    """Expire every reserved order past its deadline and restock it, in bulk.
+
+    The status change is a conditional UPDATE, so an order confirmed or
+    cancelled concurrently is never restocked twice. Returns the product ids
+    whose stock changed; the caller commits.
+    """
+    now = now or datetime.utcnow()
+    expired = session.exec(
+        update(Order)
+        .where(Order.status == "reserved", Order.expires_at <= now)
+        .values(status="expired")
+        .returning(Order.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    if not expired:
+        return []
+
+    statement = (
+        select(OrderItem.product_id, func.sum(OrderItem.quantity))
+        .where(OrderItem.order_id.in_(expired))
+        .group_by(OrderItem.product_id)
+    )
+    quantities = dict(session.exec(statement).all())
+    release_stock(session, quantities)
+    return list(quantities)
+
+
+def sweep_reservations() -> int:
+    """Expire overdue reservations in one transaction; returns how many products got stock back"""
+    with Session(engine) as session:
+        product_ids = expire_reservations(session)
+        tags = ["products:filtered", *(f"product:{product_id}" for product_id in product_ids)]
+        if product_ids:
+            bump(session, "products", tags=tags)
+        session.commit()
+    if product_ids:
+        response_cache.invalidate(*tags)
+    return len(product_ids)
@@ -1,18 +1,27 @@
+from startup import startup_timer, prepare_database
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
-from sqlmodel import SQLModel, Session, select
-from db import engine, init_db
+import asyncio
+from db import engine, run_sync
 
-from datetime import datetime
-import json
 import os
 
-from models import Product, Review, SettingsDB
-from routers import products, reviews, settings, categories
+from routers import products, reviews, settings, categories, orders, cart, dashboard, system
+from inventory import sweep_reservations, RESERVATION_SWEEP_INTERVAL
+from cache import response_cache
+from compression import COMPRESSION_ENABLED, CompressionMiddleware, compressed_cache
+from replicas import REPLICA_STICKY_SECONDS, ReplicaStickinessMiddleware, replica_set
+from change_feed import CHANGE_FEED_POLL_SECONDS, ChangeFeedMiddleware
+from pool_metrics import pool_metrics
+from request_metrics import METRICS_ENABLED, MetricsMiddleware, request_metrics, render_gauges
 
 from dotenv import load_dotenv
 
+startup_timer.lap("imports")
+
 app = FastAPI(title="karukotha")
 
 # CORS middleware
@@ -22,19 +31,73 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified", "Server-Timing"],
 )
 
+if replica_set.replicas:
+    app.add_middleware(ReplicaStickinessMiddleware)
+    # Right after a write, a replica may still serve the old data: don't cache it
+    response_cache.settle_seconds = REPLICA_STICKY_SECONDS
+
+# Drop what the other workers' writes made stale before serving from the caches
+if CHANGE_FEED_POLL_SECONDS > 0:
+    app.add_middleware(ChangeFeedMiddleware)
+
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# Outermost, so the latency covers every other middleware too
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(products.router, prefix="/api/products", tags=["products"])
 app.include_router(reviews.router, tags=["reviews"])
 app.include_router(settings.router, prefix="/api/settings", tags=["settings"])
 app.include_router(categories.router, prefix="/api/categories", tags=["categories"])
+app.include_router(orders.router, prefix="/api/orders", tags=["orders"])
+app.include_router(cart.router, prefix="/api/cart", tags=["cart"])
+app.include_router(dashboard.router, prefix="/api/dashboard", tags=["dashboard"])
+app.include_router(system.router, prefix="/api/system", tags=["system"])
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Request, SQL, pool and cache metrics for Prometheus"""
+    body = (
+        request_metrics.render()
+        + render_gauges("db_pool", pool_metrics.stats(engine.pool))
+        + render_gauges("response_cache", response_cache.stats())
+        + render_gauges("compressed_cache", compressed_cache.stats())
+    )
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+startup_timer.lap("app")
+
+
+async def expire_reservations_periodically():
+    while True:
+        await asyncio.sleep(RESERVATION_SWEEP_INTERVAL)
+        try:
+            await run_sync(sweep_reservations)
+        except Exception as exc:
+            print(f"❌ Reservation sweep failed: {exc}")
 
 
-# Initialize database on startup
 @app.on_event("startup")
-def on_startup():
-    init_db()
+async def on_startup():
+    # Schema, seed and backfills as STARTUP_MODE says; "skip" leaves them to manage.py init-db
+    await run_sync(prepare_database)
+    startup_timer.report()
+    if RESERVATION_SWEEP_INTERVAL > 0:
+        app.state.reservation_sweeper = asyncio.create_task(expire_reservations_periodically())
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    sweeper = getattr(app.state, "reservation_sweeper", None)
+    if sweeper:
+        sweeper.cancel()
 
 # Export the app as handler for Vercel ASGI support
 handler = app
@@ -0,0 +1,178 @@
+"""Maintenance commands, e.g. `python manage.py rebuild-ratings`"""
+import argparse
+import asyncio
+import sys
+
+from sqlmodel import Session
+
+from bulk import FORMATS, ProductImporter, read_chunks, export_products
+from db import engine, run_sync
+from inventory import sweep_reservations
+from ratings import rebuild_ratings
+from hierarchy import rebuild_closure
+from category_stats import rebuild_counts
+from facets import rebuild_facets
+from dashboard_stats import rebuild_counters
+from related import rebuild_related
+from replicas import copy_to_replicas
+from startup import StartupTimer, prepare_database
+
+
+def init_db_command(args):
+    timer = StartupTimer()
+    prepare_database("full" if args.seed else "schema", timer)
+    phases = ", ".join(f"{name} {ms:g}ms" for name, ms in timer.phases.items())
+    print(f"✅ Database ready ({phases})")
+
+
+def rebuild_ratings_command(args):
+    with Session(engine) as session:
+        rebuild_ratings(session)
+        session.commit()
+    print("✅ Rebuilt review aggregates for every product")
+
+
+def rebuild_category_tree_command(args):
+    with Session(engine) as session:
+        rebuild_closure(session)
+        session.commit()
+    print("✅ Rebuilt the category tree from parent ids")
+
+
+def rebuild_category_counts_command(args):
+    with Session(engine) as session:
+        rebuild_counts(session)
+        session.commit()
+    print("✅ Recounted the products of every category")
+
+
+def rebuild_facets_command(args):
+    with Session(engine) as session:
+        rebuild_facets(session)
+        session.commit()
+    print("✅ Rebuilt the product facet tables and counts")
+
+
+def rebuild_related_command(args):
+    with Session(engine) as session:
+        rebuild_related(session)
+        session.commit()
+    print("✅ Recomputed the related products of every product")
+
+
+def reconcile_stats_command(args):
+    with Session(engine) as session:
+        corrections = rebuild_counters(session)
+        session.commit()
+    if corrections:
+        drift = ", ".join(f"{name} {delta:+g}" for name, delta in corrections.items())
+        print(f"⚠️ Dashboard counters had drifted and were corrected: {drift}")
+    print("✅ Recomputed the dashboard counters from products and orders")
+
+
+def sync_replicas_command(args):
+    try:
+        copied = copy_to_replicas()
+    except ValueError as exc:
+        print(f"❌ {exc}")
+        return
+    if not copied:
+        print("⚠️ No SQLite replicas in DATABASE_REPLICA_URLS; nothing to copy")
+        return
+    print(f"✅ Copied the primary database to {', '.join(copied)}")
+
+
+def expire_reservations_command(args):
+    released = sweep_reservations()
+    print(f"✅ Expired overdue reservations; restocked {released} products")
+
+
+def _file_format(args) -> str:
+    if args.format:
+        return args.format
+    return "csv" if args.file.lower().endswith(".csv") else "ndjson"
+
+
+def import_products_command(args):
+    importer = ProductImporter()
+    with open(args.file, encoding="utf-8-sig", newline="") as lines:
+        for chunk in read_chunks(lines, _file_format(args), args.chunk_size):
+            importer.import_chunk(chunk)
+    importer.finish()
+    report = importer.report
+    for error in report.errors:
+        print(f"❌ Row {error.row} ({error.sku or 'no sku'}): {'; '.join(error.errors)}")
+    print(f"✅ Imported products: {report.created} created, {report.updated} updated, {report.failed} failed")
+
+
+def export_products_command(args):
+    output = open(args.file, "wb") if args.file != "-" else sys.stdout.buffer
+    try:
+        for data in export_products(_file_format(args)):
+            output.write(data)
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+    if args.file != "-":
+        print(f"✅ Exported products to {args.file}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="karukotha maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    init_parser = commands.add_parser(
+        "init-db", help="Create missing tables and indexes and backfill derived tables; run before STARTUP_MODE=skip boots"
+    )
+    init_parser.add_argument("--seed", action="store_true", help="Also add the demo catalog to an empty database")
+    init_parser.set_defaults(handler=init_db_command)
+
+    commands.add_parser(
+        "rebuild-ratings", help="Recompute review count/average/histogram of every product"
+    ).set_defaults(handler=rebuild_ratings_command)
+
+    commands.add_parser(
+        "rebuild-category-tree", help="Recompute the category closure table from parent ids"
+    ).set_defaults(handler=rebuild_category_tree_command)
+
+    commands.add_parser(
+        "rebuild-category-counts", help="Recount the products of every category from the link table"
+    ).set_defaults(handler=rebuild_category_counts_command)
+
+    commands.add_parser(
+        "rebuild-facets", help="Rebuild product tags/specifications lookup tables and facet counts"
+    ).set_defaults(handler=rebuild_facets_command)
+
+    commands.add_parser(
+        "rebuild-related", help="Recompute the related-product lists of every product"
+    ).set_defaults(handler=rebuild_related_command)
+
+    commands.add_parser(
+        "reconcile-stats", help="Recompute the dashboard product/order/revenue counters from scratch"
+    ).set_defaults(handler=reconcile_stats_command)
+
+    commands.add_parser(
+        "sync-replicas", help="Copy a SQLite primary into the SQLite files of DATABASE_REPLICA_URLS, for local replica testing"
+    ).set_defaults(handler=sync_replicas_command)
+
+    commands.add_parser(
+        "expire-reservations", help="Expire overdue stock reservations and put their stock back"
+    ).set_defaults(handler=expire_reservations_command)
+
+    import_parser = commands.add_parser("import-products", help="Upsert products by SKU from an NDJSON or CSV file")
+    import_parser.add_argument("file")
+    import_parser.add_argument("--format", choices=FORMATS, help="Defaults from the file extension")
+    import_parser.add_argument("--chunk-size", type=int, default=500)
+    import_parser.set_defaults(handler=import_products_command)
+
+    export_parser = commands.add_parser("export-products", help="Write the catalog as NDJSON or CSV")
+    export_parser.add_argument("file", help="Output file, or - for stdout")
+    export_parser.add_argument("--format", choices=FORMATS, help="Defaults from the file extension")
+    export_parser.set_defaults(handler=export_products_command)
+
+    args = parser.parse_args(argv)
+    asyncio.run(run_sync(args.handler, args))
+
+
+if __name__ == "__main__":
+    main()
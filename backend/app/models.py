@@ -1,5 +1,5 @@
 from sqlmodel import SQLModel, Field, Column, Relationship
-from sqlalchemy import JSON
+from sqlalchemy import JSON, Index
 from typing import List, Optional, Dict
 from datetime import datetime
 
@@ -8,6 +8,16 @@ class ProductCategoryLink(SQLModel, table=True):
     category_id: int = Field(foreign_key="category.id", primary_key=True)
 
 class Product(SQLModel, table=True):
+    __table_args__ = (
+        # Keyset pagination on (created_at, id) / (price, id)
+        Index("ix_product_created_at_id", "created_at", "id"),
+        Index("ix_product_price_id", "price", "id"),
+        # Brand filter and facet counts
+        Index("ix_product_brand", "brand"),
+        # Dashboard low-stock count, a range scan over the index alone
+        Index("ix_product_stock", "stock"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     description: str
@@ -31,7 +41,18 @@ class Product(SQLModel, table=True):
         link_model=ProductCategoryLink
     )
 
+    # One-to-one review aggregates
+    rating: Optional["ProductRating"] = Relationship(
+        back_populates="product",
+        sa_relationship_kwargs={"uselist": False, "cascade": "all, delete-orphan"}
+    )
+
 class Category(SQLModel, table=True):
+    __table_args__ = (
+        # Category pages resolve their slug; NULL slugs don't collide
+        Index("ix_category_slug", "slug", unique=True),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     description: Optional[str] = None
@@ -60,10 +81,156 @@ class SettingsDB(SQLModel, table=True):
     terms_and_conditions: Optional[str] = None
 
 class Review(SQLModel, table=True):
+    __table_args__ = (
+        # Newest-first review pages per product
+        Index("ix_review_product_created_id", "product_id", "created_at", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     product_id: int = Field(foreign_key="product.id")
     author: str
     rating: int = Field(ge=1, le=5)
     comment: str
     verified: bool = Field(default=False)
-    created_at: datetime = Field(default_factory=datetime.utcnow)
\ No newline at end of file
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class ResourceVersion(SQLModel, table=True):
+    """Write counter per resource collection, used for ETags and cache validation"""
+    name: str = Field(primary_key=True)
+    version: int = Field(default=0)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class ChangeEvent(SQLModel, table=True):
+    """A committed write: the resources it bumped and the cache tags it invalidates, for the other workers"""
+    # Ids never go back, even once the newest events are pruned
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    resources: List[str] = Field(default_factory=list, sa_column=Column(JSON))
+    tags: List[str] = Field(default_factory=list, sa_column=Column(JSON))
+    # The process that wrote it, which already invalidated its own caches
+    origin: str
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+
+def average_rating(rating_sum: int, review_count: int) -> float:
+    return round(rating_sum / review_count, 2) if review_count else 0.0
+
+
+class ProductRating(SQLModel, table=True):
+    """Review aggregates per product, maintained on every review write"""
+    product_id: int = Field(foreign_key="product.id", primary_key=True)
+    review_count: int = Field(default=0)
+    rating_sum: int = Field(default=0)
+    rating_1: int = Field(default=0)
+    rating_2: int = Field(default=0)
+    rating_3: int = Field(default=0)
+    rating_4: int = Field(default=0)
+    rating_5: int = Field(default=0)
+
+    product: Optional[Product] = Relationship(back_populates="rating")
+
+    @property
+    def average_rating(self) -> float:
+        return average_rating(self.rating_sum, self.review_count)
+
+    @property
+    def histogram(self) -> Dict[int, int]:
+        return {star: getattr(self, f"rating_{star}") for star in range(1, 6)}
+
+
+class Order(SQLModel, table=True):
+    """A checkout; "reserved" orders hold their stock until expires_at"""
+    __tablename__ = "orders"
+    __table_args__ = (
+        # Bulk expiry scans reserved orders by deadline
+        Index("ix_orders_status_expires_at", "status", "expires_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    status: str = Field(default="reserved")
+    customer_name: Optional[str] = None
+    customer_email: Optional[str] = None
+    total: float = Field(default=0.0)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: Optional[datetime] = None
+
+    items: List["OrderItem"] = Relationship(
+        back_populates="order",
+        sa_relationship_kwargs={"cascade": "all, delete-orphan", "order_by": "OrderItem.product_id"}
+    )
+
+
+class OrderItem(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    order_id: int = Field(foreign_key="orders.id", index=True)
+    product_id: int = Field(foreign_key="product.id")
+    quantity: int
+    unit_price: float
+
+    order: Optional[Order] = Relationship(back_populates="items")
+
+
+class CategoryClosure(SQLModel, table=True):
+    """One row per (ancestor, descendant) pair of the category tree, self pairs at depth 0"""
+    __table_args__ = (
+        # Ancestors (breadcrumbs) of a category, nearest first
+        Index("ix_categoryclosure_descendant_depth", "descendant_id", "depth"),
+    )
+
+    ancestor_id: int = Field(foreign_key="category.id", primary_key=True)
+    descendant_id: int = Field(foreign_key="category.id", primary_key=True)
+    depth: int = Field(default=0)
+
+
+class CategoryStats(SQLModel, table=True):
+    """Product count per category, maintained on every product write"""
+    category_id: int = Field(foreign_key="category.id", primary_key=True)
+    product_count: int = Field(default=0)
+
+
+class ProductTag(SQLModel, table=True):
+    """Tags of a product, one row each, so tag filters and counts can use an index"""
+    __table_args__ = (
+        Index("ix_producttag_product_id", "product_id"),
+    )
+
+    tag: str = Field(primary_key=True)
+    product_id: int = Field(foreign_key="product.id", primary_key=True)
+
+
+class ProductSpec(SQLModel, table=True):
+    """Scalar specification values of a product, e.g. ("material", "brass")"""
+    __table_args__ = (
+        Index("ix_productspec_product_id", "product_id"),
+    )
+
+    key: str = Field(primary_key=True)
+    value: str = Field(primary_key=True)
+    product_id: int = Field(foreign_key="product.id", primary_key=True)
+
+
+class FacetCount(SQLModel, table=True):
+    """Products per tag ("tag") or specification value ("spec:<key>") over the whole catalog"""
+    facet: str = Field(primary_key=True)
+    value: str = Field(primary_key=True)
+    product_count: int = Field(default=0)
+
+
+class RelatedProduct(SQLModel, table=True):
+    """Top related products of each product, best score first, maintained on product writes"""
+    __table_args__ = (
+        # Lists holding a product, refreshed when that product changes
+        Index("ix_relatedproduct_related_id", "related_id"),
+    )
+
+    product_id: int = Field(foreign_key="product.id", primary_key=True)
+    related_id: int = Field(foreign_key="product.id", primary_key=True)
+    score: float
+
+
+class StoreCounter(SQLModel, table=True):
+    """Running store totals for the dashboard, maintained on every product and order write"""
+    name: str = Field(primary_key=True)
+    value: float = Field(default=0.0)
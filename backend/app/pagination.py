@@ -0,0 +1,47 @@
+import base64
+import json
+from typing import Any, List
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_, tuple_
+
+
+def encode_cursor(*values: Any) -> str:
+    """Encode the sort key of the last row on a page into an opaque cursor"""
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return values
+
+
+def keyset_order(column, id_column, descending: bool = False, nullable: bool = False):
+    """ORDER BY clauses for a (column, id) keyset scan"""
+    if descending:
+        first = column.desc().nulls_last() if nullable else column.desc()
+        return first, id_column.desc()
+    first = column.asc().nulls_first() if nullable else column.asc()
+    return first, id_column.asc()
+
+
+def keyset_filter(column, id_column, last_value, last_id: int, descending: bool = False, nullable: bool = False):
+    """WHERE clause resuming a keyset_order scan after (last_value, last_id)"""
+    if last_value is None:
+        # NULLs come first ascending and last descending
+        if descending:
+            return and_(column.is_(None), id_column < last_id)
+        return or_(and_(column.is_(None), id_column > last_id), column.isnot(None))
+
+    if descending:
+        clause = tuple_(column, id_column) < tuple_(last_value, last_id)
+        return or_(clause, column.is_(None)) if nullable else clause
+    return tuple_(column, id_column) > tuple_(last_value, last_id)
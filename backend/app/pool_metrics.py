@@ -0,0 +1,84 @@
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy import event, exc
+
+
+class PoolMetrics:
+    """Checkout wait time, in-use connections and timeouts of a connection pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.in_use = 0
+        self.in_use_max = 0
+        self.connects = 0
+
+    def observe_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def attach(self, engine):
+        """Track checkouts/checkins and new connections of an engine's pool"""
+
+        @event.listens_for(engine, "connect")
+        def on_connect(dbapi_connection, record):
+            with self._lock:
+                self.connects += 1
+
+        @event.listens_for(engine, "checkout")
+        def on_checkout(dbapi_connection, record, proxy):
+            with self._lock:
+                self.checkouts += 1
+                self.in_use += 1
+                self.in_use_max = max(self.in_use_max, self.in_use)
+
+        @event.listens_for(engine, "checkin")
+        def on_checkin(dbapi_connection, record):
+            with self._lock:
+                self.in_use -= 1
+
+    def stats(self, pool) -> Dict[str, float]:
+        with self._lock:
+            stats = {
+                "pool": type(pool).__name__,
+                "in_use": self.in_use,
+                "in_use_max": self.in_use_max,
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+                "wait_seconds_avg": self.wait_seconds_total / self.checkouts if self.checkouts else 0.0,
+            }
+        if hasattr(pool, "size") and hasattr(pool, "overflow"):
+            stats.update(size=pool.size(), overflow=pool.overflow(), idle=pool.checkedin())
+        return stats
+
+
+pool_metrics = PoolMetrics()
+
+
+def instrumented(pool_class):
+    """Subclass a pool class so the time spent waiting for a connection is recorded"""
+
+    class InstrumentedPool(pool_class):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except exc.TimeoutError:
+                pool_metrics.observe_wait(time.perf_counter() - start, timed_out=True)
+                raise
+            pool_metrics.observe_wait(time.perf_counter() - start)
+            return connection
+
+    InstrumentedPool.__name__ = pool_class.__name__
+    return InstrumentedPool
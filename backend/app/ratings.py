@@ -0,0 +1,81 @@
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import case, delete, insert, update
+from sqlmodel import Session, select, func
+
+from models import Product, ProductRating, Review, average_rating
+
+
+def record_review(session: Session, product_id: int, rating: int, delta: int = 1):
+    """Apply one added (delta=1) or removed (delta=-1) review to the product's aggregates"""
+    histogram_column = getattr(ProductRating, f"rating_{rating}")
+    result = session.exec(
+        update(ProductRating)
+        .where(ProductRating.product_id == product_id)
+        .values({
+            ProductRating.review_count: ProductRating.review_count + delta,
+            ProductRating.rating_sum: ProductRating.rating_sum + delta * rating,
+            histogram_column: histogram_column + delta,
+        })
+    )
+    if not result.rowcount:
+        # No aggregate row yet: compute it from the (already flushed) reviews
+        rebuild_ratings(session, [product_id])
+
+
+def rebuild_ratings(session: Session, product_ids: Optional[Iterable[int]] = None):
+    """Recompute aggregates from the review table, for some products or all of them"""
+    histogram = [
+        func.coalesce(func.sum(case((Review.rating == star, 1), else_=0)), 0)
+        for star in range(1, 6)
+    ]
+    aggregates = (
+        select(Product.id, func.count(Review.id), func.coalesce(func.sum(Review.rating), 0), *histogram)
+        .select_from(Product)
+        .outerjoin(Review, Review.product_id == Product.id)
+        .group_by(Product.id)
+    )
+    stale = delete(ProductRating)
+    if product_ids is not None:
+        product_ids = list(product_ids)
+        aggregates = aggregates.where(Product.id.in_(product_ids))
+        stale = stale.where(ProductRating.product_id.in_(product_ids))
+
+    session.exec(stale)
+    session.exec(
+        insert(ProductRating).from_select(
+            ["product_id", "review_count", "rating_sum", "rating_1", "rating_2", "rating_3", "rating_4", "rating_5"],
+            aggregates,
+        )
+    )
+
+
+def ensure_ratings(session: Session):
+    """Build the aggregates once for databases created before they existed"""
+    if session.exec(select(Product.id)).first() and not session.exec(select(ProductRating.product_id)).first():
+        rebuild_ratings(session)
+        session.commit()
+
+
+def _rating_body(row) -> Dict:
+    return {
+        "product_id": row.product_id,
+        "review_count": row.review_count,
+        "average_rating": average_rating(row.rating_sum, row.review_count),
+        "histogram": {1: row.rating_1, 2: row.rating_2, 3: row.rating_3, 4: row.rating_4, 5: row.rating_5},
+    }
+
+
+def get_ratings(session: Session, product_ids: List[int]) -> List[Dict]:
+    """ProductRatingResponse bodies for many products in one query; products without reviews get zeros"""
+    statement = select(*ProductRating.__table__.c).where(ProductRating.product_id.in_(product_ids))
+    ratings = {row.product_id: _rating_body(row) for row in session.exec(statement).all()}
+    return [
+        ratings.get(product_id)
+        or {"product_id": product_id, "review_count": 0, "average_rating": 0.0, "histogram": empty_histogram()}
+        for product_id in product_ids
+    ]
+
+
+def empty_histogram():
+    return {star: 0 for star in range(1, 6)}
@@ -0,0 +1,286 @@
+import heapq
+import os
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, delete, insert, or_, tuple_, union, update
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, select, func
+
+from models import CategoryStats, FacetCount, Product, ProductCategoryLink, ProductTag, RelatedProduct
+
+# Neighbours kept per product
+RELATED_LIMIT = int(os.getenv("RELATED_PRODUCTS_K", "12"))
+# A category, tag or brand shared by more products than this is too common to
+# propose neighbours on its own; it still counts towards their score
+MAX_SHARED = int(os.getenv("RELATED_MAX_SHARED", "500"))
+# Imports touching more products than this rebuild every list in one pass
+REBUILD_THRESHOLD = int(os.getenv("RELATED_REBUILD_THRESHOLD", "500"))
+
+# Product fields a write must touch to refresh the lists. Price only moves the
+# price term, a tenth of the score, so price edits wait for the next rebuild
+RELATED_FIELDS = {"tags", "brand", "category_ids"}
+
+CATEGORY_WEIGHT = 0.4
+TAG_WEIGHT = 0.3
+BRAND_WEIGHT = 0.2
+PRICE_WEIGHT = 0.1
+
+INSERT_BATCH = 5000
+
+
+class Features(NamedTuple):
+    categories: FrozenSet[int]
+    tags: FrozenSet[str]
+    brand: Optional[str]
+    price: float
+
+
+def _jaccard(left: FrozenSet, right: FrozenSet) -> float:
+    shared = len(left & right)
+    return shared / (len(left) + len(right) - shared) if shared else 0.0
+
+
+def similarity(a: Features, b: Features) -> float:
+    """Category and tag overlap, same brand and price closeness; 0 when nothing is shared"""
+    score = (
+        CATEGORY_WEIGHT * _jaccard(a.categories, b.categories)
+        + TAG_WEIGHT * _jaccard(a.tags, b.tags)
+        + (BRAND_WEIGHT if a.brand is not None and a.brand == b.brand else 0.0)
+    )
+    if score and a.price > 0 and b.price > 0:
+        score += PRICE_WEIGHT * min(a.price, b.price) / max(a.price, b.price)
+    # Rounded so ties rank the same whichever path computed them
+    return round(score, 6)
+
+
+def _top(scores: Dict[int, float]) -> List[Tuple[int, float]]:
+    """Best RELATED_LIMIT (id, score) pairs, ties to the lower id"""
+    return heapq.nsmallest(RELATED_LIMIT, scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+def _load_features(session: Session, product_ids=None) -> Dict[int, Features]:
+    """Features of some products, or of every product"""
+    products = select(Product.id, Product.brand, Product.price)
+    links = select(ProductCategoryLink.product_id, ProductCategoryLink.category_id)
+    tags = select(ProductTag.product_id, ProductTag.tag)
+    if product_ids is not None:
+        products = products.where(Product.id.in_(product_ids))
+        links = links.where(ProductCategoryLink.product_id.in_(product_ids))
+        tags = tags.where(ProductTag.product_id.in_(product_ids))
+
+    categories = defaultdict(set)
+    for product_id, category_id in session.connection().execute(links).all():
+        categories[product_id].add(category_id)
+    product_tags = defaultdict(set)
+    for product_id, tag in session.connection().execute(tags).all():
+        product_tags[product_id].add(tag)
+    return {
+        product_id: Features(
+            frozenset(categories.get(product_id, ())), frozenset(product_tags.get(product_id, ())), brand, price or 0.0
+        )
+        for product_id, brand, price in session.connection().execute(products).all()
+    }
+
+
+def _pairs(product_ids: List[int]):
+    """Select of (product_id, candidate_id): the products sharing an uncommon category, tag or brand with each.
+
+    Every product with a candidate also pairs with itself.
+    """
+    link, other_link = aliased(ProductCategoryLink), aliased(ProductCategoryLink)
+    by_category = (
+        select(link.product_id.label("product_id"), other_link.product_id.label("candidate_id"))
+        .join(other_link, other_link.category_id == link.category_id)
+        .join(CategoryStats, CategoryStats.category_id == link.category_id)
+        .where(link.product_id.in_(product_ids), CategoryStats.product_count <= MAX_SHARED)
+    )
+    tag, other_tag = aliased(ProductTag), aliased(ProductTag)
+    by_tag = (
+        select(tag.product_id, other_tag.product_id)
+        .join(other_tag, other_tag.tag == tag.tag)
+        .join(FacetCount, and_(FacetCount.facet == "tag", FacetCount.value == tag.tag))
+        .where(tag.product_id.in_(product_ids), FacetCount.product_count <= MAX_SHARED)
+    )
+    product, other = aliased(Product), aliased(Product)
+    brand_size = select(func.count()).select_from(Product).where(Product.brand == product.brand).scalar_subquery()
+    by_brand = (
+        select(product.id, other.id)
+        .join(other, other.brand == product.brand)
+        .where(product.id.in_(product_ids), brand_size <= MAX_SHARED)
+    )
+    return union(by_category, by_tag, by_brand).subquery()
+
+
+def _score_lists(session: Session, product_ids: List[int]) -> Dict[int, Dict[int, float]]:
+    """Similarity of each product to each of its candidates, zeros left out; a fixed number of queries"""
+    scores: Dict[int, Dict[int, float]] = {product_id: {} for product_id in product_ids}
+    if not product_ids:
+        return scores
+    # Read through the connection, skipping ORM row handling, so flush pending changes first
+    session.flush()
+    pairs = _pairs(product_ids)
+    rows = session.connection().execute(select(pairs.c.product_id, pairs.c.candidate_id)).all()
+    features = _load_features(session, list({candidate_id for _, candidate_id in rows}))
+    for product_id, candidate_id in rows:
+        if product_id != candidate_id:
+            score = similarity(features[product_id], features[candidate_id])
+            if score > 0:
+                scores[product_id][candidate_id] = score
+    return scores
+
+
+def _replace_lists(session: Session, lists: Dict[int, List[Tuple[int, float]]]):
+    if not lists:
+        return
+    session.exec(delete(RelatedProduct).where(RelatedProduct.product_id.in_(list(lists))))
+    rows = [{"product_id": product_id, "related_id": related_id, "score": score}
+            for product_id, top in lists.items() for related_id, score in top]
+    if rows:
+        session.exec(insert(RelatedProduct), params=rows)
+
+
+def recompute_related(session: Session, product_ids: Iterable[int]):
+    """Recompute the lists of some products from scratch"""
+    scores = _score_lists(session, list(dict.fromkeys(product_ids)))
+    _replace_lists(session, {product_id: _top(candidates) for product_id, candidates in scores.items()})
+
+
+def _trim(session: Session, product_ids: List[int]):
+    """Drop the entries past RELATED_LIMIT of some lists"""
+    ranked = (
+        select(
+            RelatedProduct.product_id, RelatedProduct.related_id,
+            func.row_number().over(
+                partition_by=RelatedProduct.product_id,
+                order_by=(RelatedProduct.score.desc(), RelatedProduct.related_id),
+            ).label("position"),
+        )
+        .where(RelatedProduct.product_id.in_(product_ids))
+        .subquery()
+    )
+    overflow = select(ranked.c.product_id, ranked.c.related_id).where(ranked.c.position > RELATED_LIMIT)
+    session.exec(delete(RelatedProduct).where(tuple_(RelatedProduct.product_id, RelatedProduct.related_id).in_(overflow)))
+
+
+def refresh_related(session: Session, product_ids: Iterable[int]):
+    """Update the lists affected by new or changed (flushed) products, in the caller's transaction.
+
+    Changed products get their own lists recomputed and enter the other lists
+    whose last entry they now beat. Lists already holding one take its new
+    score, or are recomputed when the score fell, since something else may now
+    rank higher. Scores between unchanged products don't move, so every list
+    ends up as a full rebuild would leave it.
+
+    A category, tag or brand crossing RELATED_MAX_SHARED changes the candidates
+    of every product sharing it; that is left to `manage.py rebuild-related`.
+    """
+    changed = list(dict.fromkeys(product_ids))
+    if not changed:
+        return
+    scores = _score_lists(session, changed)
+    table = RelatedProduct.__table__
+
+    held = session.exec(
+        select(RelatedProduct.product_id, RelatedProduct.related_id, RelatedProduct.score)
+        .where(RelatedProduct.related_id.in_(changed), RelatedProduct.product_id.not_in(changed))
+    ).all()
+    fell, rose = set(), []
+    for holder, product_id, score in held:
+        new_score = scores[product_id].get(holder, 0.0)
+        if new_score < score:
+            fell.add(holder)
+        elif new_score > score:
+            rose.append({"holder": holder, "changed": product_id, "new_score": new_score})
+
+    # Unchanged products now scoring with a changed one, and not holding it yet
+    held_pairs = {(holder, product_id) for holder, product_id, _ in held}
+    offers = [
+        (other_id, product_id, score)
+        for product_id in changed for other_id, score in scores[product_id].items()
+        if other_id not in scores and other_id not in fell and (other_id, product_id) not in held_pairs
+    ]
+    entering = []
+    if offers:
+        tails = {
+            holder: (count, lowest) for holder, count, lowest in session.exec(
+                select(RelatedProduct.product_id, func.count(), func.min(RelatedProduct.score))
+                .where(RelatedProduct.product_id.in_({other_id for other_id, _, _ in offers}))
+                .group_by(RelatedProduct.product_id)
+            ).all()
+        }
+        entering = [
+            (other_id, product_id, score) for other_id, product_id, score in offers
+            if tails.get(other_id, (0, 0.0))[0] < RELATED_LIMIT or score > tails[other_id][1]
+        ]
+    scores.update(_score_lists(session, list(fell)))
+
+    if rose:
+        session.exec(
+            update(table)
+            .where(table.c.product_id == bindparam("holder"), table.c.related_id == bindparam("changed"))
+            .values(score=bindparam("new_score")),
+            params=rose,
+        )
+    if entering:
+        session.exec(insert(RelatedProduct), params=[
+            {"product_id": other_id, "related_id": product_id, "score": score} for other_id, product_id, score in entering
+        ])
+        _trim(session, list({other_id for other_id, _, _ in entering}))
+    _replace_lists(session, {product_id: _top(candidates) for product_id, candidates in scores.items()})
+
+
+def remove_related(session: Session, product_id: int) -> List[int]:
+    """Drop a product being deleted from every list; returns the products whose list held it.
+
+    Recompute those with recompute_related once the product is gone.
+    """
+    holders = session.exec(select(RelatedProduct.product_id).where(RelatedProduct.related_id == product_id)).all()
+    session.exec(delete(RelatedProduct).where(
+        or_(RelatedProduct.product_id == product_id, RelatedProduct.related_id == product_id)
+    ))
+    return [holder for holder in holders if holder != product_id]
+
+
+def rebuild_related(session: Session):
+    """Recompute every list in one pass over in-memory posting lists of categories, tags and brands"""
+    features = _load_features(session)
+    postings: Dict[tuple, List[int]] = defaultdict(list)
+    for product_id, own in features.items():
+        for category_id in own.categories:
+            postings[("category", category_id)].append(product_id)
+        for tag in own.tags:
+            postings[("tag", tag)].append(product_id)
+        if own.brand is not None:
+            postings[("brand", own.brand)].append(product_id)
+    shared = {key: ids for key, ids in postings.items() if len(ids) <= MAX_SHARED}
+
+    session.exec(delete(RelatedProduct))
+    rows = []
+    for product_id, own in features.items():
+        keys = [("category", category_id) for category_id in own.categories] + [("tag", tag) for tag in own.tags]
+        if own.brand is not None:
+            keys.append(("brand", own.brand))
+        candidates = set()
+        for key in keys:
+            candidates.update(shared.get(key, ()))
+        candidates.discard(product_id)
+
+        scores = {}
+        for other_id in candidates:
+            score = similarity(own, features[other_id])
+            if score > 0:
+                scores[other_id] = score
+        rows.extend({"product_id": product_id, "related_id": related_id, "score": score} for related_id, score in _top(scores))
+        if len(rows) >= INSERT_BATCH:
+            session.exec(insert(RelatedProduct), params=rows)
+            rows = []
+    if rows:
+        session.exec(insert(RelatedProduct), params=rows)
+
+
+def ensure_related(session: Session):
+    """Build the lists once for databases created before they existed"""
+    if session.exec(select(Product.id)).first() and not session.exec(select(RelatedProduct.product_id)).first():
+        rebuild_related(session)
+        session.commit()
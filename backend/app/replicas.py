@@ -0,0 +1,204 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from fastapi import Request
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlmodel import Session
+
+from db import ASYNC_MODE, DATABASE_URL, async_engine, create_db_engine, engine, get_session, run_sync
+from models import ResourceVersion
+from versions import request_writes
+
+# Copies of DATABASE_URL that serve the read-only handlers, comma-separated;
+# same sync or async driver as DATABASE_URL
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# A client's reads stay on the primary this long after its own write; keep it above the replicas' lag
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", "10"))
+# Replicas are probed at most this often, and one that failed is skipped until its next probe
+REPLICA_HEALTH_SECONDS = float(os.getenv("REPLICA_HEALTH_SECONDS", "15"))
+
+STICKY_COOKIE = "db_primary"
+
+# Fails on a replica that is unreachable or has no schema (e.g. a missing SQLite copy)
+HEALTH_QUERY = select(ResourceVersion.name).limit(1)
+
+
+class Replica:
+    __slots__ = ("url", "engine", "async_engine", "healthy", "checked_at", "reads", "failures")
+
+    def __init__(self, url: str):
+        if make_url(url).get_dialect().is_async != ASYNC_MODE:
+            raise ValueError(f"Replica {url} must use the same sync or async driver as DATABASE_URL")
+        self.url = make_url(url).render_as_string(hide_password=True)
+        self.async_engine = create_db_engine(url) if ASYNC_MODE else None
+        self.engine = self.async_engine.sync_engine if ASYNC_MODE else create_db_engine(url)
+        self.healthy = True
+        self.checked_at = 0.0
+        self.reads = 0
+        self.failures = 0
+
+    def probe_due(self) -> bool:
+        return time.monotonic() - self.checked_at >= REPLICA_HEALTH_SECONDS
+
+    def probe(self) -> bool:
+        """Run the health query; blocking, so call it through run_sync in async mode"""
+        self.checked_at = time.monotonic()
+        try:
+            with self.engine.connect() as connection:
+                connection.execute(HEALTH_QUERY).first()
+        except Exception as exc:
+            if self.healthy:
+                print(f"⚠️ Read replica {self.url} is down, reading from the others: {str(exc).splitlines()[0]}")
+            self.healthy = False
+            self.failures += 1
+            return False
+        if not self.healthy:
+            print(f"✅ Read replica {self.url} is back")
+        self.healthy = True
+        return True
+
+
+class ReplicaSet:
+    """Round-robin over the healthy read replicas, with the primary as the fallback"""
+
+    def __init__(self, urls: List[str]):
+        self._lock = threading.Lock()
+        self.replicas = [Replica(url) for url in urls]
+        self._next = 0
+        self.primary_reads = 0
+
+    def candidates(self) -> List[Replica]:
+        """Every replica, starting from the next one in turn"""
+        with self._lock:
+            start = self._next
+            self._next = (start + 1) % len(self.replicas)
+        return self.replicas[start:] + self.replicas[:start]
+
+    def chosen(self, replica: Optional[Replica]):
+        with self._lock:
+            if replica is None:
+                self.primary_reads += 1
+            else:
+                replica.reads += 1
+
+    def stats(self) -> Dict:
+        return {
+            "primary": make_url(DATABASE_URL).render_as_string(hide_password=True),
+            "primary_reads": self.primary_reads,
+            "sticky_seconds": REPLICA_STICKY_SECONDS,
+            "replicas": [
+                {"url": replica.url, "healthy": replica.healthy, "reads": replica.reads, "failures": replica.failures}
+                for replica in self.replicas
+            ],
+        }
+
+
+replica_set = ReplicaSet(DATABASE_REPLICA_URLS)
+
+
+def _sticky(request: Request) -> bool:
+    return STICKY_COOKIE in request.cookies
+
+
+if not replica_set.replicas:
+    # Nothing to route: read handlers share the primary's dependency
+    get_read_session = get_session
+elif ASYNC_MODE:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    async def get_read_session(request: Request):
+        """Session on the next healthy replica; the primary right after the client's own write"""
+        chosen = None
+        if not _sticky(request):
+            for replica in replica_set.candidates():
+                if replica.probe_due():
+                    await run_sync(replica.probe)
+                if replica.healthy:
+                    chosen = replica
+                    break
+        replica_set.chosen(chosen)
+        async with AsyncSession(chosen.async_engine if chosen else async_engine, sync_session_class=Session) as session:
+            yield session.sync_session
+else:
+    def get_read_session(request: Request):
+        """Session on the next healthy replica; the primary right after the client's own write"""
+        chosen = None
+        if not _sticky(request):
+            for replica in replica_set.candidates():
+                if replica.probe_due():
+                    replica.probe()
+                if replica.healthy:
+                    chosen = replica
+                    break
+        replica_set.chosen(chosen)
+        with Session(chosen.engine if chosen else engine) as session:
+            yield session
+
+
+class ReplicaStickinessMiddleware:
+    """ASGI middleware pinning a client's reads to the primary for a while after its writes.
+
+    A successful request that wrote through versions.bump() sets a
+    short-lived cookie; get_read_session skips the replicas while the client
+    sends it back, so a client reads its own writes even when the replicas
+    are a little behind. Read-only POSTs (a cart quote, a batch lookup) leave
+    the client on the replicas.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.cookie = (
+            f"{STICKY_COOKIE}=1; Max-Age={REPLICA_STICKY_SECONDS}; Path=/; HttpOnly; SameSite=Lax".encode()
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Shared by reference with the handler's thread or greenlet, which
+        # run in a copy of this context
+        writes = {"wrote": False}
+        token = request_writes.set(writes)
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and writes["wrote"] and message["status"] < 400:
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", self.cookie)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            request_writes.reset(token)
+
+
+def _sqlite_path(url: str) -> str:
+    database = make_url(url).database or ""
+    # URI filenames, e.g. sqlite:///file:replica.db?mode=ro&uri=true
+    return database[len("file:"):] if database.startswith("file:") else database
+
+
+def copy_to_replicas() -> List[str]:
+    """Copy a SQLite primary into every SQLite replica file, e.g. to stand in for replication locally"""
+    if make_url(DATABASE_URL).get_backend_name() != "sqlite":
+        raise ValueError("Only SQLite replicas can be copied; other databases replicate themselves")
+    copied = []
+    source = sqlite3.connect(_sqlite_path(DATABASE_URL))
+    try:
+        for url in DATABASE_REPLICA_URLS:
+            if make_url(url).get_backend_name() != "sqlite":
+                continue
+            # The online backup API copies a consistent snapshot, WAL mode included
+            target = sqlite3.connect(_sqlite_path(url))
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+            copied.append(_sqlite_path(url))
+    finally:
+        source.close()
+    return copied
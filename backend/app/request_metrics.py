@@ -0,0 +1,242 @@
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+# One request running the same statement shape this many times is reported as a likely N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Expanded IN lists differ in length only; they are one shape
+_IN_LIST = re.compile(r"\((?:\?|%\(\w+\)s|\$\d+)(?:, (?:\?|%\(\w+\)s|\$\d+))*\)")
+
+
+def statement_shape(statement: str) -> str:
+    return _IN_LIST.sub("(...)", statement)
+
+
+class RequestStats:
+    """SQL issued while serving one request"""
+    __slots__ = ("queries", "sql_seconds", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.statements: Counter = Counter()
+
+    def repeated(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> List[Tuple[str, int]]:
+        """Statement shapes run at least `threshold` times, most repeated first"""
+        shapes: Counter = Counter()
+        for statement, count in self.statements.items():
+            shapes[statement_shape(statement)] += count
+        return [(shape, count) for shape, count in shapes.most_common() if count >= threshold]
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating inside its bucket, like histogram_quantile()"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.bounds[index - 1] if index else 0.0
+                if index == len(self.bounds):
+                    return lower
+                return lower + (self.bounds[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+
+class RouteMetrics:
+    __slots__ = ("latency", "queries", "sql_seconds", "statuses", "repeated_queries")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.sql_seconds = 0.0
+        self.statuses: Counter = Counter()
+        self.repeated_queries = 0
+
+
+class RequestMetrics:
+    """Latency, status and SQL cost per route, plus likely N+1 query patterns"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes: Dict[Tuple[str, str], RouteMetrics] = {}
+
+    def attach(self, engine):
+        """Count statements and time them against the request running them"""
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            if _current.get() is not None:
+                conn.info["query_started"] = time.perf_counter()
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after_execute(conn, cursor, statement, parameters, context, executemany):
+            stats = _current.get()
+            started = conn.info.pop("query_started", None)
+            if stats is None or started is None:
+                return
+            stats.queries += 1
+            stats.sql_seconds += time.perf_counter() - started
+            stats.statements[statement] += 1
+
+    def observe(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        repeated = stats.repeated() if stats.queries >= N_PLUS_ONE_THRESHOLD else []
+        with self._lock:
+            metrics = self.routes.get((method, route))
+            if metrics is None:
+                metrics = self.routes[(method, route)] = RouteMetrics()
+            metrics.latency.observe(seconds)
+            metrics.queries.observe(stats.queries)
+            metrics.sql_seconds += stats.sql_seconds
+            metrics.statuses[status] += 1
+            metrics.repeated_queries += bool(repeated)
+        for shape, count in repeated:
+            print(f"⚠️ Possible N+1: {method} {route} ran {count}x {' '.join(shape.split())[:200]}")
+
+    def stats(self) -> List[Dict]:
+        with self._lock:
+            return [
+                {
+                    "method": method,
+                    "route": route,
+                    "requests": metrics.latency.count,
+                    "statuses": {str(status): count for status, count in sorted(metrics.statuses.items())},
+                    "latency_ms": {
+                        name: round(metrics.latency.quantile(q) * 1000, 2)
+                        for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))
+                    },
+                    "latency_ms_avg": round(metrics.latency.total / metrics.latency.count * 1000, 2),
+                    "sql_queries_avg": round(metrics.queries.total / metrics.queries.count, 2),
+                    "sql_ms_avg": round(metrics.sql_seconds / metrics.latency.count * 1000, 2),
+                    "requests_with_repeated_queries": metrics.repeated_queries,
+                }
+                for (method, route), metrics in sorted(self.routes.items(), key=lambda item: item[0][::-1])
+            ]
+
+    def render(self) -> str:
+        """Request metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            routes = sorted(self.routes.items(), key=lambda item: item[0][::-1])
+            for name, kind, help_text, samples in (
+                ("http_request_duration_seconds", "histogram", "Request latency by route",
+                 [(key, metrics.latency) for key, metrics in routes]),
+                ("http_request_sql_queries", "histogram", "SQL statements per request by route",
+                 [(key, metrics.queries) for key, metrics in routes]),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                for (method, route), histogram in samples:
+                    labels = f'method="{method}",route="{_escape(route)}"'
+                    cumulative = 0
+                    for bound, count in zip(histogram.bounds + (float("inf"),), histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                        lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+                    lines.append(f"{name}_sum{{{labels}}} {histogram.total:.6f}")
+                    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+            lines += ["# HELP http_requests_total Responses by route and status", "# TYPE http_requests_total counter"]
+            for (method, route), metrics in routes:
+                for status, count in sorted(metrics.statuses.items()):
+                    lines.append(f'http_requests_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {count}')
+
+            for name, help_text, attribute in (
+                ("http_request_sql_seconds_total", "Time spent in SQL by route", "sql_seconds"),
+                ("http_requests_with_repeated_queries_total", "Requests that repeated a statement shape (likely N+1)", "repeated_queries"),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                for (method, route), metrics in routes:
+                    lines.append(f'{name}{{method="{method}",route="{_escape(route)}"}} {getattr(metrics, attribute)}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.routes.clear()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def render_gauges(prefix: str, values: Dict[str, float]) -> str:
+    """Numeric stats (e.g. pool or cache counters) as Prometheus gauges"""
+    lines = []
+    for name, value in values.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines += [f"# TYPE {prefix}_{name} gauge", f"{prefix}_{name} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+request_metrics = RequestMetrics()
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request and the SQL it runs.
+
+    Plain ASGI rather than BaseHTTPMiddleware, so streamed bodies are not
+    buffered and the per-request overhead stays a few microseconds. Routes are
+    labelled by their path template, e.g. /api/products/{product_id}.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                elapsed = (time.perf_counter() - started) * 1000
+                timing = f'app;dur={elapsed:.1f}, db;dur={stats.sql_seconds * 1000:.1f};desc="{stats.queries} queries"'
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            request_metrics.observe(
+                scope["method"], getattr(route, "path", "unmatched"), status, time.perf_counter() - started, stats
+            )
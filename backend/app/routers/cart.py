@@ -0,0 +1,68 @@
+from fastapi import APIRouter, HTTPException, Depends, status
+from sqlmodel import select, Session
+from typing import Dict
+from db import get_session, SessionRoute
+from store_settings import settings_snapshot
+from models import Product
+from schemas import CartQuoteRequest, CartQuote, CartQuoteLine
+
+
+router = APIRouter(route_class=SessionRoute)
+
+
+# /api/cart
+
+@router.post("/quote", response_model=CartQuote, status_code=status.HTTP_200_OK)
+def quote_cart(cart: CartQuoteRequest, session: Session = Depends(get_session)):
+    """Price a cart: line totals, stock availability, tax, shipping and grand total"""
+    settings = settings_snapshot.get(session)
+    if not settings:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Settings not found")
+
+    # Repeated products are merged, keeping the cart order
+    quantities: Dict[int, int] = {}
+    for line in cart.items:
+        quantities[line.product_id] = quantities.get(line.product_id, 0) + line.quantity
+
+    products = {}
+    if quantities:
+        statement = select(
+            Product.id, Product.name, Product.sku, Product.price, Product.stock, Product.in_stock
+        ).where(Product.id.in_(list(quantities)))
+        products = {row.id: row for row in session.exec(statement).all()}
+
+    lines = []
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None:
+            continue
+        lines.append(CartQuoteLine(
+            product_id=product_id,
+            name=product.name,
+            sku=product.sku,
+            quantity=quantity,
+            unit_price=product.price,
+            line_total=round(product.price * quantity, 2),
+            stock=product.stock,
+            in_stock=product.in_stock,
+            available=product.in_stock and product.stock >= quantity,
+        ))
+
+    # Same rules the storefront applied: tax_rate is a percentage, shipping is
+    # free from free_shipping_threshold on
+    subtotal = round(sum(line.line_total for line in lines), 2)
+    tax = round(subtotal * settings.tax_rate / 100, 2)
+    shipping = 0.0 if not lines or subtotal >= settings.free_shipping_threshold else settings.shipping_fee
+    missing = [product_id for product_id in quantities if product_id not in products]
+    return CartQuote(
+        currency=settings.currency,
+        tax_rate=settings.tax_rate,
+        free_shipping_threshold=settings.free_shipping_threshold,
+        lines=lines,
+        missing_product_ids=missing,
+        subtotal=subtotal,
+        tax=tax,
+        shipping=shipping,
+        total=round(subtotal + tax + shipping, 2),
+        available=not missing and all(line.available for line in lines),
+    )
@@ -1,31 +1,175 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from sqlmodel import select, Session
-from sqlalchemy.orm import selectinload
-from typing import List
-from db import get_session
-from models import Category
-from schemas import CategoryResponse, CategoryCreate, CategoryUpdate
+from fastapi import APIRouter, HTTPException, Depends, status, Request, Query
+from sqlmodel import select, Session, func
+from sqlalchemy import delete
+from typing import Dict, List, Optional
+from db import get_session, SessionRoute
+from replicas import get_read_session
+from cache import response_cache, json_response
+from conditional import make_etag, validators, is_not_modified, not_modified, respond
+from versions import bump, get_versions
+from serialization import dumps, serializer
+from streaming import stream_format, streaming_response
+from hierarchy import add_category, move_category, remove_category, is_descendant, build_tree
+from models import Category, CategoryClosure, CategoryStats
+from schemas import CategoryResponse, CategoryCreate, CategoryUpdate, CategoryTreeNode, CategoryLevel, CategoryWithCount
 
 
-router = APIRouter()
+router = APIRouter(route_class=SessionRoute)
+
+_category_serializer = serializer(CategoryResponse)
+_tree_serializer = serializer(CategoryTreeNode)
+
+# Categories with their product count; no product or link rows are loaded
+_with_counts = (
+    select(Category, func.coalesce(CategoryStats.product_count, 0))
+    .outerjoin(CategoryStats, CategoryStats.category_id == Category.id)
+)
+
+
+def _with_count(row) -> Dict:
+    """A CategoryWithCount body, straight from the row"""
+    category, product_count = row
+    return {**_category_serializer.to_dict(category), "product_count": product_count}
+
+
+def _dump_categories(session: Session, rows) -> List[bytes]:
+    return [dumps(_with_count(row)) for row in rows]
+
+
+def _count_validators(session: Session, key: str) -> Dict[str, str]:
+    """Validators of reads carrying product counts, which product writes change too"""
+    versions = get_versions(session, "categories", "products")
+    return validators(
+        "categories",
+        make_etag(key, versions["categories"].version, versions["products"].version),
+        versions["categories"].updated_at, versions["products"].updated_at
+    )
+
+
+def _check_slug(session: Session, slug: Optional[str], category_id: Optional[int] = None):
+    if slug is None:
+        return
+    existing = session.exec(select(Category.id).where(Category.slug == slug)).first()
+    if existing is not None and existing != category_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Category slug already exists")
+
 
 # /api/categories
-@router.get("", response_model=List[CategoryResponse], status_code=status.HTTP_200_OK)
-def get_categories(session: Session = Depends(get_session)):
+@router.get("", response_model=List[CategoryWithCount], status_code=status.HTTP_200_OK)
+def get_categories(
+    request: Request,
+    stream: Optional[str] = Query(None, description="Stream rows as 'ndjson' or as a chunked 'json' array"),
+    session: Session = Depends(get_read_session)
+):
     """Get all categories"""
-    statement = select(Category).options(selectinload(Category.products))
-    categories = session.exec(statement).all()
-    return categories
+    stream = stream_format(stream)
+    cached = None if stream else response_cache.get("categories")
+    if cached:
+        return respond(request, cached.body, cached.headers)
 
+    headers = _count_validators(session, "categories")
+    if is_not_modified(request, headers):
+        return not_modified(headers)
 
-@router.get("/{category_id}", response_model=CategoryResponse, status_code=status.HTTP_200_OK)
-def get_category(category_id: int, session: Session = Depends(get_session)):
-    """Get a single category by ID"""
-    statement = select(Category).where(Category.id == category_id).options(selectinload(Category.products))
-    category = session.exec(statement).first()
-    if not category:
+    statement = _with_counts.order_by(Category.id)
+    if stream:
+        return streaming_response(statement, _dump_categories, stream, headers, session.get_bind())
+
+    body = dumps([_with_count(row) for row in session.exec(statement).all()])
+    response_cache.set("categories", body, {"categories", "categories:counts"}, headers)
+    return json_response(body, headers)
+
+
+def _get_one(request: Request, session: Session, key: str, condition):
+    cached = response_cache.get(key)
+    if cached:
+        return respond(request, cached.body, cached.headers)
+
+    headers = _count_validators(session, key)
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+
+    row = session.exec(_with_counts.where(condition)).first()
+    if not row:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
-    return category
+
+    body = dumps(_with_count(row))
+    response_cache.set(key, body, {"categories", "categories:counts", key}, headers)
+    return json_response(body, headers)
+
+
+def _cached_categories(request: Request, session: Session, key: str, build):
+    """Serve a category read from the response cache, or build and cache it"""
+    cached = response_cache.get(key)
+    if cached:
+        return respond(request, cached.body, cached.headers)
+
+    version = get_versions(session, "categories")["categories"]
+    headers = validators("categories", make_etag(key, version.version), version.updated_at)
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+
+    body = build()
+    response_cache.set(key, body, {"categories"}, headers)
+    return json_response(body, headers)
+
+
+def _levels(session: Session, category_id: int, ancestors: bool) -> List[Dict]:
+    """A category with its ancestors or descendants, from one closure table query"""
+    if ancestors:
+        join_on, where, order = CategoryClosure.ancestor_id, CategoryClosure.descendant_id, [CategoryClosure.depth.desc()]
+    else:
+        join_on, where, order = CategoryClosure.descendant_id, CategoryClosure.ancestor_id, [CategoryClosure.depth, Category.name]
+    statement = (
+        select(Category, CategoryClosure.depth)
+        .join(CategoryClosure, join_on == Category.id)
+        .where(where == category_id)
+        .order_by(*order)
+    )
+    levels = [{**_category_serializer.to_dict(category), "depth": depth} for category, depth in session.exec(statement).all()]
+    if not levels:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
+    return levels
+
+
+@router.get("/tree", response_model=List[CategoryTreeNode], status_code=status.HTTP_200_OK)
+def get_category_tree(request: Request, session: Session = Depends(get_read_session)):
+    """Get every category nested under its parent"""
+    def build():
+        categories = session.exec(select(Category).order_by(Category.name)).all()
+        return _tree_serializer.dump_many(build_tree(categories))
+
+    return _cached_categories(request, session, "categories:tree", build)
+
+
+@router.get("/by-slug/{slug}", response_model=CategoryWithCount, status_code=status.HTTP_200_OK)
+def get_category_by_slug(slug: str, request: Request, session: Session = Depends(get_read_session)):
+    """Get a single category by its slug"""
+    return _get_one(request, session, f"category:slug:{slug}", Category.slug == slug)
+
+
+@router.get("/{category_id}/ancestors", response_model=List[CategoryLevel], status_code=status.HTTP_200_OK)
+def get_category_ancestors(category_id: int, request: Request, session: Session = Depends(get_read_session)):
+    """Get the breadcrumb of a category: its root first, the category itself last"""
+    def build():
+        return dumps(_levels(session, category_id, ancestors=True))
+
+    return _cached_categories(request, session, f"category:{category_id}:ancestors", build)
+
+
+@router.get("/{category_id}/descendants", response_model=List[CategoryLevel], status_code=status.HTTP_200_OK)
+def get_category_descendants(category_id: int, request: Request, session: Session = Depends(get_read_session)):
+    """Get every category below a category, nearest first (the category itself excluded)"""
+    def build():
+        return dumps(_levels(session, category_id, ancestors=False)[1:])
+
+    return _cached_categories(request, session, f"category:{category_id}:descendants", build)
+
+
+@router.get("/{category_id}", response_model=CategoryWithCount, status_code=status.HTTP_200_OK)
+def get_category(category_id: int, request: Request, session: Session = Depends(get_read_session)):
+    """Get a single category by ID"""
+    return _get_one(request, session, f"category:{category_id}", Category.id == category_id)
 
 
 @router.post("", response_model=CategoryResponse, status_code=status.HTTP_201_CREATED)
@@ -37,12 +181,22 @@ def create_category(category_data: CategoryCreate, session: Session = Depends(ge
     if existing:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Category name already exists")
     
+    _check_slug(session, category_data.slug)
+    if category_data.parent_id is not None and not session.get(Category, category_data.parent_id):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Parent category not found")
+
     category_dict = category_data.model_dump()
     category = Category.model_validate(category_dict)
     
     session.add(category)
+    session.flush()
+    add_category(session, category.id, category.parent_id)
+    session.add(CategoryStats(category_id=category.id))
+    bump(session, "categories", tags=["categories"])
     session.commit()
     session.refresh(category)
+
+    response_cache.invalidate("categories")
     return category
 
 
@@ -54,12 +208,30 @@ def update_category(category_id: int, category_data: CategoryUpdate, session: Se
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
     
     update_data = category_data.model_dump(exclude_unset=True)
+    if "slug" in update_data:
+        _check_slug(session, update_data["slug"], category_id)
+    if "parent_id" in update_data and update_data["parent_id"] != category.parent_id:
+        parent_id = update_data["parent_id"]
+        if parent_id is not None:
+            if not session.get(Category, parent_id):
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Parent category not found")
+            if is_descendant(session, parent_id, category_id):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="A category cannot be moved under itself or its subcategories"
+                )
+        move_category(session, category_id, parent_id)
+
     for key, value in update_data.items():
         setattr(category, key, value)
     
     session.add(category)
+    # Product responses embed their categories
+    bump(session, "categories", tags=["categories", "products"])
     session.commit()
     session.refresh(category)
+
+    response_cache.invalidate("categories", "products")
     return category
 
 
@@ -70,6 +242,12 @@ def delete_category(category_id: int, session: Session = Depends(get_session)):
     if not category:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
     
+    # Subcategories move up to the deleted category's parent
+    remove_category(session, category)
+    session.exec(delete(CategoryStats).where(CategoryStats.category_id == category_id))
     session.delete(category)
+    bump(session, "categories", tags=["categories", "products"])
     session.commit()
+
+    response_cache.invalidate("categories", "products")
     return
\ No newline at end of file
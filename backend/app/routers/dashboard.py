@@ -0,0 +1,22 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query, status
+from sqlmodel import Session
+
+from db import get_session, SessionRoute
+from cache import json_response
+from serialization import dumps
+from dashboard_stats import get_stats
+from schemas import DashboardStats
+
+
+router = APIRouter(route_class=SessionRoute)
+
+
+@router.get("/stats", response_model=DashboardStats, status_code=status.HTTP_200_OK)
+def get_dashboard_stats(
+    low_stock_threshold: Optional[int] = Query(None, ge=0, description="Defaults to LOW_STOCK_THRESHOLD"),
+    session: Session = Depends(get_session)
+):
+    """Get product, order and revenue totals and the number of products low on stock"""
+    return json_response(dumps(get_stats(session, low_stock_threshold)))
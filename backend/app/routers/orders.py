@@ -0,0 +1,103 @@
+from fastapi import APIRouter, HTTPException, Depends, status
+from sqlalchemy import update
+from sqlmodel import select, Session
+from sqlalchemy.orm import selectinload
+from datetime import datetime
+from db import get_session, SessionRoute
+from cache import response_cache
+from versions import bump
+from inventory import OutOfStock, reserve, release_stock
+from dashboard_stats import adjust_counters
+from models import Order, Product
+from schemas import OrderCreate, OrderResponse
+
+
+router = APIRouter(route_class=SessionRoute)
+
+
+def _load_order(session: Session, order_id: int) -> Order:
+    statement = select(Order).where(Order.id == order_id).options(selectinload(Order.items))
+    order = session.exec(statement).first()
+    if not order:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
+    return order
+
+
+def _stock_changed(session: Session, product_ids):
+    # Committed on its own, after the order: the single version row must not
+    # stay locked for the length of every checkout
+    # Stock decides in_stock, a facet
+    tags = ["products:filtered", *(f"product:{product_id}" for product_id in product_ids)]
+    bump(session, "products", tags=tags)
+    session.commit()
+    response_cache.invalidate(*tags)
+
+
+def _transition(session: Session, order_id: int, to_status: str) -> bool:
+    """Move a live reservation to another status; False if it is not reserved anymore"""
+    result = session.exec(
+        update(Order)
+        .where(Order.id == order_id, Order.status == "reserved", Order.expires_at > datetime.utcnow())
+        .values(status=to_status)
+        .execution_options(synchronize_session=False)
+    )
+    return bool(result.rowcount)
+
+
+def _not_reserved(session: Session, order_id: int):
+    order = _load_order(session, order_id)
+    detail = "Reservation expired" if order.status == "reserved" else f"Order is already {order.status}"
+    raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail)
+
+
+# /api/orders
+
+@router.post("", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
+def create_order(order_data: OrderCreate, session: Session = Depends(get_session)):
+    """Reserve stock for every line of an order, all lines or none"""
+    lines = [(item.product_id, item.quantity) for item in order_data.items]
+    try:
+        order = reserve(
+            session, lines,
+            customer_name=order_data.customer_name, customer_email=order_data.customer_email
+        )
+        session.commit()
+    except OutOfStock as exc:
+        session.rollback()
+        if not session.get(Product, exc.product_id):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Product {exc.product_id} not found")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+
+    order_id = order.id
+    _stock_changed(session, [product_id for product_id, _ in lines])
+    return _load_order(session, order_id)
+
+
+@router.get("/{order_id}", response_model=OrderResponse, status_code=status.HTTP_200_OK)
+def get_order(order_id: int, session: Session = Depends(get_session)):
+    """Get a single order by ID"""
+    return _load_order(session, order_id)
+
+
+@router.post("/{order_id}/confirm", response_model=OrderResponse, status_code=status.HTTP_200_OK)
+def confirm_order(order_id: int, session: Session = Depends(get_session)):
+    """Turn a live reservation into a confirmed order"""
+    if not _transition(session, order_id, "confirmed"):
+        _not_reserved(session, order_id)
+    total = session.exec(select(Order.total).where(Order.id == order_id)).one()
+    adjust_counters(session, orders=1, revenue=total)
+    session.commit()
+    return _load_order(session, order_id)
+
+
+@router.post("/{order_id}/cancel", response_model=OrderResponse, status_code=status.HTTP_200_OK)
+def cancel_order(order_id: int, session: Session = Depends(get_session)):
+    """Cancel a live reservation and put its stock back"""
+    if not _transition(session, order_id, "cancelled"):
+        _not_reserved(session, order_id)
+    order = _load_order(session, order_id)
+    release_stock(session, {item.product_id: item.quantity for item in order.items})
+    session.commit()
+
+    _stock_changed(session, [item.product_id for item in order.items])
+    return _load_order(session, order_id)
@@ -1,45 +1,543 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Query
-from sqlmodel import select, Session
+from fastapi import APIRouter, HTTPException, Depends, status, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlmodel import select, Session, or_
+from sqlalchemy import select as select_rows
 from sqlalchemy.orm import selectinload
-from typing import List, Optional
-from db import get_session
-from models import Product, Category, ProductCategoryLink
-from schemas import ProductResponse, ProductCreate, ProductUpdate
+from typing import Dict, List, Optional
+from datetime import datetime
+from db import get_session, SessionRoute, run_sync, iterate_sync
+from replicas import get_read_session
+from cache import response_cache, request_key, json_response
+from conditional import make_etag, validators, is_not_modified, not_modified, respond
+from versions import bump, get_versions
+from models import Product, Category, ProductCategoryLink, ProductRating, ResourceVersion, CategoryClosure, RelatedProduct
+from ratings import get_ratings
+from category_stats import count_changes, adjust_counts
+from dashboard_stats import adjust_counters
+from related import RELATED_FIELDS, RELATED_LIMIT, refresh_related, remove_related, recompute_related
+from search import search_index, SEARCH_FIELDS
+from facets import FACET_FIELDS, ProductFilters, parse_filters, apply_filters, index_facets, remove_facets, facet_counts
+from streaming import stream_format, streaming_response
+from serialization import dumps, serializer
+from pagination import encode_cursor, decode_cursor, keyset_order, keyset_filter
+from schemas import ProductResponse, ProductCreate, ProductUpdate, ProductSummary, CategoryResponse, ImportReport, FacetedProducts
+from schemas import ProductBatch, ProductBatchRequest
 
 
-router = APIRouter()
+router = APIRouter(route_class=SessionRoute)
+
+MAX_PAGE_SIZE = 200
+MAX_BATCH_SIZE = 200
+
+# sort name -> (column, descending)
+PRODUCT_SORTS = {
+    "newest": ("created_at", True),
+    "oldest": ("created_at", False),
+    "price_asc": ("price", False),
+    "price_desc": ("price", True),
+}
+
+PRODUCT_FIELDS = set(ProductResponse.model_fields)
+SUMMARY_FIELDS = list(ProductSummary.model_fields)
+RELATION_FIELDS = {"categories", "category_ids", "rating"}
+
+_product_serializer = serializer(ProductResponse)
+_category_serializer = serializer(CategoryResponse)
+
+
+def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Parse a ?fields= projection; "summary" stands for the product card fields"""
+    if not fields:
+        return None
+    requested = []
+    for field in fields.split(","):
+        field = field.strip()
+        if field == "summary":
+            requested.extend(SUMMARY_FIELDS)
+        elif field:
+            requested.append(field)
+    unknown = set(requested) - PRODUCT_FIELDS
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+        )
+    return list(dict.fromkeys(["id"] + requested))
+
+
+def _load_categories(session: Session, product_ids: List[int]) -> Dict[int, List[Dict]]:
+    """Load the categories of many products with a single query, as CategoryResponse bodies"""
+    statement = (
+        select(ProductCategoryLink.product_id, *Category.__table__.c)
+        .join(Category, Category.id == ProductCategoryLink.category_id)
+        .where(ProductCategoryLink.product_id.in_(product_ids))
+    )
+    categories: Dict[int, List[Dict]] = {product_id: [] for product_id in product_ids}
+    for row in session.exec(statement).all():
+        categories[row.product_id].append(_category_serializer.to_dict(row))
+    return categories
+
+
+def _select_products(fields: Optional[List[str]], sort_field: Optional[str] = None):
+    """Select plain columns, no ORM objects: every column for full products, else the requested ones"""
+    if fields is None:
+        return select(*Product.__table__.c)
+    columns = [field for field in fields if field not in RELATION_FIELDS]
+    if sort_field:
+        columns = list(dict.fromkeys(columns + [sort_field]))
+    # SQLAlchemy's select, since SQLModel's turns a one-column select (e.g. ?fields=id) into bare scalars
+    return select_rows(*(getattr(Product, column) for column in columns))
+
+
+def _project_rows(session: Session, rows, fields: Optional[List[str]]) -> List[Dict]:
+    """Build response dicts from column rows: full products, or only the requested fields.
+
+    Relations are loaded for the whole page in one query each.
+    """
+    if fields is None:
+        items = [_product_serializer.to_dict(row) for row in rows]
+        fields = ["categories", "rating"]
+    else:
+        items = [{field: row._mapping[field] for field in fields if field not in RELATION_FIELDS} for row in rows]
+    if "rating" in fields and items:
+        ratings = get_ratings(session, [item["id"] for item in items])
+        for item, rating in zip(items, ratings):
+            item["rating"] = rating
+    if {"categories", "category_ids"}.intersection(fields) and items:
+        categories = _load_categories(session, [item["id"] for item in items])
+        for item in items:
+            product_categories = categories[item["id"]]
+            if "categories" in fields:
+                item["categories"] = product_categories
+            if "category_ids" in fields:
+                item["category_ids"] = [category["id"] for category in product_categories]
+    return items
+
+
+def _collection_validators(session: Session, key: str) -> Dict[str, str]:
+    """Validators for a product listing; any product or category write changes them"""
+    versions = get_versions(session, "products", "categories")
+    return validators(
+        "products",
+        make_etag(key, versions["products"].version, versions["categories"].version),
+        versions["products"].updated_at, versions["categories"].updated_at
+    )
+
+
+def _dump_products(session: Session, rows, fields: Optional[List[str]]) -> bytes:
+    """Serialize a list of product rows to JSON bytes"""
+    return dumps(_project_rows(session, rows, fields))
+
+
+def _dump_items(session: Session, rows, fields: Optional[List[str]]) -> List[bytes]:
+    """Serialize each product row to its own JSON document"""
+    return [dumps(item) for item in _project_rows(session, rows, fields)]
+
+
+def _restrict(statement, category_id: Optional[int], include_descendants: bool, filters: ProductFilters):
+    """Restrict a statement over Product to a category, or its subtree, and the facet filters"""
+    if category_id and include_descendants:
+        # Products linked to any category of the subtree, via the closure table
+        subtree_products = (
+            select(ProductCategoryLink.product_id)
+            .join(CategoryClosure, CategoryClosure.descendant_id == ProductCategoryLink.category_id)
+            .where(CategoryClosure.ancestor_id == category_id)
+        )
+        statement = statement.where(Product.id.in_(subtree_products))
+    elif category_id:
+        # Filter products by category
+        statement = (
+            statement
+            .join(ProductCategoryLink, ProductCategoryLink.product_id == Product.id)
+            .where(ProductCategoryLink.category_id == category_id)
+        )
+    return apply_filters(statement, filters)
+
+
+def _listing_tags(category_id: Optional[int], include_descendants: bool, filters: ProductFilters, sort_field: str, rows) -> set:
+    if category_id and include_descendants:
+        # Writes can't cheaply tell which subtrees a category belongs to
+        listing_tag = "products:category-tree"
+    else:
+        listing_tag = f"products:category:{category_id}" if category_id else "products:all"
+    tags = {"products", f"products:sort:{sort_field}", listing_tag}
+    if filters:
+        # Any write to a faceted field can move a product in or out of the match
+        tags.add("products:filtered")
+    tags.update(f"product:{row.id}" for row in rows)
+    return tags
+
 
 # /api/products
 
 @router.get("", response_model=List[ProductResponse], status_code=status.HTTP_200_OK)
 def get_products(
+    request: Request,
     category_id: Optional[int] = Query(None, description="Filter products by category ID"),
-    session: Session = Depends(get_session)
+    include_descendants: bool = Query(False, description="Also match products of every subcategory of category_id"),
+    sort: str = Query("newest", description="One of newest, oldest, price_asc, price_desc"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; omit to get every product"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, or 'summary' for product cards"),
+    stream: Optional[str] = Query(None, description="Stream rows as 'ndjson' or as a chunked 'json' array"),
+    brand: Optional[str] = Query(None, description="Comma-separated brands, any of them"),
+    tags: Optional[str] = Query(None, description="Comma-separated tags, any of them"),
+    spec: Optional[List[str]] = Query(None, description="Specification filter as key:value; repeat for more"),
+    in_stock: Optional[bool] = Query(None),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    session: Session = Depends(get_read_session)
 ):
-    """Get all products, optionally filtered by category"""
-    if category_id:
-        # Filter products by category
-        statement = (
-            select(Product)
-            .join(ProductCategoryLink)
-            .where(ProductCategoryLink.category_id == category_id)
-            .options(selectinload(Product.categories))
+    """Get products, optionally filtered by category and facets, one keyset page at a time"""
+    stream = stream_format(stream)
+    filters = parse_filters(brand, tags, spec, in_stock, min_price, max_price)
+    key = request_key("products", request)
+    cached = None if stream else response_cache.get(key)
+    if cached:
+        return respond(request, cached.body, cached.headers)
+
+    if sort not in PRODUCT_SORTS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid sort")
+    sort_field, descending = PRODUCT_SORTS[sort]
+    sort_column = getattr(Product, sort_field)
+    nullable = Product.__table__.c[sort_field].nullable
+    projection = _parse_fields(fields)
+
+    headers = _collection_validators(session, key)
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+
+    # Column rows rather than ORM objects; projected pages also skip the JSON blobs and the category load
+    statement = _select_products(projection, sort_field)
+
+    keyset = decode_cursor(cursor, 2) if cursor else None
+
+    def page(statement):
+        statement = _restrict(statement, category_id, include_descendants, filters)
+        if keyset:
+            last_value, last_id = keyset
+            statement = statement.where(keyset_filter(sort_column, Product.id, last_value, last_id, descending, nullable))
+        return statement.order_by(*keyset_order(sort_column, Product.id, descending, nullable))
+
+    statement = page(statement)
+
+    if stream:
+        # Large results are never built in memory; the next cursor comes from the
+        # key of the row just past the page, looked up before streaming starts
+        if limit:
+            following = session.exec(page(select(sort_column, Product.id)).offset(limit - 1).limit(2)).all()
+            if len(following) == 2:
+                headers["X-Next-Cursor"] = encode_cursor(*following[0])
+            statement = statement.limit(limit)
+        return streaming_response(
+            statement, lambda stream_session, rows: _dump_items(stream_session, rows, projection), stream, headers,
+            session.get_bind()
         )
-    else:
-        statement = select(Product).options(selectinload(Product.categories))
-    
-    products = session.exec(statement).all()
-    return products
+
+    if limit:
+        statement = statement.limit(limit + 1)
+
+    rows = session.exec(statement).all()
+
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        headers["X-Next-Cursor"] = encode_cursor(getattr(last, sort_field), last.id)
+
+    body = _dump_products(session, rows, projection)
+    response_cache.set(key, body, _listing_tags(category_id, include_descendants, filters, sort_field, rows), headers)
+    return json_response(body, headers)
+
+
+@router.get("/faceted", response_model=FacetedProducts, status_code=status.HTTP_200_OK)
+def get_faceted_products(
+    request: Request,
+    category_id: Optional[int] = Query(None, description="Filter products by category ID"),
+    include_descendants: bool = Query(False, description="Also match products of every subcategory of category_id"),
+    brand: Optional[str] = Query(None, description="Comma-separated brands, any of them"),
+    tags: Optional[str] = Query(None, description="Comma-separated tags, any of them"),
+    spec: Optional[List[str]] = Query(None, description="Specification filter as key:value; repeat for more"),
+    in_stock: Optional[bool] = Query(None),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    sort: str = Query("newest", description="One of newest, oldest, price_asc, price_desc"),
+    limit: int = Query(24, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, or 'summary' for product cards"),
+    session: Session = Depends(get_read_session)
+):
+    """One page of filtered products with the total and the per-value counts of every facet"""
+    key = request_key("products:faceted", request)
+    cached = response_cache.get(key)
+    if cached:
+        return respond(request, cached.body, cached.headers)
+
+    if sort not in PRODUCT_SORTS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid sort")
+    sort_field, descending = PRODUCT_SORTS[sort]
+    sort_column = getattr(Product, sort_field)
+    nullable = Product.__table__.c[sort_field].nullable
+    projection = _parse_fields(fields)
+    filters = parse_filters(brand, tags, spec, in_stock, min_price, max_price)
+
+    headers = _collection_validators(session, key)
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+
+    statement = _restrict(_select_products(projection, sort_field), category_id, include_descendants, filters)
+    if cursor:
+        last_value, last_id = decode_cursor(cursor, 2)
+        statement = statement.where(keyset_filter(sort_column, Product.id, last_value, last_id, descending, nullable))
+    statement = statement.order_by(*keyset_order(sort_column, Product.id, descending, nullable)).limit(limit + 1)
+
+    rows = session.exec(statement).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(getattr(rows[-1], sort_field), rows[-1].id)
+
+    # Counts over the whole category, not the page; without a category the
+    # unfiltered counts come straight from the precomputed table
+    scope = _restrict(select(Product.id), category_id, include_descendants, ProductFilters()) if category_id else None
+    summary = facet_counts(session, filters, scope)
+    meta = dumps({"next_cursor": next_cursor, **summary})
+    body = b'{"items":' + _dump_products(session, rows, projection) + b"," + meta[1:]
+
+    tags = _listing_tags(category_id, include_descendants, filters, sort_field, rows)
+    # Facet counts move with every write to a faceted field, filtered or not
+    tags.add("products:filtered")
+    response_cache.set(key, body, tags, headers)
+    return json_response(body, headers)
+
+
+@router.get("/search", response_model=List[ProductResponse], status_code=status.HTTP_200_OK)
+def search_products(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200, description="Search text; the last word matches as a prefix"),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, or 'summary' for product cards"),
+    session: Session = Depends(get_read_session)
+):
+    """Full-text search over name, description, brand, tags and features, best match first"""
+    key = request_key("products:search", request)
+    cached = response_cache.get(key)
+    if cached:
+        return respond(request, cached.body, cached.headers)
+
+    projection = _parse_fields(fields)
+    headers = _collection_validators(session, key)
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+
+    ranked_ids = [product_id for product_id, _ in search_index.search(session, q, limit)]
+    if not ranked_ids:
+        response_cache.set(key, b"[]", {"products", "products:search"}, headers)
+        return json_response(b"[]", headers)
+
+    statement = _select_products(projection).where(Product.id.in_(ranked_ids))
+    rows = {row.id: row for row in session.exec(statement).all()}
+    rows = [rows[product_id] for product_id in ranked_ids if product_id in rows]
+
+    body = _dump_products(session, rows, projection)
+    response_cache.set(key, body, {"products", "products:search"} | {f"product:{row.id}" for row in rows}, headers)
+    return json_response(body, headers)
+
+
+def _split_batch(ids: Optional[str], skus: Optional[str]):
+    """ids and skus query parameters, comma-separated"""
+    try:
+        product_ids = [int(product_id) for product_id in (ids or "").split(",") if product_id.strip()]
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ids must be integers")
+    return product_ids, [sku.strip() for sku in (skus or "").split(",") if sku.strip()]
+
+
+def _load_batch(session: Session, ids: List[int], skus: List[str], projection: Optional[List[str]]):
+    """Every requested product in one IN query, in request order, plus the ids and SKUs not found"""
+    ids = list(dict.fromkeys(ids))
+    skus = list(dict.fromkeys(skus))
+    if not ids and not skus:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Pass at least one id or SKU")
+    if len(ids) + len(skus) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Pass at most {MAX_BATCH_SIZE} ids and SKUs")
+
+    # The SKU column maps rows back to the requested SKUs, even when not projected
+    conditions = ([Product.id.in_(ids)] if ids else []) + ([Product.sku.in_(skus)] if skus else [])
+    rows = session.exec(_select_products(projection, "sku").where(or_(*conditions))).all()
+    by_id = {row.id: row for row in rows}
+    by_sku = {row.sku: row for row in rows}
+
+    ordered = {}
+    missing = {"ids": [], "skus": []}
+    for requested, found, kind in ((ids, by_id, "ids"), (skus, by_sku, "skus")):
+        for key in requested:
+            row = found.get(key)
+            if row is None:
+                missing[kind].append(key)
+            else:
+                # A product asked for by both id and SKU is returned once
+                ordered.setdefault(row.id, row)
+    rows = list(ordered.values())
+    body = b'{"items":' + _dump_products(session, rows, projection) + b',"missing":' + dumps(missing) + b"}"
+    return body, rows, missing
+
+
+@router.get("/batch", response_model=ProductBatch, status_code=status.HTTP_200_OK)
+def get_product_batch(
+    request: Request,
+    ids: Optional[str] = Query(None, description="Comma-separated product IDs"),
+    skus: Optional[str] = Query(None, description="Comma-separated SKUs"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, or 'summary' for product cards"),
+    session: Session = Depends(get_read_session)
+):
+    """Get many products by id and SKU at once, in the order asked for"""
+    key = request_key("products:batch", request)
+    cached = response_cache.get(key)
+    if cached:
+        return respond(request, cached.body, cached.headers)
+
+    product_ids, product_skus = _split_batch(ids, skus)
+    projection = _parse_fields(fields)
+    headers = _collection_validators(session, key)
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+
+    body, rows, missing = _load_batch(session, product_ids, product_skus, projection)
+    tags = {"products"} | {f"product:{row.id}" for row in rows}
+    if missing["ids"] or missing["skus"]:
+        # A missing SKU can turn up with any new or renamed product
+        tags.add("products:batch")
+    response_cache.set(key, body, tags, headers)
+    return json_response(body, headers)
+
+
+@router.post("/batch", response_model=ProductBatch, status_code=status.HTTP_200_OK)
+def post_product_batch(batch: ProductBatchRequest, session: Session = Depends(get_session)):
+    """Same as GET /batch, for lists too long for a URL"""
+    body, _, _ = _load_batch(session, batch.ids, batch.skus, _parse_fields(batch.fields))
+    return json_response(body)
+
+
+def _bulk_format(format: Optional[str], content_type: str = "") -> str:
+    # Bulk import/export is imported on first use, keeping it off the cold-start path
+    from bulk import FORMATS
+    if format is None:
+        format = "csv" if "csv" in content_type else "ndjson"
+    if format not in FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported format; use one of: {', '.join(FORMATS)}"
+        )
+    return format
+
+
+@router.post("/import", response_model=ImportReport, status_code=status.HTTP_200_OK)
+async def import_products(
+    request: Request,
+    format: Optional[str] = Query(None, description="ndjson or csv; defaults from the Content-Type")
+):
+    """Upsert products by SKU from an NDJSON or CSV body, streamed in chunks"""
+    from bulk import IMPORT_TAGS, ProductImporter, read_chunks_async
+    format = _bulk_format(format, request.headers.get("content-type", ""))
+    importer = ProductImporter()
+    async for chunk in read_chunks_async(request.stream(), format):
+        await run_sync(importer.import_chunk, chunk)
+    await run_sync(importer.finish)
+
+    if importer.report.created or importer.report.updated:
+        response_cache.invalidate(*IMPORT_TAGS)
+    return importer.report
+
+
+@router.get("/export", status_code=status.HTTP_200_OK)
+def export_catalog(format: str = Query("ndjson", description="ndjson or csv")):
+    """Stream the whole catalog as NDJSON or CSV, in the import format"""
+    from bulk import export_products
+    format = _bulk_format(format)
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        iterate_sync(export_products(format)),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="products.{format}"'}
+    )
 
 
 @router.get("/{product_id}", response_model=ProductResponse, status_code=status.HTTP_200_OK)
-def get_product(product_id: int, session: Session = Depends(get_session)):
+def get_product(product_id: int, request: Request, session: Session = Depends(get_read_session)):
     """Get a single product by ID"""
-    statement = select(Product).where(Product.id == product_id).options(selectinload(Product.categories))
+    key = f"product:{product_id}"
+    cached = response_cache.get(key)
+    if cached:
+        return respond(request, cached.body, cached.headers)
+
+    # Validate against updated_at before loading the full row
+    statement = (
+        select(
+            Product.updated_at, ResourceVersion.version, ResourceVersion.updated_at,
+            ProductRating.review_count, ProductRating.rating_sum,
+            *(getattr(ProductRating, f"rating_{star}") for star in range(1, 6))
+        )
+        .select_from(Product)
+        .join(ResourceVersion, ResourceVersion.name == "categories")
+        .outerjoin(ProductRating, ProductRating.product_id == Product.id)
+        .where(Product.id == product_id)
+    )
+    version = session.exec(statement).first()
+    if not version:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+    product_updated_at, categories_version, categories_updated_at, *rating = version
+    headers = validators(
+        "products",
+        make_etag(key, product_updated_at, categories_version, *rating),
+        product_updated_at, categories_updated_at
+    )
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+
+    statement = select(Product).where(Product.id == product_id).options(selectinload(Product.categories), selectinload(Product.rating))
     product = session.exec(statement).first()
     if not product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
-    return product
+
+    body = _product_serializer.dump(product)
+    response_cache.set(key, body, {"products", key}, headers)
+    return json_response(body, headers)
+
+
+@router.get("/{product_id}/related", response_model=List[ProductResponse], status_code=status.HTTP_200_OK)
+def get_related_products(
+    product_id: int,
+    request: Request,
+    limit: int = Query(RELATED_LIMIT, ge=1, le=RELATED_LIMIT),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, or 'summary' for product cards"),
+    session: Session = Depends(get_read_session)
+):
+    """Get the products most related to a product, from the precomputed neighbour lists"""
+    key = request_key("products:related", request)
+    cached = response_cache.get(key)
+    if cached:
+        return respond(request, cached.body, cached.headers)
+
+    projection = _parse_fields(fields)
+    headers = _collection_validators(session, key)
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+
+    statement = (
+        _select_products(projection)
+        .join(RelatedProduct, RelatedProduct.related_id == Product.id)
+        .where(RelatedProduct.product_id == product_id)
+        .order_by(RelatedProduct.score.desc(), RelatedProduct.related_id)
+        .limit(limit)
+    )
+    rows = session.exec(statement).all()
+    if not rows and not session.get(Product, product_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+
+    body = _dump_products(session, rows, projection)
+    tags = {"products", "products:related", f"product:{product_id}"} | {f"product:{row.id}" for row in rows}
+    response_cache.set(key, body, tags, headers)
+    return json_response(body, headers)
 
 
 @router.post("", response_model=ProductResponse, status_code=status.HTTP_201_CREATED)
@@ -52,7 +550,11 @@ def create_product(product_data: ProductCreate, session: Session = Depends(get_s
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="SKU already exists")
     
     product_dict = product_data.model_dump(exclude={"category_ids"})
+    if "in_stock" not in product_data.model_fields_set:
+        product_dict["in_stock"] = product_data.stock > 0
     product = Product.model_validate(product_dict)
+    product.created_at = product.updated_at = datetime.now().isoformat()
+    product.rating = ProductRating()
     
     # Add categories
     if product_data.category_ids:
@@ -60,8 +562,26 @@ def create_product(product_data: ProductCreate, session: Session = Depends(get_s
         product.categories = categories
     
     session.add(product)
+    session.flush()
+    counts = count_changes([], [category.id for category in product.categories])
+    adjust_counts(session, counts)
+    search_index.index_product(session, product)
+    index_facets(session, [product], new=True)
+    refresh_related(session, [product.id])
+    adjust_counters(session, products=1)
+    # A new product can land on any listing page of its categories
+    tags = [
+        f"product:{product.id}", "products:all", "products:search", "products:category-tree", "products:filtered", "products:batch",
+        "products:related",
+        *(f"products:category:{category.id}" for category in product.categories)
+    ]
+    if counts:
+        tags.append("categories:counts")
+    bump(session, "products", tags=tags)
     session.commit()
     session.refresh(product)
+
+    response_cache.invalidate(*tags)
     return product
 
 @router.put("/{product_id}", response_model=ProductResponse, status_code=status.HTTP_200_OK)
@@ -73,14 +593,47 @@ def update_product(product_id: int, product_data: ProductUpdate, session: Sessio
     
     product_dict = product_data.model_dump(exclude_unset=True, exclude={"category_ids"})
     product.sqlmodel_update(product_dict)
+    if "stock" in product_dict and "in_stock" not in product_dict:
+        product.in_stock = product.stock > 0
+    product.updated_at = datetime.now().isoformat()
     
     # Update categories if provided
+    counts = {}
     if product_data.category_ids is not None:
         categories = session.exec(select(Category).where(Category.id.in_(product_data.category_ids))).all()
+        counts = count_changes([category.id for category in product.categories], [category.id for category in categories])
         product.categories = categories
+        adjust_counts(session, counts)
     
+    search_index.index_product(session, product)
+    if {"tags", "specifications"}.intersection(product_dict):
+        index_facets(session, [product])
+    related = RELATED_FIELDS.intersection(product_dict) or product_data.category_ids is not None
+    if related:
+        refresh_related(session, [product_id])
+
+    # Pages already holding the product, plus pages it may have moved onto
+    tags = [f"product:{product_id}"]
+    if "price" in product_dict:
+        tags.append("products:sort:price")
+    if set(SEARCH_FIELDS).intersection(product_dict):
+        tags.append("products:search")
+    if FACET_FIELDS.intersection(product_dict):
+        tags.append("products:filtered")
+    if "sku" in product_dict:
+        tags.append("products:batch")
+    if related:
+        tags.append("products:related")
+    if product_data.category_ids is not None:
+        tags.append("products:category-tree")
+        tags.extend(f"products:category:{category_id}" for category_id in product_data.category_ids)
+    if counts:
+        tags.append("categories:counts")
+    bump(session, "products", tags=tags)
     session.commit()
     session.refresh(product)
+
+    response_cache.invalidate(*tags)
     return product
 
 @router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -90,6 +643,21 @@ def delete_product(product_id: int, session: Session = Depends(get_session)):
     if not product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
     
+    counts = count_changes([category.id for category in product.categories], [])
+    remove_facets(session, [product_id])
+    holders = remove_related(session, product_id)
     session.delete(product)
+    session.flush()
+    adjust_counts(session, counts)
+    recompute_related(session, holders)
+    search_index.remove_product(session, product_id)
+    adjust_counters(session, products=-1)
+    # Keyset pages don't shift, so only the pages holding the product change
+    tags = [f"product:{product_id}", "products:filtered"]
+    if counts:
+        tags.append("categories:counts")
+    bump(session, "products", tags=tags)
     session.commit()
+
+    response_cache.invalidate(*tags)
     return
@@ -1,27 +1,72 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, status, Query
+from sqlalchemy import and_
 from sqlmodel import Session, select
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 
-from db import get_session
+from db import get_session, SessionRoute
+from replicas import get_read_session
 from models import Product, Review
-from schemas import ReviewResponse, ReviewCreate
+from schemas import ReviewResponse, ReviewCreate, ProductRatingResponse
+from cache import response_cache, json_response
+from serialization import dumps, serializer
+from ratings import record_review, get_ratings
+from versions import bump
+from pagination import encode_cursor, decode_cursor, keyset_order, keyset_filter
 
 
-router = APIRouter()
+router = APIRouter(route_class=SessionRoute)
+
+MAX_PAGE_SIZE = 100
+
+_review_serializer = serializer(ReviewResponse)
 
 
 @router.get("/api/products/{product_id}/reviews", response_model=List[ReviewResponse], status_code=status.HTTP_200_OK)
-def get_product_reviews(product_id: int, session: Session = Depends(get_session)):
-    """Get all reviews for a product"""
-    # Check if product exists
-    product = session.get(Product, product_id)
-    if not product:
+def get_product_reviews(
+    product_id: int,
+    rating: Optional[int] = Query(None, ge=1, le=5, description="Only reviews with this rating"),
+    verified: Optional[bool] = Query(None, description="Only verified (or unverified) reviews"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; omit to get every review"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
+    session: Session = Depends(get_read_session)
+):
+    """Get reviews for a product, newest first"""
+    # Outer join from the product so a missing product and an empty page are
+    # told apart in the same round trip
+    conditions = [Review.product_id == Product.id]
+    if rating is not None:
+        conditions.append(Review.rating == rating)
+    if verified is not None:
+        conditions.append(Review.verified == verified)
+    if cursor:
+        last_created_at, last_id = decode_cursor(cursor, 2)
+        try:
+            last_created_at = datetime.fromisoformat(last_created_at)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+        conditions.append(keyset_filter(Review.created_at, Review.id, last_created_at, last_id, descending=True))
+
+    statement = (
+        select(Product.id, Review)
+        .select_from(Product)
+        .outerjoin(Review, and_(*conditions))
+        .where(Product.id == product_id)
+        .order_by(*keyset_order(Review.created_at, Review.id, descending=True))
+    )
+    if limit:
+        statement = statement.limit(limit + 1)
+
+    rows = session.exec(statement).all()
+    if not rows:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
-    
-    statement = select(Review).where(Review.product_id == product_id)
-    reviews = session.exec(statement).all()
-    return reviews
+    reviews = [review for _, review in rows if review is not None]
+
+    headers = {}
+    if limit and len(reviews) > limit:
+        reviews = reviews[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(reviews[-1].created_at.isoformat(), reviews[-1].id)
+    return json_response(_review_serializer.dump_many(reviews), headers)
 
 @router.post("/api/products/{product_id}/reviews", response_model=ReviewResponse, status_code=status.HTTP_201_CREATED)
 def create_review(product_id: int, review_data: ReviewCreate, session: Session = Depends(get_session)):
@@ -37,8 +82,13 @@ def create_review(product_id: int, review_data: ReviewCreate, session: Session =
     reviews = Review.model_validate(review_dict)
 
     session.add(reviews)
+    session.flush()
+    record_review(session, product_id, reviews.rating)
+    bump(session, "products", tags=[f"product:{product_id}"])
     session.commit()
     session.refresh(reviews)
+
+    response_cache.invalidate(f"product:{product_id}")
     return reviews
 
 @router.delete("/api/reviews/{review_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -49,5 +99,25 @@ def delete_review(review_id: int, session: Session = Depends(get_session)):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Review not found")
     
     session.delete(review)
+    session.flush()
+    record_review(session, review.product_id, review.rating, delta=-1)
+    bump(session, "products", tags=[f"product:{review.product_id}"])
     session.commit()
+
+    response_cache.invalidate(f"product:{review.product_id}")
     return
+
+
+@router.get("/api/reviews/ratings", response_model=List[ProductRatingResponse], status_code=status.HTTP_200_OK)
+def get_product_ratings(
+    product_ids: str = Query(..., description="Comma-separated product IDs"),
+    session: Session = Depends(get_read_session)
+):
+    """Get review count, average and 1-5 histogram for many products at once"""
+    try:
+        ids = list(dict.fromkeys(int(product_id) for product_id in product_ids.split(",") if product_id.strip()))
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="product_ids must be integers")
+    if not ids or len(ids) > 200:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Pass between 1 and 200 product IDs")
+    return json_response(dumps(get_ratings(session, ids)))
@@ -1,22 +1,42 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, status, Request
 from sqlmodel import Session, select
 
-from db import get_session
+from db import get_session, SessionRoute
+from replicas import get_read_session
+from cache import response_cache, json_response
+from conditional import make_etag, validators, is_not_modified, not_modified, respond
+from versions import bump, get_versions
+from store_settings import settings_snapshot
+from serialization import serializer
 from models import SettingsDB
 from schemas import SettingsResponse, SettingsUpdate
 
 
-router = APIRouter()
+router = APIRouter(route_class=SessionRoute)
+
+_settings_serializer = serializer(SettingsResponse)
 
 
 @router.get("", response_model=SettingsResponse, status_code=status.HTTP_200_OK)
-def get_settings(session: Session = Depends(get_session)):
+def get_settings(request: Request, session: Session = Depends(get_read_session)):
     """Get store settings"""
+    cached = response_cache.get("settings")
+    if cached:
+        return respond(request, cached.body, cached.headers)
+
+    version = get_versions(session, "settings")["settings"]
+    headers = validators("settings", make_etag("settings", version.version), version.updated_at)
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+
     statement = select(SettingsDB)
     settings = session.exec(statement).first()
     if not settings:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Settings not found")
-    return settings
+
+    body = _settings_serializer.dump(settings)
+    response_cache.set("settings", body, {"settings"}, headers)
+    return json_response(body, headers)
 
 
 @router.put("", response_model=SettingsResponse, status_code=status.HTTP_200_OK)
@@ -29,8 +49,11 @@ def update_settings(settings_data: SettingsUpdate, session: Session = Depends(ge
     
     settings_dict = settings_data.model_dump(exclude_unset=True)
     settings.sqlmodel_update(settings_dict)
+    bump(session, "settings", tags=["settings"])
     
     session.commit()
     session.refresh(settings)
-    
+
+    response_cache.invalidate("settings")
+    settings_snapshot.refresh(settings)
     return settings
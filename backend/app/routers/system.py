@@ -0,0 +1,70 @@
+from fastapi import APIRouter, status
+
+from cache import response_cache
+from change_feed import change_feed
+from compression import CODECS, compressed_cache
+from db import engine
+from pool_metrics import pool_metrics
+from replicas import replica_set
+from startup import startup_timer
+from request_metrics import request_metrics
+
+
+router = APIRouter()
+
+
+@router.get("/cache", status_code=status.HTTP_200_OK)
+def get_cache_stats():
+    """Get response cache size and hit/miss/eviction counters"""
+    return response_cache.stats()
+
+
+@router.delete("/cache", status_code=status.HTTP_204_NO_CONTENT)
+def clear_cache():
+    """Drop every cached response"""
+    response_cache.clear()
+    compressed_cache.clear()
+    return
+
+
+@router.get("/change-feed", status_code=status.HTTP_200_OK)
+def get_change_feed_stats():
+    """Get this worker's position in the change feed and how many other workers' writes it applied"""
+    return change_feed.stats()
+
+
+@router.get("/compression", status_code=status.HTTP_200_OK)
+def get_compression_stats():
+    """Get the available content codings and the compressed-variant cache counters"""
+    return {"codings": list(CODECS), **compressed_cache.stats()}
+
+
+@router.get("/pool", status_code=status.HTTP_200_OK)
+def get_pool_stats():
+    """Get database pool usage, checkout wait time and timeouts"""
+    return pool_metrics.stats(engine.pool)
+
+
+@router.get("/replicas", status_code=status.HTTP_200_OK)
+def get_replica_stats():
+    """Get the read replicas, their health and how many reads each served"""
+    return replica_set.stats()
+
+
+@router.get("/startup", status_code=status.HTTP_200_OK)
+def get_startup_stats():
+    """Get the startup mode and how long each startup phase took"""
+    return startup_timer.stats()
+
+
+@router.get("/requests", status_code=status.HTTP_200_OK)
+def get_request_stats():
+    """Get latency percentiles, status counts and SQL cost per route"""
+    return request_metrics.stats()
+
+
+@router.delete("/requests", status_code=status.HTTP_204_NO_CONTENT)
+def reset_request_stats():
+    """Start the per-route request statistics over"""
+    request_metrics.reset()
+    return
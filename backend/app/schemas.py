@@ -19,13 +19,14 @@ class CategoryBase(SQLModel):
 
 
 class CategoryCreate(CategoryBase):
-    pass
+    parent_id: Optional[int] = None
 
 
 class CategoryUpdate(SQLModel):
     name: Optional[str] = None
     description: Optional[str] = None
     slug: Optional[str] = None
+    parent_id: Optional[int] = None
 
 
 class CategoryResponse(CategoryBase):
@@ -34,6 +35,26 @@ class CategoryResponse(CategoryBase):
     # products: List[ProductSummary] = []
 
 
+class CategoryWithCount(CategoryResponse):
+    product_count: int = 0
+
+
+class CategoryTreeNode(CategoryResponse):
+    children: List["CategoryTreeNode"] = []
+
+
+class CategoryLevel(CategoryResponse):
+    depth: int
+
+
+# Rating Schemas
+class ProductRatingResponse(SQLModel):
+    product_id: int
+    review_count: int = 0
+    average_rating: float = 0.0
+    histogram: Dict[int, int] = {}
+
+
 # Product Schemas
 class ProductBase(SQLModel):
     name: str
@@ -83,6 +104,56 @@ class ProductResponse(ProductBase):
     created_at: Optional[str] = None
     updated_at: Optional[str] = None
     categories: List[CategoryResponse] = []
+    rating: Optional[ProductRatingResponse] = None
+
+
+# Bulk Import Schemas
+class ProductUpsert(ProductUpdate):
+    """An import row for an existing SKU: only the columns it gives are updated"""
+    sku: str
+
+
+class ImportRowError(SQLModel):
+    row: int
+    sku: Optional[str] = None
+    errors: List[str]
+
+
+class ImportReport(SQLModel):
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = []
+
+
+# Faceted Listing Schemas
+class FacetValue(SQLModel):
+    value: str
+    count: int
+
+
+class FacetedProducts(SQLModel):
+    items: List[ProductResponse]
+    next_cursor: Optional[str] = None
+    total: int
+    facets: Dict[str, List[FacetValue]]
+
+
+# Batch Schemas
+class ProductBatchRequest(SQLModel):
+    ids: List[int] = []
+    skus: List[str] = []
+    fields: Optional[str] = None
+
+
+class MissingProducts(SQLModel):
+    ids: List[int] = []
+    skus: List[str] = []
+
+
+class ProductBatch(SQLModel):
+    items: List[ProductResponse]
+    missing: MissingProducts
 
 
 # Review Schemas
@@ -136,9 +207,74 @@ class SettingsResponse(SettingsBase):
     pass
 
 
+# Order Schemas
+class OrderItemCreate(SQLModel):
+    product_id: int
+    quantity: int = Field(ge=1, le=1000)
+
+
+class OrderCreate(SQLModel):
+    items: List[OrderItemCreate] = Field(min_length=1, max_length=100)
+    customer_name: Optional[str] = None
+    customer_email: Optional[str] = None
+
+
+class OrderItemResponse(SQLModel):
+    product_id: int
+    quantity: int
+    unit_price: float
+
+
+class OrderResponse(SQLModel):
+    id: int
+    status: str
+    customer_name: Optional[str] = None
+    customer_email: Optional[str] = None
+    total: float
+    created_at: datetime
+    expires_at: Optional[datetime] = None
+    items: List[OrderItemResponse] = []
+
+
+# Cart Schemas
+class CartLine(SQLModel):
+    product_id: int
+    quantity: int = Field(ge=1, le=1000)
+
+
+class CartQuoteRequest(SQLModel):
+    items: List[CartLine] = Field(max_length=100)
+
+
+class CartQuoteLine(SQLModel):
+    product_id: int
+    name: str
+    sku: str
+    quantity: int
+    unit_price: float
+    line_total: float
+    stock: int
+    in_stock: bool
+    available: bool
+
+
+class CartQuote(SQLModel):
+    currency: str
+    tax_rate: float
+    free_shipping_threshold: float
+    lines: List[CartQuoteLine] = []
+    missing_product_ids: List[int] = []
+    subtotal: float
+    tax: float
+    shipping: float
+    total: float
+    available: bool
+
+
 # Dashboard Stats Schema
 class DashboardStats(SQLModel):
     total_products: int
     total_revenue: float
     total_orders: int
-    low_stock_products: int
\ No newline at end of file
+    low_stock_products: int
+    low_stock_threshold: int
\ No newline at end of file
@@ -0,0 +1,282 @@
+import math
+import re
+import sqlite3
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy import event, text
+from sqlmodel import Session, select, func
+
+from db import engine
+from models import Product
+
+# Searchable fields and their BM25 weights, in FTS column order
+SEARCH_FIELDS = ("name", "description", "brand", "tags", "features")
+FIELD_WEIGHTS = {"name": 10.0, "description": 1.0, "brand": 4.0, "tags": 3.0, "features": 2.0}
+
+_TOKEN = re.compile(r"\w+")
+
+# Session.info key of the in-memory index changes waiting for their transaction to commit
+_PENDING = "search_index_pending"
+
+
+def tokenize(value: str) -> List[str]:
+    """Lowercase, strip diacritics and split into word tokens"""
+    value = unicodedata.normalize("NFKD", value.lower())
+    value = "".join(char for char in value if not unicodedata.combining(char))
+    return _TOKEN.findall(value)
+
+
+def parse_query(query: str) -> Tuple[List[str], bool]:
+    """Return the query terms and whether the last one is a type-ahead prefix"""
+    terms = tokenize(query)
+    return terms, bool(terms) and not query[-1:].isspace()
+
+
+def product_document(product: Product) -> Dict[str, str]:
+    """Flatten the searchable fields of a product into text"""
+    return {
+        "name": product.name or "",
+        "description": product.description or "",
+        "brand": product.brand or "",
+        "tags": " ".join(product.tags or []),
+        "features": " ".join(product.features or []),
+    }
+
+
+class FtsSearchIndex:
+    """SQLite FTS5 index kept in the same transaction as product writes"""
+
+    # Lives in the database; built once by `manage.py init-db`, not on every boot
+    persistent = True
+
+    def prepare(self, session: Session):
+        session.exec(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS product_search "
+            "USING fts5(name, description, brand, tags, features, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        ))
+        indexed = session.exec(text("SELECT count(*) FROM product_search")).one()[0]
+        if indexed != session.exec(select(func.count(Product.id))).one():
+            self.rebuild(session)
+        session.commit()
+
+    def rebuild(self, session: Session):
+        session.exec(text("DELETE FROM product_search"))
+        for product in session.exec(select(Product)):
+            self.index_product(session, product, replace=False)
+
+    def index_product(self, session: Session, product: Product, replace: bool = True):
+        if replace:
+            self.remove_product(session, product.id)
+        session.exec(
+            text(
+                "INSERT INTO product_search (rowid, name, description, brand, tags, features) "
+                "VALUES (:id, :name, :description, :brand, :tags, :features)"
+            ),
+            params={"id": product.id, **product_document(product)},
+        )
+
+    def index_products(self, session: Session, products: List[Product]):
+        """Index (or reindex) many products with one executemany per statement"""
+        if not products:
+            return
+        session.exec(
+            text("DELETE FROM product_search WHERE rowid = :id"),
+            params=[{"id": product.id} for product in products],
+        )
+        session.exec(
+            text(
+                "INSERT INTO product_search (rowid, name, description, brand, tags, features) "
+                "VALUES (:id, :name, :description, :brand, :tags, :features)"
+            ),
+            params=[{"id": product.id, **product_document(product)} for product in products],
+        )
+
+    def remove_product(self, session: Session, product_id: int):
+        session.exec(text("DELETE FROM product_search WHERE rowid = :id"), params={"id": product_id})
+
+    def refresh(self, session: Session, product_ids: List[int]):
+        """Nothing to do: other workers' writes land in the same table"""
+
+    def search(self, session: Session, query: str, limit: int) -> List[Tuple[int, float]]:
+        terms, prefix = parse_query(query)
+        if not terms:
+            return []
+        match = " ".join(f'"{term}"' for term in terms)
+        if prefix:
+            match += "*"
+        weights = ", ".join(str(FIELD_WEIGHTS[field]) for field in SEARCH_FIELDS)
+        rows = session.exec(
+            text(
+                f"SELECT rowid, bm25(product_search, {weights}) AS rank FROM product_search "
+                "WHERE product_search MATCH :match ORDER BY rank LIMIT :limit"
+            ),
+            params={"match": match, "limit": limit},
+        ).all()
+        return [(row[0], -row[1]) for row in rows]
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session):
+    for apply in session.info.pop(_PENDING, ()):
+        apply()
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _drop_pending(session, transaction):
+    # Still pending once the outermost transaction is over: it rolled back
+    if transaction.parent is None:
+        session.info.pop(_PENDING, None)
+
+
+class MemorySearchIndex:
+    """In-process inverted index with BM25 ranking, for engines without FTS5.
+
+    Writes reach the index only once the session commits, so a rolled back
+    write leaves it as it was.
+    """
+
+    k1 = 1.2
+    b = 0.75
+    persistent = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self._terms: List[str] = []
+        self._documents: Dict[int, Tuple[float, List[str]]] = {}
+        self._total_length = 0.0
+
+    def prepare(self, session: Session):
+        self.rebuild(session)
+
+    def rebuild(self, session: Session):
+        with self._lock:
+            self._postings.clear()
+            self._terms.clear()
+            self._documents.clear()
+            self._total_length = 0.0
+        for product in session.exec(select(Product)):
+            self._add(product.id, *self._weigh(product), replace=False)
+
+    def index_product(self, session: Session, product: Product, replace: bool = True):
+        # Weighed now: the product may have changed again by the time it commits
+        product_id, (frequencies, length) = product.id, self._weigh(product)
+        self._defer(session, lambda: self._add(product_id, frequencies, length, replace))
+
+    def index_products(self, session: Session, products: List[Product]):
+        for product in products:
+            self.index_product(session, product)
+
+    def remove_product(self, session: Session, product_id: int):
+        self._defer(session, lambda: self._drop(product_id))
+
+    def refresh(self, session: Session, product_ids: List[int]):
+        """Reindex products another worker wrote, as the database holds them now"""
+        products = {product.id: product for product in session.exec(select(Product).where(Product.id.in_(product_ids)))}
+        for product_id in product_ids:
+            if product_id in products:
+                self._add(product_id, *self._weigh(products[product_id]), replace=True)
+            else:
+                self._drop(product_id)
+
+    @staticmethod
+    def _defer(session: Session, apply: Callable[[], None]):
+        session.info.setdefault(_PENDING, []).append(apply)
+
+    @staticmethod
+    def _weigh(product: Product) -> Tuple[Dict[str, float], float]:
+        frequencies: Dict[str, float] = defaultdict(float)
+        length = 0.0
+        for field, value in product_document(product).items():
+            weight = FIELD_WEIGHTS[field]
+            for term in tokenize(value):
+                frequencies[term] += weight
+                length += weight
+        return frequencies, length
+
+    def _add(self, product_id: int, frequencies: Dict[str, float], length: float, replace: bool):
+        with self._lock:
+            if replace:
+                self._remove(product_id)
+            for term, frequency in frequencies.items():
+                if term not in self._postings:
+                    insort(self._terms, term)
+                self._postings[term][product_id] = frequency
+            self._documents[product_id] = (length, list(frequencies))
+            self._total_length += length
+
+    def _drop(self, product_id: int):
+        with self._lock:
+            self._remove(product_id)
+
+    def _remove(self, product_id: int):
+        document = self._documents.pop(product_id, None)
+        if document is None:
+            return
+        length, terms = document
+        self._total_length -= length
+        for term in terms:
+            postings = self._postings[term]
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[term]
+                del self._terms[bisect_left(self._terms, term)]
+
+    def _expand(self, prefix: str) -> List[str]:
+        start = bisect_left(self._terms, prefix)
+        end = bisect_left(self._terms, prefix + "￿")
+        return self._terms[start:end]
+
+    def search(self, session: Session, query: str, limit: int) -> List[Tuple[int, float]]:
+        terms, prefix = parse_query(query)
+        if not terms:
+            return []
+
+        with self._lock:
+            count = len(self._documents)
+            if not count:
+                return []
+            average_length = self._total_length / count
+
+            # Every query term must match; the last one may match as a prefix
+            groups = [[term] for term in terms]
+            if prefix:
+                groups[-1] = self._expand(terms[-1])
+            scores: Dict[int, float] = {}
+            for position, group in enumerate(groups):
+                group_scores: Dict[int, float] = defaultdict(float)
+                for term in group:
+                    postings = self._postings.get(term, {})
+                    idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for product_id, frequency in postings.items():
+                        length = self._documents[product_id][0]
+                        norm = self.k1 * (1 - self.b + self.b * length / average_length)
+                        group_scores[product_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+                if position == 0:
+                    scores = dict(group_scores)
+                else:
+                    scores = {pid: score + group_scores[pid] for pid, score in scores.items() if pid in group_scores}
+                if not scores:
+                    return []
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+
+def _fts5_available() -> bool:
+    # FTS5 support is a property of the linked SQLite library, not of the database
+    try:
+        connection = sqlite3.connect(":memory:")
+        connection.execute("CREATE VIRTUAL TABLE fts5_probe USING fts5(value)")
+        connection.close()
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+search_index = FtsSearchIndex() if engine.dialect.name == "sqlite" and _fts5_available() else MemorySearchIndex()
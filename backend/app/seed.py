@@ -0,0 +1,58 @@
+import json
+import os
+from datetime import datetime
+
+from sqlmodel import Session, select
+
+from models import Product, Review, Category
+
+# Demo catalog; only read when a database is seeded, never on a plain boot
+SEED_FILE = os.getenv("SEED_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "seed_data.json"))
+
+
+def load_seed_data(path: str = SEED_FILE) -> dict:
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def seed_database(session: Session, path: str = SEED_FILE):
+    """Add the demo categories, products and reviews to an empty catalog"""
+    data = None
+
+    # Initialize default categories
+    if not session.exec(select(Category)).first():
+        data = load_seed_data(path)
+        categories = [Category(**category) for category in data["categories"]]
+        session.add_all(categories)
+        session.commit()
+        print(f"✅ Added {len(categories)} initial categories to database")
+
+    # Add initial products if database is empty
+    if session.exec(select(Product)).first():
+        return
+    data = data or load_seed_data(path)
+    now = datetime.now().isoformat()
+    slugs = {category.slug: category for category in session.exec(select(Category)).all()}
+    products = []
+    for item in data["products"]:
+        item = dict(item)
+        product = Product(**{key: value for key, value in item.items() if key != "categories"}, created_at=now, updated_at=now)
+        # Product-category associations, by category slug
+        product.categories = [slugs[slug] for slug in item.get("categories", []) if slug in slugs]
+        products.append(product)
+    session.add_all(products)
+    session.commit()
+    print(f"✅ Added {len(products)} initial products to database")
+
+    skus = {product.sku: product.id for product in products}
+    reviews = [
+        Review(
+            **{key: value for key, value in review.items() if key not in ("product_sku", "created_at")},
+            product_id=skus[review["product_sku"]],
+            created_at=datetime.fromisoformat(review["created_at"]),
+        )
+        for review in data["reviews"]
+    ]
+    session.add_all(reviews)
+    session.commit()
+    print(f"✅ Added {len(reviews)} sample reviews to database")
@@ -0,0 +1,157 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Union, get_args, get_origin
+
+from pydantic import BaseModel
+from sqlalchemy.engine import Row
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+_MISSING = object()
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value) -> bytes:
+    """Encode plain data to compact UTF-8 JSON, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_default).encode()
+
+
+def loads(value):
+    """Decode JSON text, with orjson when it is installed"""
+    return orjson.loads(value) if orjson is not None else json.loads(value)
+
+
+def _identity(value):
+    return value
+
+
+def _to_float(value):
+    return value if value is None or type(value) is float else float(value)
+
+
+def _to_isoformat(value):
+    return None if value is None else value.isoformat()
+
+
+def _converter(annotation) -> Callable[[Any], Any]:
+    """Turn a stored value into the JSON-ready value the schema field would dump; None passes through"""
+    origin = get_origin(annotation)
+    if origin is Union:
+        inner = [arg for arg in get_args(annotation) if arg is not type(None)]
+        return _converter(inner[0]) if len(inner) == 1 else _identity
+    if origin in (list, List):
+        args = get_args(annotation)
+        convert = _converter(args[0]) if args else _identity
+        if convert is _identity:
+            return _identity
+        return lambda values: None if values is None else [convert(value) for value in values]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        to_dict = serializer(annotation).to_dict
+        return lambda value: None if value is None else to_dict(value)
+    if annotation is float:
+        # Integer prices stored by SQLite still dump as 8500.0, like the schema would
+        return _to_float
+    if annotation is datetime or annotation is date:
+        return _to_isoformat
+    return _identity
+
+
+class Serializer:
+    """Schema-shaped JSON straight from ORM objects, result rows or dicts.
+
+    The field list, defaults and value conversions of a schema are worked out
+    once, then a plain function is generated per source shape (an ORM class or
+    the columns of a result row) that reads each field with a single attribute
+    or index lookup. Dumping a row is that function plus one encoder call for
+    the whole payload, instead of validating a model per row and dumping it
+    again. Rows are trusted to hold valid data; request bodies are still
+    validated by their schemas.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self._fields = None
+        self._compiled: Dict[Any, Callable] = {}
+
+    def _field_specs(self):
+        if self._fields is None:
+            self._fields = [
+                (name, _MISSING if field.is_required() else field.get_default(call_default_factory=True),
+                 _converter(field.annotation))
+                for name, field in self.schema.model_fields.items()
+            ]
+        return self._fields
+
+    def _generate(self, source) -> Callable:
+        """Build `to_dict` for ORM objects of a class, rows with these keys, or (None) dicts"""
+        namespace = {}
+        entries = []
+        for index, (name, default, convert) in enumerate(self._field_specs()):
+            namespace[f"default_{index}"] = default
+            if source is None:
+                value = f"obj.get({name!r}, default_{index})"
+            elif isinstance(source, tuple):
+                value = f"obj[{source.index(name)}]" if name in source else f"default_{index}"
+            else:
+                # Pydantic models keep their fields off the class
+                present = hasattr(source, name) or name in getattr(source, "model_fields", {})
+                value = f"obj.{name}" if present else f"default_{index}"
+            if value == f"default_{index}" and default is _MISSING:
+                raise ValueError(f"{self.schema.__name__}.{name} is missing from {source!r}")
+            if convert is not _identity:
+                namespace[f"convert_{index}"] = convert
+                value = f"convert_{index}({value})"
+            entries.append(f"{name!r}: {value}")
+        code = "def to_dict(obj):\n    return {" + ", ".join(entries) + "}\n"
+        exec(code, namespace)
+        return namespace["to_dict"]
+
+    def to_dict(self, obj) -> Dict[str, Any]:
+        if isinstance(obj, dict):
+            source = None
+        elif isinstance(obj, Row):
+            source = obj._fields
+        else:
+            source = type(obj)
+        to_dict = self._compiled.get(source)
+        if to_dict is None:
+            to_dict = self._compiled[source] = self._generate(source)
+        return to_dict(obj)
+
+    def dump(self, obj) -> bytes:
+        return dumps(self.to_dict(obj))
+
+    def dump_many(self, objs: Iterable) -> bytes:
+        """One JSON array for many objects"""
+        return dumps([self.to_dict(obj) for obj in objs])
+
+    def dump_each(self, objs: Iterable) -> List[bytes]:
+        """One JSON document per object, for streamed responses"""
+        return [dumps(self.to_dict(obj)) for obj in objs]
+
+
+_serializers: Dict[type, Serializer] = {}
+
+
+def serializer(schema) -> Serializer:
+    """The compiled serializer of a response schema, shared by every caller"""
+    if schema not in _serializers:
+        _serializers[schema] = Serializer(schema)
+    return _serializers[schema]
@@ -0,0 +1,100 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# full: create the schema, seed an empty catalog and backfill derived tables (local development)
+# schema: the same without seeding
+# skip: touch nothing; the schema is managed with `python manage.py init-db` at deploy time
+STARTUP_MODES = ("full", "schema", "skip")
+STARTUP_MODE = os.getenv("STARTUP_MODE", "full")
+# Cold-start budget in milliseconds; 0 disables the warning
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "0"))
+
+
+class StartupTimer:
+    """Wall time of each startup phase, measured from the first import of this module"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self._last = self.started
+
+    def lap(self, name: str):
+        """Record the time since the previous lap (or since startup) as a phase"""
+        now = time.perf_counter()
+        self.phases[name] = round((now - self._last) * 1000, 1)
+        self._last = now
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._last = time.perf_counter()
+            self.phases[name] = round((self._last - start) * 1000, 1)
+
+    def total_ms(self) -> float:
+        return round((self._last - self.started) * 1000, 1)
+
+    def stats(self) -> Dict:
+        return {
+            "mode": STARTUP_MODE,
+            "phases_ms": dict(self.phases),
+            "total_ms": self.total_ms(),
+            "budget_ms": STARTUP_BUDGET_MS or None,
+        }
+
+    def report(self):
+        phases = ", ".join(f"{name} {ms:g}ms" for name, ms in self.phases.items())
+        print(f"✅ Started in {self.total_ms():g}ms (mode {STARTUP_MODE}): {phases}")
+        if STARTUP_BUDGET_MS and self.total_ms() > STARTUP_BUDGET_MS:
+            print(f"⚠️ Startup took longer than the {STARTUP_BUDGET_MS:g}ms budget")
+
+
+startup_timer = StartupTimer()
+
+
+def prepare_database(mode: str = STARTUP_MODE, timer: StartupTimer = startup_timer):
+    """Bring the database up to date for the given startup mode"""
+    if mode not in STARTUP_MODES:
+        raise ValueError(f"Unknown STARTUP_MODE {mode!r}; use one of: {', '.join(STARTUP_MODES)}")
+
+    from sqlmodel import Session
+    from db import engine, init_db
+    from search import search_index
+
+    if mode == "skip":
+        # Only state that lives in the process has to be built
+        if not search_index.persistent:
+            with timer.phase("search index"), Session(engine) as session:
+                search_index.prepare(session)
+        return
+
+    with timer.phase("schema"):
+        init_db()
+    if mode == "full":
+        # The seed file and its module are only loaded on this path
+        from seed import seed_database
+        with timer.phase("seed"), Session(engine) as session:
+            seed_database(session)
+
+    from ratings import ensure_ratings
+    from hierarchy import ensure_closure
+    from category_stats import ensure_counts
+    from facets import ensure_facets
+    from dashboard_stats import ensure_counters
+    from related import ensure_related
+    with timer.phase("backfill"), Session(engine) as session:
+        search_index.prepare(session)
+        ensure_ratings(session)
+        ensure_closure(session)
+        ensure_counts(session)
+        ensure_facets(session)
+        ensure_counters(session)
+        ensure_related(session)
@@ -0,0 +1,35 @@
+import threading
+from typing import Optional
+
+from sqlmodel import Session, select
+
+from models import SettingsDB
+from schemas import SettingsResponse
+
+
+class SettingsSnapshot:
+    """In-memory copy of the store settings, loaded once and replaced on update"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._settings: Optional[SettingsResponse] = None
+
+    def get(self, session: Session) -> Optional[SettingsResponse]:
+        settings = self._settings
+        if settings is None:
+            row = session.exec(select(SettingsDB)).first()
+            settings = self.refresh(row) if row else None
+        return settings
+
+    def refresh(self, row: SettingsDB) -> SettingsResponse:
+        settings = SettingsResponse.model_validate(row, from_attributes=True)
+        with self._lock:
+            self._settings = settings
+        return settings
+
+    def clear(self):
+        with self._lock:
+            self._settings = None
+
+
+settings_snapshot = SettingsSnapshot()
@@ -0,0 +1,53 @@
+import os
+from typing import Callable, Dict, Iterator, List, Optional
+
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
+
+from db import engine, iterate_sync
+
+# ?stream= values: one JSON document per line, or a single JSON array sent in chunks
+STREAM_FORMATS = {"ndjson": "application/x-ndjson", "json": "application/json"}
+YIELD_PER = int(os.getenv("STREAM_YIELD_PER", "500"))
+
+
+def stream_format(value: Optional[str]) -> Optional[str]:
+    if value is not None and value not in STREAM_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported stream format; use one of: {', '.join(STREAM_FORMATS)}"
+        )
+    return value
+
+
+def stream_rows(statement, dump_batch: Callable[[Session, list], List[bytes]], format: str, bind=None) -> Iterator[bytes]:
+    """Run a statement on its own session and serialize its rows one batch at a time.
+
+    Rows come from a server-side cursor YIELD_PER at a time; the session's
+    identity map only holds them weakly, so a batch is freed once serialized
+    and memory stays flat however many rows the statement returns. `bind`
+    picks another engine than the primary, e.g. the request's read replica.
+    """
+    with Session(bind or engine) as session:
+        result = session.exec(statement.execution_options(yield_per=YIELD_PER))
+        if format == "json":
+            yield b"["
+        separator = b""
+        for rows in result.partitions():
+            items = dump_batch(session, rows)
+            if format == "ndjson":
+                yield b"".join(item + b"\n" for item in items)
+            elif items:
+                yield separator + b",".join(items)
+                separator = b","
+        if format == "json":
+            yield b"]"
+
+
+def streaming_response(statement, dump_batch, format: str, headers: Dict[str, str], bind=None) -> StreamingResponse:
+    return StreamingResponse(
+        iterate_sync(stream_rows(statement, dump_batch, format, bind)),
+        media_type=STREAM_FORMATS[format],
+        headers=headers,
+    )
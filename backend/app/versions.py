@@ -0,0 +1,55 @@
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+from uuid import uuid4
+
+from sqlalchemy import insert, update
+from sqlmodel import Session, select
+
+from models import ChangeEvent, ResourceVersion
+
+RESOURCES = ("products", "categories", "settings")
+
+# Tells this process's change events apart from the other workers'
+PROCESS_ID = uuid4().hex
+
+# Tags a bulk import's change events; the other workers rebuild an in-memory
+# search index on it rather than refreshing product by product
+IMPORT_TAG = "products:import"
+
+# Set per request by ReplicaStickinessMiddleware; bump() flags it, so only a
+# request that wrote pins its client to the primary
+request_writes: ContextVar[Optional[Dict[str, bool]]] = ContextVar("request_writes", default=None)
+
+
+def ensure_versions(session: Session):
+    """Create the version row of every resource that doesn't have one yet"""
+    existing = set(session.exec(select(ResourceVersion.name)).all())
+    for name in RESOURCES:
+        if name not in existing:
+            session.add(ResourceVersion(name=name))
+    session.commit()
+
+
+def bump(session: Session, *names: str, tags: Iterable[str] = ()):
+    """Increment resource versions as part of the caller's transaction.
+
+    The write is also logged to the change feed with the cache tags it
+    invalidates, so the other workers drop the same entries (see change_feed).
+    """
+    session.exec(
+        update(ResourceVersion)
+        .where(ResourceVersion.name.in_(names))
+        .values(version=ResourceVersion.version + 1, updated_at=datetime.utcnow())
+    )
+    session.exec(insert(ChangeEvent).values(
+        resources=list(names), tags=list(dict.fromkeys(tags)), origin=PROCESS_ID, created_at=datetime.utcnow()
+    ))
+    writes = request_writes.get()
+    if writes is not None:
+        writes["wrote"] = True
+
+
+def get_versions(session: Session, *names: str) -> Dict[str, ResourceVersion]:
+    statement = select(ResourceVersion).where(ResourceVersion.name.in_(names))
+    return {row.name: row for row in session.exec(statement).all()}
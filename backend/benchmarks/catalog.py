@@ -0,0 +1,107 @@
+"""Synthetic catalog generator: N products, M categories, K reviews in the models.py shapes"""
+import random
+from datetime import datetime, timedelta
+from typing import Dict
+
+from sqlalchemy import insert
+from sqlmodel import Session
+
+from db import engine, init_db
+from models import Category, Product, ProductCategoryLink, Review
+from ratings import rebuild_ratings
+from hierarchy import rebuild_closure
+from category_stats import rebuild_counts
+from facets import rebuild_facets
+from dashboard_stats import rebuild_counters
+from related import rebuild_related
+from search import search_index
+
+BATCH_SIZE = 2000
+
+BRANDS = [f"Brand {index}" for index in range(40)]
+TAGS = ["brass", "wood", "vintage", "antique", "handcrafted", "lamp", "decor", "bestseller", "limited",
+        "new arrival", "traditional", "modern", "gift", "mirror", "clock", "frame", "pottery", "textile"]
+MATERIALS = ["brass", "solid wood", "wood and brass", "wood and glass", "ceramic", "cotton", "iron"]
+WORDS = ["elegant", "heritage", "carved", "classic", "ornate", "rustic", "warm", "artisan", "timeless", "bengali"]
+
+
+def _batches(rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        yield rows[start:start + BATCH_SIZE]
+
+
+def generate_catalog(products: int, categories: int, reviews: int, seed: int = 42) -> Dict[str, int]:
+    """Fill an empty database and build every derived table, reproducibly for a seed"""
+    rng = random.Random(seed)
+    init_db()
+    now = datetime(2026, 1, 1)
+
+    with Session(engine) as session:
+        # A two-level tree: about sqrt(M) roots, the rest spread under them
+        roots = max(1, int(categories ** 0.5))
+        category_rows = [
+            {"id": index, "name": f"Category {index}", "slug": f"category-{index}",
+             "description": f"{rng.choice(WORDS).title()} pieces",
+             "parent_id": None if index <= roots else rng.randint(1, roots)}
+            for index in range(1, categories + 1)
+        ]
+        session.exec(insert(Category), params=category_rows)
+
+        product_rows = []
+        for index in range(1, products + 1):
+            price = round(rng.lognormvariate(8.5, 1.0), 2)
+            created = (now - timedelta(minutes=products - index)).isoformat()
+            product_rows.append({
+                "id": index,
+                "name": f"{rng.choice(WORDS).title()} {rng.choice(TAGS).title()} {index}",
+                "description": " ".join(rng.choice(WORDS) for _ in range(30)),
+                "price": price,
+                "original_price": round(price * 1.15, 2) if rng.random() < 0.3 else None,
+                "stock": rng.randint(0, 50),
+                "sku": f"BENCH-{index:07d}",
+                "brand": rng.choice(BRANDS),
+                "in_stock": True,
+                "images": [f"https://images.example.com/{index}-{image}.jpg" for image in range(2)],
+                "tags": rng.sample(TAGS, 4),
+                "features": [f"{rng.choice(WORDS).title()} finish", "Handcrafted"],
+                "specifications": {"material": rng.choice(MATERIALS), "weight": f"{rng.randint(1, 40)} kg",
+                                   "warranty": f"{rng.randint(0, 3)} years"},
+                "shipping": {"weight": f"{rng.randint(1, 50)} kg"},
+                "created_at": created,
+                "updated_at": created,
+            })
+        for row in product_rows:
+            row["in_stock"] = row["stock"] > 0
+        for batch in _batches(product_rows):
+            session.exec(insert(Product), params=batch)
+
+        links = [
+            {"product_id": product_id, "category_id": category_id}
+            for product_id in range(1, products + 1)
+            for category_id in rng.sample(range(1, categories + 1), min(categories, rng.randint(1, 3)))
+        ]
+        for batch in _batches(links):
+            session.exec(insert(ProductCategoryLink), params=batch)
+
+        review_rows = [
+            {"product_id": rng.randint(1, products), "author": f"Customer {index}",
+             "rating": rng.choices(range(1, 6), weights=[1, 1, 2, 4, 6])[0],
+             "comment": " ".join(rng.choice(WORDS) for _ in range(12)),
+             "verified": rng.random() < 0.7,
+             "created_at": now - timedelta(minutes=rng.randint(0, 500000))}
+            for index in range(reviews)
+        ]
+        for batch in _batches(review_rows):
+            session.exec(insert(Review), params=batch)
+
+        rebuild_ratings(session)
+        rebuild_closure(session)
+        rebuild_counts(session)
+        rebuild_facets(session)
+        rebuild_counters(session)
+        rebuild_related(session)
+        session.commit()
+        # Creates the FTS table when the index lives in the database
+        search_index.prepare(session)
+
+    return {"products": products, "categories": categories, "reviews": reviews, "links": len(links)}
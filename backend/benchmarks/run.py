@@ -0,0 +1,214 @@
+"""In-process API benchmark against a generated SQLite catalog.
+
+    cd backend
+    python benchmarks/run.py                          # every scenario, checked against benchmarks/baseline.json
+    python benchmarks/run.py --scenarios list,detail --requests 500
+    python benchmarks/run.py --save-baseline          # record this machine's numbers as the baseline
+
+Requests go through the whole ASGI app (middleware, routing, serialization)
+without a network hop. Exits with status 1 when a scenario's throughput
+drops, or its p95 latency grows, by more than --threshold against the
+baseline. Baselines are machine specific: a baseline recorded on another
+machine (Python version, platform or CPU count) is shown but not compared
+against, so record one with --save-baseline on the machine that runs the
+comparison.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from scenarios import SCENARIOS, Catalog, draw
+
+HERE = Path(__file__).resolve().parent
+APP_DIR = HERE.parent / "app"
+BASELINE = HERE / "baseline.json"
+
+# Compared against the baseline; the other settings must match for the comparison to mean anything
+CONFIG_KEYS = ("products", "categories", "reviews", "requests", "concurrency", "cache")
+
+
+def _configure(args, database: Path):
+    """Point the app at a scratch database; must run before any app module is imported"""
+    os.environ["DATABASE_URL"] = f"sqlite:///{database}"
+    os.environ["STARTUP_MODE"] = "skip"
+    os.environ["RESERVATION_SWEEP_SECONDS"] = "0"
+    os.environ["N_PLUS_ONE_THRESHOLD"] = os.environ.get("N_PLUS_ONE_THRESHOLD", "1000000")
+    if not args.cache:
+        os.environ["RESPONSE_CACHE_TTL"] = "0"
+    sys.path.insert(0, str(APP_DIR))
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        return _peak_rss_mb()
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run_scenario(client, scenario: str, catalog, requests: int, concurrency: int, seed: int) -> Dict:
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker(index: int):
+        nonlocal errors
+        rng = random.Random(f"{seed}:{scenario}:{index}")
+        for _ in remaining:
+            method, url, body = draw(scenario, rng, catalog)
+            started = time.perf_counter()
+            response = await client.request(method, url, json=body)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    rss_before = _rss_mb()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+        "rss_mb": round(_rss_mb(), 1),
+        "rss_growth_mb": round(_rss_mb() - rss_before, 1),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+
+async def run(args) -> Dict:
+    import httpx
+    from catalog import generate_catalog
+    from cache import response_cache
+    from db import engine
+    import main
+
+    started = time.perf_counter()
+    generated = generate_catalog(args.products, args.categories, args.reviews, seed=args.seed)
+    print(f"✅ Generated {generated['products']} products, {generated['categories']} categories, "
+          f"{generated['reviews']} reviews in {time.perf_counter() - started:.1f}s")
+
+    catalog = Catalog(args.products, args.categories)
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for scenario in args.scenarios:
+            response_cache.clear()
+            if args.warmup:
+                await run_scenario(client, scenario, catalog, args.warmup, args.concurrency, args.seed + 1)
+            results[scenario] = await run_scenario(client, scenario, catalog, args.requests, args.concurrency, args.seed)
+    engine.dispose()
+    return results
+
+
+def _machine() -> Dict:
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()}
+
+
+def compare(results: Dict, config: Dict, machine: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Scenarios slower than the baseline by more than the threshold"""
+    if {key: baseline.get("config", {}).get(key) for key in CONFIG_KEYS} != {key: config[key] for key in CONFIG_KEYS}:
+        print("⚠️ Baseline was recorded with different settings; not comparing")
+        return []
+    if baseline.get("machine") != machine:
+        print("⚠️ Baseline was recorded on a different machine; not comparing, record one here with --save-baseline")
+        return []
+    regressions = []
+    for scenario, result in results.items():
+        before = baseline.get("results", {}).get(scenario)
+        if not before:
+            continue
+        if result["rps"] < before["rps"] * (1 - threshold):
+            regressions.append(f"{scenario}: {result['rps']} req/s, baseline {before['rps']} req/s")
+        if result["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append(f"{scenario}: p95 {result['p95_ms']} ms, baseline {before['p95_ms']} ms")
+    return regressions
+
+
+def print_table(results: Dict, baseline: Dict):
+    print(f"{'scenario':<10} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'rss MB':>8} {'baseline req/s':>15}")
+    for scenario, result in results.items():
+        before = baseline.get("results", {}).get(scenario, {}).get("rps", "-")
+        print(f"{scenario:<10} {result['rps']:>9} {result['p50_ms']:>8} {result['p95_ms']:>8} {result['p99_ms']:>8} "
+              f"{result['errors']:>7} {result['rss_mb']:>8} {before:>15}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="karukotha API benchmarks")
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--reviews", type=int, default=50000)
+    parser.add_argument("--requests", type=int, default=2000, help="Measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=200, help="Unmeasured requests before each scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--scenarios", default=",".join(list(SCENARIOS)),
+                        help=f"Comma-separated, from: {', '.join(list(SCENARIOS))}")
+    parser.add_argument("--cache", action=argparse.BooleanOptionalAction, default=True,
+                        help="Serve repeated reads from the response cache, as in production")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown, as a fraction")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--output", type=Path, help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(list(SCENARIOS))
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    with tempfile.TemporaryDirectory() as scratch:
+        _configure(args, Path(scratch) / "benchmark.db")
+        results = asyncio.run(run(args))
+
+    config = {key: getattr(args, key) for key in CONFIG_KEYS}
+    machine = _machine()
+    report = {
+        "config": config,
+        "machine": machine,
+        "results": results,
+    }
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    print_table(results, baseline)
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"✅ Saved the baseline to {args.baseline}")
+        return 0
+
+    regressions = compare(results, config, machine, baseline, args.threshold) if baseline else []
+    for regression in regressions:
+        print(f"❌ Regression: {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""Request mixes the benchmark runs; each request is drawn from a seeded RNG"""
+import itertools
+import random
+from typing import Callable, Dict, List, Optional, Tuple
+
+Request = Tuple[str, str, Optional[dict]]
+
+SORTS = ["newest", "oldest", "price_asc", "price_desc"]
+
+
+class Catalog:
+    """What the scenarios need to know about the generated data"""
+
+    def __init__(self, products: int, categories: int):
+        self.products = products
+        self.categories = categories
+        self._skus = itertools.count(1)
+
+    def new_sku(self) -> str:
+        return f"BENCH-NEW-{next(self._skus):07d}"
+
+
+def product_list(rng: random.Random, catalog: Catalog) -> Request:
+    fields = "&fields=summary" if rng.random() < 0.5 else ""
+    return "GET", f"/api/products?limit=24&sort={rng.choice(SORTS)}{fields}", None
+
+
+def product_detail(rng: random.Random, catalog: Catalog) -> Request:
+    return "GET", f"/api/products/{rng.randint(1, catalog.products)}", None
+
+
+def category_filter(rng: random.Random, catalog: Catalog) -> Request:
+    return "GET", f"/api/products?category_id={rng.randint(1, catalog.categories)}&limit=24&fields=summary", None
+
+
+def review_list(rng: random.Random, catalog: Catalog) -> Request:
+    return "GET", f"/api/products/{rng.randint(1, catalog.products)}/reviews?limit=20", None
+
+
+def create_or_update(rng: random.Random, catalog: Catalog) -> Request:
+    if rng.random() < 0.5:
+        return "POST", "/api/products", {
+            "name": "Benchmark product", "description": "Created by the benchmark", "sku": catalog.new_sku(),
+            "price": round(rng.uniform(100, 50000), 2), "stock": rng.randint(0, 50),
+            "category_ids": [rng.randint(1, catalog.categories)], "tags": ["bench"],
+        }
+    return "PUT", f"/api/products/{rng.randint(1, catalog.products)}", {
+        "price": round(rng.uniform(100, 50000), 2), "stock": rng.randint(0, 50),
+    }
+
+
+# scenario name -> [(weight, request factory)]
+SCENARIOS: Dict[str, List[Tuple[int, Callable[[random.Random, Catalog], Request]]]] = {
+    "list": [(1, product_list)],
+    "detail": [(1, product_detail)],
+    "category": [(1, category_filter)],
+    "reviews": [(1, review_list)],
+    "write": [(1, create_or_update)],
+    "mixed": [(30, product_list), (35, product_detail), (15, category_filter), (10, review_list), (10, create_or_update)],
+}
+
+
+def draw(scenario: str, rng: random.Random, catalog: Catalog) -> Request:
+    weights, factories = zip(*SCENARIOS[scenario])
+    return rng.choices(factories, weights=weights)[0](rng, catalog)
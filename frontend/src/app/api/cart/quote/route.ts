@@ -0,0 +1,17 @@
+import { NextRequest, NextResponse } from 'next/server';
+import api, { stickyConfig } from '@/lib/client';
+
+// POST /api/cart/quote - Price the cart on the server
+// A pure read: the backend sets no sticky cookie for it, so there is nothing to relay
+export async function POST(request: NextRequest) {
+  try {
+    const body = await request.json();
+    const response = await api.post('/api/cart/quote', body, stickyConfig(request));
+    return NextResponse.json(response.data, { status: 200 });
+  } catch (error) {
+    return NextResponse.json(
+      { error: 'Failed to quote cart' },
+      { status: 500 }
+    );
+  }
+}
@@ -0,0 +1,15 @@
+import { NextRequest, NextResponse } from 'next/server';
+import api, { stickyConfig } from '@/lib/client';
+
+// GET /api/dashboard/stats - Fetch dashboard totals
+export async function GET(request: NextRequest) {
+  try {
+    const response = await api.get('/api/dashboard/stats', stickyConfig(request));
+    return NextResponse.json(response.data, { status: 200 });
+  } catch (error) {
+    return NextResponse.json(
+      { error: 'Failed to fetch dashboard stats' },
+      { status: 500 }
+    );
+  }
+}
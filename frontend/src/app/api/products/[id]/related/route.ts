@@ -0,0 +1,22 @@
+import { NextRequest, NextResponse } from 'next/server';
+import api, { stickyConfig } from '@/lib/client';
+
+// GET /api/products/[id]/related - Fetch precomputed related products
+export async function GET(
+  request: NextRequest,
+  { params }: { params: Promise<{ id: string }> }
+) {
+  try {
+    const { id } = await params;
+    const response = await api.get(`/api/products/${id}/related`, {
+      ...stickyConfig(request),
+      params: Object.fromEntries(request.nextUrl.searchParams)
+    });
+    return NextResponse.json(response.data, { status: 200 });
+  } catch (error) {
+    return NextResponse.json(
+      { error: 'Failed to fetch related products' },
+      { status: 500 }
+    );
+  }
+}
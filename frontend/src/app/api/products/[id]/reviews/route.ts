@@ -1,5 +1,5 @@
 import { NextRequest, NextResponse } from 'next/server';
-import api from '@/lib/client';
+import api, { stickyConfig } from '@/lib/client';
 
 // GET /api/products/[id]/reviews - Fetch reviews for a product
 export async function GET(
@@ -8,7 +8,7 @@ export async function GET(
 ) {
   try {
     const { id } = await params;
-    const response = await api.get(`/api/products/${id}/reviews`);
+    const response = await api.get(`/api/products/${id}/reviews`, stickyConfig(request));
     return NextResponse.json(response.data, { status: 200 });
   } catch (error) {
     return NextResponse.json(
@@ -1,5 +1,5 @@
 import { NextRequest, NextResponse } from 'next/server';
-import api from '@/lib/client';
+import api, { relayCookies, stickyConfig } from '@/lib/client';
 
 // GET /api/products/[id] - Fetch a single product
 export async function GET(
@@ -8,7 +8,7 @@ export async function GET(
 ) {
   try {
     const { id } = await params;
-    const response = await api.get(`/api/products/${id}`);
+    const response = await api.get(`/api/products/${id}`, stickyConfig(request));
     return NextResponse.json(response.data, { status: 200 });
   } catch (error) {
     return NextResponse.json(
@@ -26,8 +26,8 @@ export async function PUT(
   try {
     const { id } = await params;
     const body = await request.json();
-    const response = await api.put(`/api/products/${id}`, body);
-    return NextResponse.json(response.data, { status: 200 });
+    const response = await api.put(`/api/products/${id}`, body, stickyConfig(request));
+    return relayCookies(response, NextResponse.json(response.data, { status: 200 }));
   } catch (error) {
     return NextResponse.json(
       { error: 'Failed to update product' },
@@ -43,11 +43,11 @@ export async function DELETE(
 ) {
   try {
     const { id } = await params;
-    await api.delete(`/api/products/${id}`);
-    return NextResponse.json(
+    const response = await api.delete(`/api/products/${id}`, stickyConfig(request));
+    return relayCookies(response, NextResponse.json(
       { message: 'Product deleted successfully' },
       { status: 200 }
-    );
+    ));
   } catch (error) {
     return NextResponse.json(
       { error: 'Failed to delete product' },
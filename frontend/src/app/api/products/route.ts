@@ -1,10 +1,10 @@
 import { NextRequest, NextResponse } from 'next/server';
-import api from '@/lib/client';
+import api, { relayCookies, stickyConfig } from '@/lib/client';
 
 // GET /api/products - Fetch all products
 export async function GET(request: NextRequest) {
   try {
-    const response = await api.get('/api/products');
+    const response = await api.get('/api/products', stickyConfig(request));
     return NextResponse.json(response.data, { status: 200 });
   } catch (error) {
     return NextResponse.json(
@@ -18,8 +18,8 @@ export async function GET(request: NextRequest) {
 export async function POST(request: NextRequest) {
   try {
     const body = await request.json();
-    const response = await api.post('/api/products', body);
-    return NextResponse.json(response.data, { status: 201 });
+    const response = await api.post('/api/products', body, stickyConfig(request));
+    return relayCookies(response, NextResponse.json(response.data, { status: 201 }));
   } catch (error) {
     return NextResponse.json(
       { error: 'Failed to create product' },
@@ -1,10 +1,10 @@
 import { NextRequest, NextResponse } from 'next/server';
-import api from '@/lib/client';
+import api, { relayCookies, stickyConfig } from '@/lib/client';
 
 // GET /api/settings - Fetch settings
 export async function GET(request: NextRequest) {
   try {
-    const response = await api.get('/api/settings');
+    const response = await api.get('/api/settings', stickyConfig(request));
     return NextResponse.json(response.data, { status: 200 });
   } catch (error) {
     return NextResponse.json(
@@ -18,8 +18,8 @@ export async function GET(request: NextRequest) {
 export async function PUT(request: NextRequest) {
   try {
     const body = await request.json();
-    const response = await api.put('/api/settings', body);
-    return NextResponse.json(response.data, { status: 200 });
+    const response = await api.put('/api/settings', body, stickyConfig(request));
+    return relayCookies(response, NextResponse.json(response.data, { status: 200 }));
   } catch (error) {
     return NextResponse.json(
       { error: 'Failed to update settings' },
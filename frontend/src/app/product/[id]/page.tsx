@@ -31,6 +31,14 @@ interface Product {
   };
 }
 
+interface RelatedProduct {
+  id: number;
+  name: string;
+  price: number;
+  images: string[];
+  categories: { name: string }[];
+}
+
 interface Review {
   id: number;
   productId: number;
@@ -47,6 +55,7 @@ export default function ProductDetailPage({ params }: { params: Promise<{ id: st
   const [error, setError] = useState<string | null>(null);
   const [product, setProduct] = useState<Product | null>(null);
   const [reviews, setReviews] = useState<Review[]>([]);
+  const [related, setRelated] = useState<RelatedProduct[]>([]);
 
   const fetchProduct = useCallback(async () => {
     try {
@@ -71,10 +80,22 @@ export default function ProductDetailPage({ params }: { params: Promise<{ id: st
     }
   }, [id]);
 
+  const fetchRelated = useCallback(async () => {
+    try {
+      const response = await axios.get(`/api/products/${id}/related`, {
+        params: { fields: 'id,name,price,images,categories', limit: 6 }
+      });
+      setRelated(response.data);
+    } catch (error) {
+      console.error('Error fetching related products:', error);
+    }
+  }, [id]);
+
   useEffect(() => {
     fetchProduct();
     fetchReviews();
-  }, [fetchProduct, fetchReviews]);
+    fetchRelated();
+  }, [fetchProduct, fetchReviews, fetchRelated]);
 
   if (loading) {
     return (
@@ -103,30 +124,13 @@ export default function ProductDetailPage({ params }: { params: Promise<{ id: st
     : 4.8;
   const productReviews = reviews.length;
 
-  const relatedProducts = [
-    {
-      id: 2,
-      name: 'Antique Wooden Cabinet',
-      price: 45000,
-      image: 'https://images.unsplash.com/photo-1595428774223-ef52624120d2?w=500',
-      category: 'Furniture',
-      badge: 'New Arrival'
-    },
-    {
-      id: 3,
-      name: 'Traditional Brass Pottery',
-      price: 3200,
-      image: 'https://images.unsplash.com/photo-1610701596007-11502861dcfa?w=500',
-      category: 'Decor'
-    },
-    {
-      id: 4,
-      name: 'Vintage Photo Frame',
-      price: 2800,
-      image: 'https://images.unsplash.com/photo-1582139329536-e7284fece509?w=500',
-      category: 'Decor'
-    }
-  ];
+  const relatedProducts = related.map((item) => ({
+    id: item.id,
+    name: item.name,
+    price: item.price,
+    image: item.images[0] ?? '',
+    category: item.categories[0]?.name ?? ''
+  }));
 
   return (
     <div className="min-h-screen bg-gradient-to-b from-amber-50 via-white to-amber-50">
@@ -168,7 +172,7 @@ export default function ProductDetailPage({ params }: { params: Promise<{ id: st
         />
 
         {/* Related Products */}
-        <RelatedProducts products={relatedProducts} />
+        {relatedProducts.length > 0 && <RelatedProducts products={relatedProducts} />}
       </div>
     </div>
   );
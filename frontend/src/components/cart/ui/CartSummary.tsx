@@ -3,34 +3,41 @@ import axios from 'axios';
 import { Button } from '@/components/ui/button';
 import { useCart } from '@/lib/cart-context';
 
-interface Settings {
+interface CartQuote {
   currency: string;
   tax_rate: number;
-  shipping_fee: number;
   free_shipping_threshold: number;
+  subtotal: number;
+  tax: number;
+  shipping: number;
+  total: number;
+  available: boolean;
 }
 
 export default function CartSummary() {
   const { state } = useCart();
-  const [settings, setSettings] = useState<Settings | null>(null);
+  const [quote, setQuote] = useState<CartQuote | null>(null);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
-    const fetchSettings = async () => {
+    // One request prices the whole cart with current prices, stock and settings
+    const fetchQuote = async () => {
       try {
-        const response = await axios.get('/api/settings');
-        setSettings(response.data);
+        const response = await axios.post('/api/cart/quote', {
+          items: state.items.map(item => ({ product_id: Number(item.id), quantity: item.quantity })),
+        });
+        setQuote(response.data);
       } catch (error) {
-        console.error('Error fetching settings:', error);
+        console.error('Error fetching cart quote:', error);
       } finally {
         setLoading(false);
       }
     };
 
-    fetchSettings();
-  }, []);
+    fetchQuote();
+  }, [state.items]);
 
-  if (loading || !settings) {
+  if (loading || !quote) {
     return (
       <div className="bg-white rounded-lg shadow-sm border border-gray-100 p-6">
         <div className="animate-pulse">
@@ -45,10 +52,7 @@ export default function CartSummary() {
     );
   }
 
-  const subtotal = state.total;
-  const tax = subtotal * (settings.tax_rate / 100);
-  const shipping = subtotal >= settings.free_shipping_threshold ? 0 : settings.shipping_fee;
-  const total = subtotal + tax + shipping;
+  const { subtotal, tax, shipping, total } = quote;
 
   return (
     <div className="bg-white rounded-lg shadow-sm border border-gray-100 p-6 sticky top-4">
@@ -61,7 +65,7 @@ export default function CartSummary() {
         </div>
 
         <div className="flex justify-between text-gray-600">
-          <span>Tax ({settings.tax_rate}%)</span>
+          <span>Tax ({quote.tax_rate}%)</span>
           <span>৳{tax.toLocaleString()}</span>
         </div>
 
@@ -76,9 +80,15 @@ export default function CartSummary() {
           </span>
         </div>
 
-        {subtotal < settings.free_shipping_threshold && (
+        {subtotal < quote.free_shipping_threshold && (
           <div className="text-sm text-amber-700 bg-amber-50 p-3 rounded-lg">
-            Add ৳{(settings.free_shipping_threshold - subtotal).toLocaleString()} more for free shipping!
+            Add ৳{(quote.free_shipping_threshold - subtotal).toLocaleString()} more for free shipping!
+          </div>
+        )}
+
+        {!quote.available && (
+          <div className="text-sm text-red-700 bg-red-50 p-3 rounded-lg">
+            Some items are no longer available in the requested quantity.
           </div>
         )}
 
@@ -1,11 +1,19 @@
 'use client';
 
 import { useState, useEffect } from 'react';
-import { Package, DollarSign, ShoppingCart, TrendingUp } from 'lucide-react';
+import { Package, DollarSign, ShoppingCart, TrendingUp, AlertTriangle } from 'lucide-react';
 import axios from 'axios';
 
+interface Stats {
+  total_products: number;
+  total_revenue: number;
+  total_orders: number;
+  low_stock_products: number;
+  low_stock_threshold: number;
+}
+
 export default function DashboardStats() {
-  const [productCount, setProductCount] = useState(0);
+  const [data, setData] = useState<Stats | null>(null);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
@@ -14,8 +22,8 @@ export default function DashboardStats() {
 
   const fetchStats = async () => {
     try {
-      const response = await axios.get('/api/products');
-      setProductCount(response.data.length);
+      const response = await axios.get('/api/dashboard/stats');
+      setData(response.data);
     } catch (error) {
       console.error('Error fetching stats:', error);
     } finally {
@@ -23,34 +31,36 @@ export default function DashboardStats() {
     }
   };
 
+  const show = (value?: number) => (loading ? '...' : (value ?? 0).toLocaleString());
+
   const stats = [
     {
       title: 'Total Products',
-      value: loading ? '...' : productCount.toString(),
+      value: show(data?.total_products),
       icon: Package,
       color: 'bg-amber-600',
       change: '+0%',
     },
     {
       title: 'Total Revenue',
-      value: '৳ 0.00',
+      value: loading ? '...' : `৳ ${(data?.total_revenue ?? 0).toLocaleString(undefined, { minimumFractionDigits: 2 })}`,
       icon: DollarSign,
       color: 'bg-green-600',
       change: '+0%',
     },
     {
       title: 'Orders',
-      value: '0',
+      value: show(data?.total_orders),
       icon: ShoppingCart,
       color: 'bg-purple-600',
       change: '+0%',
     },
     {
-      title: 'Conversion Rate',
-      value: '0%',
-      icon: TrendingUp,
+      title: 'Low Stock',
+      value: show(data?.low_stock_products),
+      icon: AlertTriangle,
       color: 'bg-orange-600',
-      change: '+0%',
+      change: data ? `< ${data.low_stock_threshold} left` : '',
     },
   ];
 
@@ -1,4 +1,5 @@
-import axios from 'axios';
+import axios, { AxiosRequestConfig, AxiosResponse } from 'axios';
+import { NextRequest, NextResponse } from 'next/server';
 
 const api = axios.create({
   baseURL: process.env.NEXT_PUBLIC_API_URL,
@@ -8,4 +9,23 @@ const api = axios.create({
   },
 });
 
-export default api;
\ No newline at end of file
+// After a write the backend sets this cookie, and reads carrying it skip the
+// read replicas, so the writer sees its own changes (backend/app/replicas.py)
+const STICKY_COOKIE = 'db_primary';
+
+// Request config forwarding the browser's sticky cookie to the backend
+export function stickyConfig(request: NextRequest): AxiosRequestConfig {
+  const sticky = request.cookies.get(STICKY_COOKIE);
+  return sticky ? { headers: { Cookie: `${STICKY_COOKIE}=${sticky.value}` } } : {};
+}
+
+// Pass the cookies the backend set on to the browser
+export function relayCookies(from: AxiosResponse, to: NextResponse): NextResponse {
+  const cookies = from.headers['set-cookie'] ?? [];
+  for (const cookie of cookies) {
+    to.headers.append('Set-Cookie', cookie);
+  }
+  return to;
+}
+
+export default api;